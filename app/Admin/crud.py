@@ -0,0 +1,98 @@
+import threading
+from anyio.to_thread import current_default_thread_limiter
+from pymongo.database import Database
+from pymongo.errors import PyMongoError
+from app.common.cache import TTLCache, cache_stats
+from app.common.db_monitor import pool_monitor
+from app.common.jobs import job_statuses
+from app.common.logger import queue_stats, get_logger
+from app.common.metrics import HTTP_IN_PROGRESS
+from app.common.slow_queries import slow_query_shapes
+from .models import MONITORED_COLLECTIONS, ADMIN_STATS_TTL, SLOW_QUERY_SUMMARY_SIZE
+from .schemas import (PoolStats, CacheStats, ThreadpoolStats, IndexUsage, CollectionStats, JobStatus, LoggingStats, AdminOverview)
+
+logger = get_logger(__name__)
+
+mongo_stats_cache = TTLCache("admin_mongo_stats", ttl=ADMIN_STATS_TTL, max_entries=16)
+
+
+#=====================IN-PROCESS COUNTERS (cheap, safe to poll) =====================================
+def get_pool_stats():
+    return [PoolStats(**pool).model_dump() for pool in pool_monitor.stats()]
+
+def get_cache_stats():
+    return [CacheStats(**stats).model_dump() for stats in cache_stats()]
+
+def get_threadpool_stats():
+    """Must run on the event loop (async route): the anyio limiter belongs to it"""
+    limiter = current_default_thread_limiter()
+    stats = limiter.statistics()
+    return ThreadpoolStats(
+        total_tokens=limiter.total_tokens,
+        borrowed_tokens=stats.borrowed_tokens,
+        tasks_waiting=stats.tasks_waiting,
+        utilisation=round(stats.borrowed_tokens / limiter.total_tokens, 4) if limiter.total_tokens else 0.0,
+        threads_alive=threading.active_count(),
+        http_requests_in_progress=sum(HTTP_IN_PROGRESS.values().values()),
+    ).model_dump()
+
+def get_job_statuses():
+    return [JobStatus(**job).model_dump() for job in job_statuses()]
+
+def get_overview():
+    """Everything that is served from memory, in one call (async route, see get_threadpool_stats)"""
+    return AdminOverview(
+        pool=get_pool_stats(),
+        caches=get_cache_stats(),
+        threadpool=get_threadpool_stats(),
+        logging=LoggingStats(**queue_stats()),
+        slow_queries=slow_query_shapes(SLOW_QUERY_SUMMARY_SIZE),
+        jobs=get_job_statuses(),
+    ).model_dump()
+
+
+#=====================MONGODB STATISTICS (cached for ADMIN_STATS_TTL seconds) ========================
+def get_index_usage(db: Database, refresh: bool = False):
+    cached = None if refresh else mongo_stats_cache.get("index_usage")
+    if cached is not None:
+        return cached
+    usage = []
+    for collection in MONITORED_COLLECTIONS:
+        try:
+            for index in db[collection].aggregate([{"$indexStats": {}}]):
+                since = index.get("accesses", {}).get("since")
+                usage.append(IndexUsage(
+                    collection=collection,
+                    name=index["name"],
+                    key=dict(index.get("key", {})),
+                    ops=int(index.get("accesses", {}).get("ops", 0)),
+                    since=since.isoformat() if since else None,
+                ).model_dump())
+        except PyMongoError:
+            logger.warning("Could not read index stats", extra={"collection": collection}, exc_info=True)
+    usage.sort(key=lambda index: index["ops"])                          # unused indexes first
+    mongo_stats_cache.set("index_usage", usage)
+    return usage
+
+def get_collection_stats(db: Database, refresh: bool = False):
+    cached = None if refresh else mongo_stats_cache.get("collection_stats")
+    if cached is not None:
+        return cached
+    collections = []
+    for collection in MONITORED_COLLECTIONS:
+        try:
+            stats = next(db[collection].aggregate([{"$collStats": {"storageStats": {}}}]), {}).get("storageStats", {})
+        except PyMongoError:
+            logger.warning("Could not read collection stats", extra={"collection": collection}, exc_info=True)
+            continue
+        collections.append(CollectionStats(
+            collection=collection,
+            count=stats.get("count", 0),
+            size_bytes=stats.get("size", 0),
+            avg_obj_size_bytes=stats.get("avgObjSize", 0),
+            storage_size_bytes=stats.get("storageSize", 0),
+            total_index_size_bytes=stats.get("totalIndexSize", 0),
+            indexes=stats.get("nindexes", 0),
+        ).model_dump())
+    mongo_stats_cache.set("collection_stats", collections)
+    return collections
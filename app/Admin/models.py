@@ -0,0 +1,23 @@
+import os
+from dotenv import load_dotenv
+
+from app.database import INDEXES
+from app.common.profile_sections import SECTION_COLLECTIONS
+from app.common.invalidation_bus import INVALIDATION_BUS_COLLECTION
+
+load_dotenv()
+
+#===========ADMIN MODELS ===========================================
+# The admin console never stores anything: it reads in-process counters and, for index usage and
+# collection sizes, MongoDB's own statistics (cached for ADMIN_STATS_TTL seconds so an incident
+# dashboard polling every few seconds does not add load to a struggling mongod).
+# Every collection the app owns: the indexed ones, the profile sections and the cache invalidation bus
+MONITORED_COLLECTIONS = list(dict.fromkeys([
+    *INDEXES,
+    "budget_monthly_summary_db",
+    *SECTION_COLLECTIONS,
+    INVALIDATION_BUS_COLLECTION,
+]))
+
+ADMIN_STATS_TTL = int(os.getenv("ADMIN_STATS_TTL", 60))
+SLOW_QUERY_SUMMARY_SIZE = 5                                  # slowest shapes shown on the overview
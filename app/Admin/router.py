@@ -0,0 +1,172 @@
+from fastapi import APIRouter, Depends, status, Response, Query
+from fastapi.responses import FileResponse
+from pymongo.database import Database
+from app.database import get_db
+from app.HR.helper import require_hr_role
+import app.Admin.crud as crud
+from typing import Optional
+import app.common.memory as memory
+import app.common.slow_queries as slow_queries
+from app.common.profiler import PROFILING_TOKEN, ProfiledRoute, recent_profiles, profile_file
+from app.common.logger import get_logger
+
+
+#Operations endpoints for HR superusers; everything here reads in-process state, never the business collections.
+
+router = APIRouter(route_class=ProfiledRoute)                 # sync endpoints show up in request profiles
+logger = get_logger(__name__)
+
+#=====================OVERVIEW (in-memory counters only) ======================================
+@router.get("/overview")
+async def overview(res: Response, _current_user: dict = Depends(require_hr_role)):          # async: reads the event loop's thread limiter
+    res.status_code = status.HTTP_200_OK
+    return {"message": "Operations overview", "data": crud.get_overview()}
+
+#---------------MongoDB connection pool------------------------------------------
+@router.get("/pool")
+def pool_stats(res: Response, _current_user: dict = Depends(require_hr_role)):
+    res.status_code = status.HTTP_200_OK
+    return {"message": "MongoDB connection pool", "data": crud.get_pool_stats()}
+
+#---------------Cache hit ratios ---------------------------------------------------
+@router.get("/caches")
+def caches(res: Response, _current_user: dict = Depends(require_hr_role)):
+    res.status_code = status.HTTP_200_OK
+    return {"message": "Cache statistics", "data": crud.get_cache_stats()}
+
+#---------------Threadpool utilisation (sync routes waiting for a worker) ----------
+@router.get("/threadpool")
+async def threadpool(res: Response, _current_user: dict = Depends(require_hr_role)):
+    res.status_code = status.HTTP_200_OK
+    return {"message": "Threadpool utilisation", "data": crud.get_threadpool_stats()}
+
+#---------------Background jobs -----------------------------------------------------
+@router.get("/jobs")
+def jobs(res: Response, _current_user: dict = Depends(require_hr_role)):
+    res.status_code = status.HTTP_200_OK
+    return {"message": "Background jobs", "data": crud.get_job_statuses()}
+
+
+#=====================MONGODB STATISTICS (cached, ?refresh=true to bypass) ===================
+#---------------Index usage ($indexStats), least used first -------------------------
+@router.get("/indexes")
+def index_usage(res: Response, refresh: bool = False, db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
+    try:
+        res.status_code = status.HTTP_200_OK
+        return {"message": "Index usage since last mongod restart", "data": crud.get_index_usage(db, refresh)}
+    except Exception:
+        logger.exception("Error reading index usage")
+        res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"message": "Failed to read index usage"}
+
+#---------------Collection sizes and counts ($collStats) ----------------------------
+@router.get("/collections")
+def collection_stats(res: Response, refresh: bool = False, db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
+    try:
+        res.status_code = status.HTTP_200_OK
+        return {"message": "Collection sizes and counts", "data": crud.get_collection_stats(db, refresh)}
+    except Exception:
+        logger.exception("Error reading collection stats")
+        res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"message": "Failed to read collection stats"}
+
+
+#=====================PROFILING ===============================================================
+#---------------List recent request profiles--------------------------------------
+@router.get("/profiles")
+def list_profiles(res: Response, _current_user: dict = Depends(require_hr_role)):
+    res.status_code = status.HTTP_200_OK
+    return {
+        "message": f"{len(recent_profiles())} profile(s) recorded",
+        "enabled": bool(PROFILING_TOKEN),                                     # send X-Profile-Token: <PROFILING_TOKEN> to profile a request
+        "data": recent_profiles(),
+    }
+
+#---------------Download one profile (open it in https://www.speedscope.app) -------
+@router.get("/profiles/{request_id}", response_model=None)
+def download_profile(request_id: str, res: Response, _current_user: dict = Depends(require_hr_role)):
+    path = profile_file(request_id)
+    if not path:
+        res.status_code = status.HTTP_404_NOT_FOUND
+        return {"message": "Profile not found"}
+    return FileResponse(path, media_type="application/json", filename=f"{request_id}.speedscope.json")
+
+
+#=====================MEMORY (tracemalloc) =====================================================
+#---------------Tracing status and stored snapshots-------------------------------
+@router.get("/memory")
+def memory_status(res: Response, _current_user: dict = Depends(require_hr_role)):
+    res.status_code = status.HTTP_200_OK
+    return {"message": "Memory tracing status", "data": memory.tracing_status()}
+
+#---------------Start / stop tracemalloc -----------------------------------------
+@router.post("/memory/tracemalloc/start")
+def start_tracemalloc(res: Response, frames: int = Query(memory.TRACEMALLOC_FRAMES, ge=1, le=50), _current_user: dict = Depends(require_hr_role)):
+    logger.info("tracemalloc started", extra={"frames": frames})
+    res.status_code = status.HTTP_200_OK
+    return {"message": "tracemalloc started", "data": memory.start_tracing(frames)}
+
+@router.post("/memory/tracemalloc/stop")
+def stop_tracemalloc(res: Response, _current_user: dict = Depends(require_hr_role)):
+    logger.info("tracemalloc stopped")
+    res.status_code = status.HTTP_200_OK
+    return {"message": "tracemalloc stopped", "data": memory.stop_tracing()}
+
+#---------------Take a snapshot (top allocations by file/line) ---------------------
+@router.post("/memory/snapshots")
+def take_memory_snapshot(res: Response, label: Optional[str] = None, limit: int = Query(25, ge=1, le=500),
+                         group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"), _current_user: dict = Depends(require_hr_role)):
+    try:
+        snapshot = memory.take_snapshot(label, limit, group_by)
+        res.status_code = status.HTTP_201_CREATED
+        return {"message": f"Snapshot {snapshot['id']} taken", "data": snapshot}
+    except ValueError as e:
+        res.status_code = status.HTTP_409_CONFLICT
+        return {"message": str(e)}
+
+#---------------Diff two snapshots (to_id omitted = diff against now) ---------------
+@router.get("/memory/diff")
+def diff_memory_snapshots(res: Response, from_id: int, to_id: Optional[int] = None, limit: int = Query(25, ge=1, le=500),
+                          group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"), _current_user: dict = Depends(require_hr_role)):
+    try:
+        diff = memory.diff_snapshots(from_id, to_id, limit, group_by)
+        res.status_code = status.HTTP_200_OK
+        return {"message": f"Allocation changes from snapshot {diff['from']} to {diff['to']}", "data": diff}
+    except LookupError as e:
+        res.status_code = status.HTTP_404_NOT_FOUND
+        return {"message": str(e)}
+    except ValueError as e:
+        res.status_code = status.HTTP_409_CONFLICT
+        return {"message": str(e)}
+
+#---------------Peak memory per route while tracing --------------------------------
+@router.get("/memory/requests")
+def memory_by_route(res: Response, _current_user: dict = Depends(require_hr_role)):
+    res.status_code = status.HTTP_200_OK
+    return {"message": "Highest traced memory growth per route", "data": memory.route_peaks()}
+
+
+#=====================SLOW QUERIES =============================================================
+#---------------Most recent slow MongoDB commands---------------------------------
+@router.get("/slow-queries")
+def list_slow_queries(res: Response, limit: int = Query(50, ge=1, le=500), collection: Optional[str] = None,
+                      _current_user: dict = Depends(require_hr_role)):
+    entries = slow_queries.recent_slow_queries(limit, collection)
+    res.status_code = status.HTTP_200_OK
+    return {"message": f"{len(entries)} slow command(s) over {slow_queries.SLOW_QUERY_MS:g}ms", "data": entries}
+
+#---------------Slow commands grouped by shape, with captured explain plans -------
+@router.get("/slow-queries/shapes")
+def list_slow_query_shapes(res: Response, limit: int = Query(50, ge=1, le=500),
+                           sort_by: str = Query("max_ms", pattern="^(max_ms|total_ms|mean_ms|count)$"),
+                           _current_user: dict = Depends(require_hr_role)):
+    shapes = slow_queries.slow_query_shapes(limit, sort_by)
+    res.status_code = status.HTTP_200_OK
+    return {"message": f"{len(shapes)} slow query shape(s)", "data": shapes}
+
+#---------------Reset the slow-query log -------------------------------------------
+@router.delete("/slow-queries")
+def clear_slow_queries(res: Response, _current_user: dict = Depends(require_hr_role)):
+    slow_queries.clear_slow_queries()
+    res.status_code = status.HTTP_200_OK
+    return {"message": "Slow-query log cleared"}
@@ -0,0 +1,85 @@
+from pydantic import BaseModel
+from typing import Optional, List, Dict, Any
+
+
+#===============Connection pool==========================
+class PoolStats(BaseModel):
+    address: str
+    open: int                                    # connections currently open
+    checked_out: int                             # connections in use right now
+    max_checked_out: int
+    max_pool_size: Optional[int] = None
+    created: int
+    closed: int
+    checkouts: int
+    checkout_failures: int
+    cleared: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+
+
+#===============Caches / threadpool======================
+class CacheStats(BaseModel):
+    name: str
+    entries: Optional[int] = None                # None when the entries live outside this process
+    hits: int
+    misses: int
+    hit_ratio: float
+
+
+class ThreadpoolStats(BaseModel):
+    total_tokens: float                          # max concurrent sync routes (anyio default limiter, 40 unless changed)
+    borrowed_tokens: int                         # sync routes running right now
+    tasks_waiting: int                           # sync routes queued for a thread
+    utilisation: float
+    threads_alive: int
+    http_requests_in_progress: float
+
+
+#===============MongoDB statistics=======================
+class IndexUsage(BaseModel):
+    collection: str
+    name: str
+    key: Dict[str, Any]
+    ops: int                                     # index uses since `since` (resets when mongod restarts)
+    since: Optional[str] = None
+
+
+class CollectionStats(BaseModel):
+    collection: str
+    count: int
+    size_bytes: int
+    avg_obj_size_bytes: int
+    storage_size_bytes: int
+    total_index_size_bytes: int
+    indexes: int
+
+
+#===============Background jobs / overview===============
+class JobStatus(BaseModel):
+    name: str
+    description: str
+    state: str
+    runs: int
+    failures: int
+    running: int
+    last_started: Optional[str] = None
+    last_finished: Optional[str] = None
+    last_duration_ms: Optional[float] = None
+    last_error: Optional[str] = None
+    heartbeat_at: Optional[str] = None
+
+
+class LoggingStats(BaseModel):
+    queued: int
+    queue_size: int
+    dropped: int
+
+
+class AdminOverview(BaseModel):
+    pool: List[PoolStats]
+    caches: List[CacheStats]
+    threadpool: ThreadpoolStats
+    logging: LoggingStats
+    slow_queries: List[Dict[str, Any]]
+    jobs: List[JobStatus]
@@ -7,8 +7,10 @@ import os
 import re
 from dotenv import load_dotenv
 from .utils import get_user_by_email, verify_password, hash_password
+from app.common.logger import get_logger
 
 load_dotenv()
+logger = get_logger(__name__)
 
 ALLOWED_DOMAINS = ["sunfocus.com", "erp.com", "gmail.com", "outlook.com", "yahoo.com", "hotmail.com", "test.com"]
 
@@ -50,24 +52,21 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 #=========================== Authentication functions=========================================================
 def authenticate_user(email: str, password: str) -> Optional[Dict[str, Any]]:
     try:
-        print(f"[AUTH] Attempting to authenticate user: {email}")
-        
         # Get user from database
-        user = get_user_by_email(email)
+        user = get_user_by_email(email, with_password=True)
         if not user:
-            print(f"[AUTH] User not found: {email}")
+            logger.info("Login failed: user not found", extra={"email": email})
             return None
             
-        print(f"[AUTH] User found, verifying password...")
         if not verify_password(password, user["password"]):
-            print(f"[AUTH] Invalid password for user: {email}")
+            logger.info("Login failed: invalid password", extra={"email": email})
             return None
             
-        print(f"[AUTH] Successfully authenticated user: {email}")
+        logger.debug("User authenticated", extra={"email": email})
         return user
         
-    except Exception as e:
-        print(f"[AUTH] Error during authentication: {str(e)}")
+    except Exception:
+        logger.exception("Error during authentication")
         return None
 
 #==============================GET CURRENT USER ================================================================================
@@ -6,13 +6,15 @@ from .helper import authenticate_user, get_current_user
 from pydantic import EmailStr
 from app.database import get_db, Database
 from passlib.context import CryptContext
-from datetime import timedelta
+from datetime import timedelta, datetime
 import os
 from dotenv import load_dotenv
+from app.common.cache import invalidate_tags, EMPLOYEES_TAG
+from app.common.profiler import ProfiledRoute
 
 
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)                 # sync endpoints show up in request profiles
 
 load_dotenv()
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30)) 
@@ -78,8 +80,11 @@ def create_hr_once(email: EmailStr = Body(...),password: str = Body(...),db: Dat
     db["employee_db"].insert_one({
         "email": email,
         "password": hashed_password, 
-        "role": "HR"
+        "role": "HR",
+        "version": 1,
+        "updated_at": datetime.utcnow(),
     })
+    invalidate_tags(db, EMPLOYEES_TAG)
 
     return {"msg": "HR account created successfully"}
 
@@ -88,5 +93,5 @@ def create_hr_once(email: EmailStr = Body(...),password: str = Body(...),db: Dat
 
 @router.get("/me")
 def read_me(current_user: dict = Depends(get_current_user)):              #depend = its works as a middleware between the request from the client and the actual endpoint matlab the current_user variable will contain the user information if the token is valid
-    return current_user
+    return {**current_user, "_id": str(current_user["_id"])}
 
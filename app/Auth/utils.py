@@ -4,9 +4,13 @@ from datetime import datetime, timedelta , timezone
 from jose import jwt, JWTError
 import os
 from dotenv import load_dotenv
+from typing import Optional
+from pymongo.database import Database
 from app.database import get_db
+from app.common.logger import get_logger
 
 load_dotenv()
+logger = get_logger(__name__)
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
@@ -18,11 +22,9 @@ def hash_password(password: str):
 
 def verify_password(plain_password: str, hashed_password: str):
     try:
-        result = bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-        print(f" Verification result: {result}")
-        return result
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
     except Exception as e:
-        print(f" Bcrypt error: {e}")
+        logger.warning("Stored password hash could not be checked: %s", type(e).__name__)     # never log the hash itself
         return False
 
 
@@ -51,10 +53,16 @@ def decode_access_token(token: str):
   
 
 
-def get_user_by_email(email: str):
-    db = get_db()
+# Runs on every authenticated request: only what auth, role checks and /auth/me use (profile sections and the
+# rest of the document are loaded by the endpoints that show them). The password hash only for a login.
+AUTH_PROJECTION = {"email": 1, "role": 1, "status": 1, "disabled": 1, "first_name": 1, "last_name": 1}
+
+def get_user_by_email(email: str, with_password: bool = False, db: Optional[Database] = None):
+    if db is None:                                  # requests use the shared client; scripts/check_query_plans.py passes its own
+        db = get_db()
     user_collection = db["employee_db"]
-    return user_collection.find_one({"email": email})
+    projection = {**AUTH_PROJECTION, "password": 1} if with_password else AUTH_PROJECTION
+    return user_collection.find_one({"email": email}, projection)
 
 
 
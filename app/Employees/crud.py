@@ -3,26 +3,25 @@ from app.Auth.utils import verify_password, create_access_token
 from datetime import timedelta, datetime, date
 from bson import ObjectId
 import os
-from app.common.utils import serialize_leave, serialize_attendance
+from app.common.utils import serialize_leave, serialize_attendance, versioned, leave_failure_reason
+from app.common.profile_sections import (ADDRESS_COLLECTION, load_profile, touch_employee, get_leave_balance, reserve_leave_days,
+                                         settle_leave_days)
+from app.HR.crud import invalidate_budget_analytics
+from app.common.cache import invalidate_tags, EMPLOYEES_TAG, employee_tag, employee_email_tag, leave_tag
+from app.common.logger import get_logger
 
 ACCESS_TOKEN_EXPIRES_MIN = int(os.getenv("ACCESS_TOKEN_EXPIRES_MIN", 30))
+logger = get_logger(__name__)
 
 def login_employee(db:Database, email: str, password: str):
-    print("🔹 Attempting login for email:", email)
     employee = db["employee_db"].find_one({"email" : email , "role": "employee"})      #find employee with role 
     if not employee:
-        print(" Employee not found or role mismatch")
+        logger.info("Employee login failed: not found or role mismatch", extra={"email": email})
         return None
-    
-    print(" Employee found:", employee["email"])
-    print("Stored hashed password:", employee["password"])
-    print("Password provided:", password)
 
     if not verify_password(password,employee["password"]):
-        print(" Password verification failed")
+        logger.info("Employee login failed: invalid password", extra={"email": email})
         return None 
-    
-    print("Password verified, creating access token")
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRES_MIN)
 
@@ -45,26 +44,64 @@ def login_employee(db:Database, email: str, password: str):
 #------------------ GET OWN FULL PROFILE --------------------------------
 def get_employee_profile(db: Database, email: str):                # Employee/Manager can view their own full profile
     # Allow both employees and managers
-    employee = db["employee_db"].find_one({"email": email, "role": {"$in": ["employee", "manager"]}}, {"password": 0})
+    employee = load_profile(db, {"email": email, "role": {"$in": ["employee", "manager"]}})
     if employee:
         employee["_id"] = str(employee["_id"])
     return employee
 
+def get_profile_version(db: Database, email: str):
+    return db["employee_db"].find_one({"email": email, "role": {"$in": ["employee", "manager"]}}, {"version": 1, "updated_at": 1})
+
 #-------------------UPDATE OWN PROFILE ------------------------------------
 def update_employee_self(db: Database, email: str, update_data: dict):         
     # Allow both employees and managers to update their profile
-    return db["employee_db"].update_one(
+    result = db["employee_db"].update_one(
         {"email": email, "role": {"$in": ["employee", "manager"]}},
-        {"$set": update_data}
+        versioned({"$set": update_data})
     )
+    invalidate_tags(db, employee_email_tag(email), EMPLOYEES_TAG)
+    return result
 
 #------------------ UPDATE CURRENT ADDRESS --------------------------------
 def update_employee_address(db: Database, email: str, address_data: dict):
     # Allow both employees and managers to update address
-    return db["employee_db"].update_one(
-        {"email": email, "role": {"$in": ["employee", "manager"]}},
-        {"$set": {"current_address": address_data}}
-    )
+    employee = db["employee_db"].find_one({"email": email, "role": {"$in": ["employee", "manager"]}}, {"_id": 1})
+    if not employee:
+        return None
+    result = db[ADDRESS_COLLECTION].update_one({"_id": employee["_id"]}, {"$set": {"current_address": address_data}}, upsert=True)
+    if result.modified_count or result.upserted_id:                  # version only moves when the address did
+        touch_employee(db, {"_id": employee["_id"]})
+        invalidate_tags(db, employee_email_tag(email), EMPLOYEES_TAG)
+    return result
+
+#=========================DASHBOARD (one query each, run concurrently by the route) ================
+DASHBOARD_ATTENDANCE_DAYS = 30
+DASHBOARD_PROFILE_PROJECTION = {"first_name": 1, "last_name": 1, "email": 1, "role": 1, "status": 1, "phone": 1,
+                                "job_info": 1, "version": 1, "updated_at": 1}
+
+def get_dashboard_profile(db: Database, email: str):
+    employee = db["employee_db"].find_one({"email": email, "role": {"$in": ["employee", "manager"]}}, DASHBOARD_PROFILE_PROJECTION)
+    if employee:
+        employee["_id"] = str(employee["_id"])
+    return employee
+
+def get_dashboard_leave_balance(db: Database, employee_id: str):
+    return get_leave_balance(db, employee_id) or {}
+
+def get_recent_attendance(db: Database, employee_id: str, days: int = DASHBOARD_ATTENDANCE_DAYS):
+    today = datetime.combine(date.today(), datetime.min.time())
+    query = {"employee_id": employee_id, "date": {"$gte": today - timedelta(days=days - 1), "$lt": today + timedelta(days=1)}}
+    records = db["attendance_db"].find(query, {"_id": 0, "employee_id": 0, "email": 0}).sort("date", -1)
+    return [serialize_attendance(record) for record in records]            # no per-record employee lookup: it's the caller
+
+def get_pending_leaves(db: Database, employee_id: str):
+    return [serialize_leave(leave) for leave in db["leave_db"].find({"employee_id": employee_id, "status": "Pending"})]
+
+def get_pending_budget_requests(db: Database, employee_id: str):
+    requests = list(db["budget_request_db"].find({"employee_id": employee_id, "status": "Pending"}))
+    for request in requests:
+        request["_id"] = str(request["_id"])
+    return requests
 
 #=========================ATTENDANCE================================================
 #CHECK--------------------VIEW OWN ATTENDANCE --------------------------------------
@@ -88,32 +125,34 @@ def create_employee_leave(db: Database, employee_id: str, leave_data: dict):
     if "end_date" in leave_data and isinstance(leave_data["end_date"], date):
         leave_data["end_date"] = datetime.combine(leave_data["end_date"], datetime.min.time())
 
-    # 1: Get employee's leave balance
-    employee = db["employee_db"].find_one({"_id": ObjectId(employee_id)})
+    # 1: Get employee's reporting manager
+    employee = db["employee_db"].find_one({"_id": ObjectId(employee_id)}, {"job_info.reporting_manager": 1})
     if not employee:
         raise ValueError("Employee not found")
     
     # 2: Get reporting manager id
-    manager_id = employee["job_info"].get("reporting_manager")
+    manager_id = (employee.get("job_info") or {}).get("reporting_manager")
     if not manager_id:
         raise ValueError("No reporting manager assigned to employee")
     
     leave_type = leave_data.get("leave_type").lower()
-    total = employee["leave_balance"].get(f"{leave_type}", 0)
-    used = employee["leave_balance"].get(f"{leave_type}_used", 0)
 
     #3. Calculate number of days leave requested
     start_date = leave_data.get("start_date")
     end_date = leave_data.get("end_date")
     day_requested = (end_date - start_date).days + 1
     
-    #4. Check if enough leave balance is available
-    if used + day_requested > total:            
-        raise ValueError(f"Not enough {leave_type} balance. Available: {total - used} days")
+    #4. Reserve the days: the availability check and the reservation are one conditional update
+    leave_id = ObjectId()                     # known up front so the ledger's reserve event names the leave
+    if not reserve_leave_days(db, employee_id, leave_type, day_requested, leave_id):
+        balance = get_leave_balance(db, employee_id) or {}                    # only to explain the refusal
+        available = balance.get(leave_type, 0) - balance.get(f"{leave_type}_used", 0) - balance.get(f"{leave_type}_pending", 0)
+        raise ValueError(f"Not enough {leave_type} balance. Available: {max(available, 0)} days")
     
     #5.IMPORTANT FIX: Store both IDs as STRINGS for consistency
     # This matches how manager queries (using string user_id)
     leave_data.update({
+        "_id": leave_id,
         "employee_id": str(employee_id),      # Always string
         "manager_id": str(manager_id),        # Always string - THIS IS THE FIX!
         "status": "Pending",
@@ -122,10 +161,17 @@ def create_employee_leave(db: Database, employee_id: str, leave_data: dict):
         "approved_by": None,
         "approved_date": None,
         "remarks": None,
-        "days_requested": day_requested
+        "days_requested": day_requested,
+        "reserved": True                      # days are held in {type}_pending until the decision
     })
     
-    result = db["leave_db"].insert_one(leave_data)
+    try:
+        result = db["leave_db"].insert_one(leave_data)
+    except Exception:
+        settle_leave_days(db, employee_id, leave_type, day_requested, approved=False, reserved=True, leave_id=leave_id)   # give the days back
+        raise
+    touch_employee(db, {"_id": ObjectId(employee_id)})                          # pending days show in the profile balance
+    invalidate_tags(db, employee_tag(employee_id))
     return str(result.inserted_id)
 
 
@@ -137,12 +183,20 @@ def get_employee_leaves(db:Database, employee_id: str):
 
 #------------------------CANCEL LEAVE---------------------------------------------------
 def cancel_leave_request(db: Database, employee_id: str, leave_id: str):
-    result = db["leave_db"].delete_one({
+    """Delete an own pending leave in one filtered delete: returns (True, None) or (False, (reason, current status))"""
+    leave = db["leave_db"].find_one_and_delete({
         "_id": ObjectId(leave_id), 
         "employee_id": employee_id, 
         "status": "Pending"
-    })
-    return result.deleted_count
+    }, projection={"leave_type": 1, "days_requested": 1, "reserved": 1})
+    if leave is None:
+        return False, leave_failure_reason(db, leave_id, "employee_id", employee_id)
+    if leave.get("reserved"):                                                   # release the days apply reserved
+        settle_leave_days(db, employee_id, leave["leave_type"], leave["days_requested"], approved=False, reserved=True,
+                          leave_id=leave_id)
+        touch_employee(db, {"_id": ObjectId(employee_id)})
+    invalidate_tags(db, leave_tag(leave_id), employee_tag(employee_id))
+    return True, None
 
 #----------------------- UPDATE LEAVE STATUS (Not used in Employee module) --------------
 def update_leave_status(db: Database, leave_id: str, update_data: dict):
@@ -150,6 +204,7 @@ def update_leave_status(db: Database, leave_id: str, update_data: dict):
         {"_id": ObjectId(leave_id)},
         {"$set": update_data}
     )
+    invalidate_tags(db, leave_tag(leave_id))
     return result.modified_count > 0
 
 #=======================BUDGET REQUEST MODULE======================================================
@@ -165,7 +220,7 @@ def create_budget_request(db: Database,employee_id: str, request_data:dict):
         raise ValueError("No reporting manager assigned to this employee")
     
     # Get manager details
-    manager = db["employee_db"].find_one({"_id": ObjectId(manager_id)})
+    manager = db["employee_db"].find_one({"email": manager_id}, {"_id": 1})      # reporting_manager holds the manager's email
     if not manager:
         raise ValueError("Reporting manager not found in system")
     
@@ -183,21 +238,24 @@ def create_budget_request(db: Database,employee_id: str, request_data:dict):
         "remarks": None
     })
     result = db["budget_request_db"].insert_one(request_data)
+    invalidate_budget_analytics(db, request_data["created_at"])
     return str(result.inserted_id)
 
 #----------------------GET MY BUDGET REQUESTS -------------------------------------------------
 def get_employee_budget_requests(db: Database, employee_id: str):
-        requests = list(db["budget_requests"].find({"employee_id": employee_id}))
+        requests = list(db["budget_request_db"].find({"employee_id": employee_id}))      # same collection create_budget_request writes to
         return requests
             
 #----------------------CANCEL BUDGET REQUEST ---------------------------------------------------
 def cancel_budget_request(db: Database, employee_id: str, request_id: str):
-    result = db["budget_requests"].delete_one({
-        "_id": ObjectId(request_id),
-        "employee_id": employee_id,
-        "status": "Pending"
-    })
-    return result.deleted_count
+    deleted = db["budget_request_db"].find_one_and_delete(
+        {"_id": ObjectId(request_id), "employee_id": employee_id, "status": "Pending"},
+        projection={"created_at": 1}                                        # needed to know which month summary is now stale
+    )
+    if not deleted:
+        return 0
+    invalidate_budget_analytics(db, deleted.get("created_at"))
+    return 1
 
 
 
@@ -1,16 +1,24 @@
-from fastapi import APIRouter, Depends, Response, status, UploadFile, File , Form
+from fastapi import APIRouter, Depends, Response, Request, status, UploadFile, File , Form
 from pymongo.database import Database
 from app.HR import crud as hr_crud
 from app.database import get_db  
 from app.Auth.helper import get_current_user
-from app.Employees.crud import login_employee,get_employee_profile,update_employee_self,update_employee_address,get_attendance_records,create_employee_leave,get_employee_leaves,cancel_leave_request,create_budget_request
+from app.Employees.crud import (get_dashboard_profile, get_dashboard_leave_balance, get_recent_attendance, get_pending_leaves,
+                                get_pending_budget_requests)
+from app.Employees.crud import login_employee,get_employee_profile,get_profile_version,update_employee_self,update_employee_address,get_attendance_records,create_employee_leave,get_employee_leaves,cancel_leave_request,create_budget_request
 from app.Employees.schemas import EmployeeLogin,EmployeeSelfUpdate,EmployeeAddressUpdate,EmployeeLeaveRequest,EmployeeBudgetRequest
-from app.common.utils import get_leave_request_by_id
+from app.common.utils import LEAVE_NOT_FOUND, LEAVE_FORBIDDEN
+from app.common.logger import get_logger
+from app.common.profiler import ProfiledRoute, profiled
+from app.common.http_cache import document_etag, not_modified_response, set_validators
+import asyncio
 import os
 import shutil
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)                 # sync endpoints show up in request profiles
+logger = get_logger(__name__)
 
 @router.post("/employee_login")
 def employee_login(payload: EmployeeLogin, res: Response, db: Database = Depends(get_db)):
@@ -28,30 +36,74 @@ def employee_login(payload: EmployeeLogin, res: Response, db: Database = Depends
 #===================HOME PAGE ============================================================================
 #------------------ GET OWN FULL PROFILE -----------------------------------------------------------------
 @router.get("/profile")
-def get_my_profile(res: Response,current_user: dict = Depends(get_current_user),db: Database = Depends(get_db)):
+def get_my_profile(request: Request, res: Response,current_user: dict = Depends(get_current_user),db: Database = Depends(get_db)):
     try:
         if current_user.get("role") not in ["employee", "manager"]:  #manager
             res.status_code = status.HTTP_403_FORBIDDEN
             return {"message": "Access denied, Not authorized"}
         
+        current = get_profile_version(db, current_user["email"])           # version-only projection; 304 skips the full read
+        if current:
+            unchanged = not_modified_response(request, "/employees/profile", document_etag("profile", current), current.get("updated_at"))
+            if unchanged:
+                return unchanged
+
         profile = get_employee_profile(db, current_user["email"])   #will check the email of logged in user and fetch its profile 
         if not profile:
             res.status_code = status.HTTP_404_NOT_FOUND
             return{"message": "Profile not found"}  
         
+        set_validators(res, "/employees/profile", document_etag("profile", profile), profile.get("updated_at"))
         res.status_code = status.HTTP_200_OK
         return{
             "message": "Profile fetched successfully",
             "profile": profile
         }
     except Exception as e:
-        print(f"Profile fetch error: {str(e)}")
+        logger.exception("Profile fetch error")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {
             "message": "An error occurred while fetching the profile",
             "error":f"Error: {str(e)}"       
             }
     
+#------------------ HOME PAGE IN ONE CALL ----------------------------------------------------------------
+@router.get("/dashboard")
+async def get_my_dashboard(res: Response, current_user: dict = Depends(get_current_user), db: Database = Depends(get_db)):
+    if current_user.get("role") not in ["employee", "manager"]:
+        res.status_code = status.HTTP_403_FORBIDDEN
+        return {"message": "Access denied, Not authorized"}
+
+    try:
+        employee_id = str(current_user["_id"])
+        # the five reads are independent: run them side by side on the threadpool instead of one after another
+        profile, leave_balance, attendance, pending_leaves, pending_budget_requests = await asyncio.gather(
+            run_in_threadpool(profiled(get_dashboard_profile), db, current_user["email"]),
+            run_in_threadpool(profiled(get_dashboard_leave_balance), db, employee_id),
+            run_in_threadpool(profiled(get_recent_attendance), db, employee_id),
+            run_in_threadpool(profiled(get_pending_leaves), db, employee_id),
+            run_in_threadpool(profiled(get_pending_budget_requests), db, employee_id),
+        )
+        if not profile:
+            res.status_code = status.HTTP_404_NOT_FOUND
+            return {"message": "Profile not found"}
+
+        res.status_code = status.HTTP_200_OK
+        return {
+            "message": "Dashboard fetched successfully",
+            "data": {
+                "profile": profile,
+                "leave_balance": leave_balance,
+                "attendance": attendance,
+                "pending_leaves": pending_leaves,
+                "pending_budget_requests": pending_budget_requests,
+            },
+        }
+    except Exception:
+        logger.exception("Dashboard fetch error")
+        res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"message": "An error occurred while fetching the dashboard"}
+
 #-------------------UPDATE PERSONAL PROFILE INFO ---------------------------------------------------------
 @router.put("/profile/personal_info")
 def update_my_profile( payload: EmployeeSelfUpdate,res: Response, current_user: dict = Depends(get_current_user), db: Database = Depends(get_db)):
@@ -96,7 +148,10 @@ def update_my_address(payload: EmployeeAddressUpdate,res: Response,current_user:
              return {"message": "No address data provided for update"}
         
         result = update_employee_address(db, current_user["email"], address_data)
-        if result.modified_count == 0:
+        if result is None:
+             res.status_code = status.HTTP_404_NOT_FOUND
+             return {"message": "Profile not found"}
+        if result.modified_count == 0 and result.upserted_id is None:
              res.status_code = status.HTTP_400_BAD_REQUEST
              return {"message": "No changes made to the address"}
         
@@ -148,14 +203,9 @@ def apply_leave(payload: EmployeeLeaveRequest, res: Response, current_user: dict
         return {"message": "Access denied"}
     
     try:
-        # Get employee profile to get employee_id
-        profile = hr_crud.get_by_email(db, current_user["email"])
-        if not profile:
-            res.status_code = status.HTTP_404_NOT_FOUND
-            return {"message": "Employee profile not found"}
-        
-        employee_id = str(profile["_id"])
-        employee_name = f"{profile.get('first_name', '')} {profile.get('last_name', '')}".strip()   #will get first name and last name(if exist) from profile and concatenate them with a space in between. and strip() is used to remove any leading or trailing spaces.
+        # The authenticated employee document already has the id and name, no second lookup
+        employee_id = str(current_user["_id"])
+        employee_name = f"{current_user.get('first_name') or ''} {current_user.get('last_name') or ''}".strip()   #will get first name and last name(if exist) from profile and concatenate them with a space in between. and strip() is used to remove any leading or trailing spaces.
         
         # Create leave request data
         leave_data = payload.model_dump()                                                          #model_dump() in old python version was written as model.dict() ..means convert pydantic model (mtlb schema) to a dict so that data can be easily sent to database into dict form.
@@ -176,7 +226,7 @@ def apply_leave(payload: EmployeeLeaveRequest, res: Response, current_user: dict
         return {"message": str(ve)}             #str(ve) will convert the ValueError exception msg to string. So the exact text inside raise ValueError("...") from crud.py 112 is what the user will see in the response message.
     
     except Exception as e:
-        print(f"Leave application error: {str(e)}")
+        logger.exception("Leave application error")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to submit leave request. Please try again."}
 
@@ -218,35 +268,20 @@ def cancel_leave(leave_id: str, res: Response, current_user: dict = Depends(get_
         return {"message": "Access denied"}
 
     try:
-        # Get employee profile
-        profile = hr_crud.get_by_email(db, current_user["email"])
-        if not profile:
-            res.status_code = status.HTTP_404_NOT_FOUND
-            return {"message": "Employee profile not found"}
-        
-        employee_id = str(profile["_id"])
-        
-        # Get leave to verify 
-        leave = get_leave_request_by_id(db, leave_id)
-        if not leave:
-            res.status_code = status.HTTP_404_NOT_FOUND
-            return {"message": "Leave request not found"}
-        
-        # Check if leave belongs to this employee
-        if leave.get("employee_id") != employee_id:                                  #leave is that dictionary representing the leave request.
-            res.status_code = status.HTTP_403_FORBIDDEN
-            return {"message": "You can only cancel your own leave requests"}
-        
-        # Check if leave is still pending
-        if leave.get("status") != "Pending":
-            res.status_code = status.HTTP_400_BAD_REQUEST
-            return {"message": f"Cannot cancel leave with status: {leave.get('status')}"}
+        employee_id = str(current_user["_id"])           # the authenticated employee document, no second lookup
         
-        # Delete the leave request
-        deleted_count = cancel_leave_request(db, employee_id, leave_id)
-        if deleted_count == 0:
+        # Delete only if it is ours and still pending; the reason is looked up only when nothing was deleted
+        cancelled, failure = cancel_leave_request(db, employee_id, leave_id)
+        if not cancelled:
+            reason, current_status = failure
+            if reason == LEAVE_NOT_FOUND:
+                res.status_code = status.HTTP_404_NOT_FOUND
+                return {"message": "Leave request not found"}
+            if reason == LEAVE_FORBIDDEN:
+                res.status_code = status.HTTP_403_FORBIDDEN
+                return {"message": "You can only cancel your own leave requests"}
             res.status_code = status.HTTP_400_BAD_REQUEST
-            return {"message": "Failed to cancel leave request"}
+            return {"message": f"Cannot cancel leave with status: {current_status}"}
         
         res.status_code = status.HTTP_200_OK
         return {"message": "Leave request cancelled successfully"}
@@ -328,7 +363,7 @@ async def create_request(
         return {"message": str(ve)}
     
     except Exception as e:
-        print(f"Budget request error: {str(e)}")
+        logger.exception("Budget request error")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {
             "message": "Failed to submit budget request. Please try again.",
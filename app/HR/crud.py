@@ -1,3 +1,6 @@
+import os
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from pymongo.database import Database
 from app.HR.schemas import EmployeeRegister
 from fastapi import status
@@ -6,33 +9,43 @@ from typing import Optional, Dict
 from bson.errors import InvalidId
 from .schemas import EmployeeSearch
 from datetime import datetime, date
-from app.common.utils import serialize_leave, serialize_attendance
+from app.common.utils import (serialize_leave, serialize_attendance, versioned, leave_failure_reason, LEAVE_NOT_FOUND,
+                              LEAVE_FORBIDDEN, LEAVE_WRONG_STATUS, LEAVE_UNCHANGED)
+from app.HR import org_chart
+from app.database import has_index, supports_transactions
+from app.common import profile_sections, leave_ledger
+from app.common.profile_sections import (ARRAY_SECTIONS, ADDRESS_COLLECTION, LEAVE_BALANCE_COLLECTION, DEFAULT_LEAVE_BALANCE,
+                                         LEAVE_TRANSACTIONS, load_profile, update_section, touch_employee, settle_leave_days)
+from app.common.cache import (TTLCache, cached, invalidate_tags, EMPLOYEES_TAG, employee_tag, employee_email_tag,
+                              leave_tag)
+from app.common.logger import get_logger
+
+logger = get_logger(__name__)
 
 #---------------Create employee--------------------------------------------------
 def create_employee(db: Database, employee: EmployeeRegister, hashed_password: str):
-    existing_employee = db["employee_db"].find_one({"email": employee.email})
-    if existing_employee:
-        return {
-            "status": status.HTTP_400_BAD_REQUEST,
-            "message": "Employee already exists"
-        }
-    
     employee_data = employee.model_dump()            #convert pydantic model to dict as mongodb only accepts dict
     employee_data["password"] = hashed_password      #password saved in DB 
     employee_data["status"] = "active"               #Set default active status for new employees
-
-    employee_data["leave_balance"] = {
-        "annual": 12,
-        "sick": 6,
-        "personal": 3,
-        "emergency": 2,
-
-        "annual_used": 0,
-        "sick_used": 0,
-        "personal_used": 0,
-        "emergency_used": 0,
-    }
-    db["employee_db"].insert_one(employee_data)
+    employee_data["org_path"] = org_chart.path_under(db, (employee_data.get("job_info") or {}).get("reporting_manager"))
+    employee_data["org_depth"] = len(employee_data["org_path"])
+    employee_data["version"] = 1
+    employee_data["updated_at"] = datetime.utcnow()
+
+    sections = profile_sections.split_sections(employee_data)              # stored next to, not inside, employee_db
+    sections[LEAVE_BALANCE_COLLECTION] = {**DEFAULT_LEAVE_BALANCE, leave_ledger.BACKFILLED_FLAG: True}   # opening events below
+    exists = {"status": status.HTTP_400_BAD_REQUEST, "message": "Employee already exists"}
+    if not has_index(db, "employee_db", "email_1"):                         # index not built (yet): check by hand
+        logger.warning("Unique email index missing, checking for duplicates before the insert")
+        if db["employee_db"].find_one({"email": employee_data["email"]}, {"_id": 1}):
+            return exists
+    try:
+        inserted = db["employee_db"].insert_one(employee_data)                 # unique email_1 index: no find_one first
+    except DuplicateKeyError:
+        return exists
+    profile_sections.insert_sections(db, inserted.inserted_id, sections)
+    leave_ledger.append_events(db, leave_ledger.opening_events(inserted.inserted_id, DEFAULT_LEAVE_BALANCE, note="joining allowance"))
+    invalidate_tags(db, EMPLOYEES_TAG, employee_email_tag(employee.email))
 
     response_data = employee.model_dump(exclude={"password"})       #excluding password from API response 
     return {
@@ -70,15 +83,67 @@ def get_all_employees(db:Database):
         return employees
 
 #---------------GET employee by ID--------------------------------------------------
+@cached(tags=lambda employee_id: [employee_tag(employee_id)],
+        result_tags=lambda employee: [employee_email_tag(employee.get("email"))])
 def get_employee_by_id(db: Database, employee_id: str) -> Optional[Dict]:
     try:
-        employee = db["employee_db"].find_one({"_id": ObjectId(employee_id)},{"password": 0})
+        employee = load_profile(db, {"_id": ObjectId(employee_id)})          # full profile: employee + its sections
         if employee:
             employee["_id"] = str(employee["_id"])
         return employee
     except InvalidId:
          return None 
 
+#---------------GET many employees in one query (batch-get) --------------------------------
+def get_employees_batch(db: Database, ids: list, emails: list, fields: Optional[list] = None) -> dict:
+    """One $in aggregate (sections joined) for all ids/emails; results follow the input order (ids first), unknown keys are reported"""
+    ids = list(dict.fromkeys(ids))                                         # de-duplicate, keep order
+    emails = list(dict.fromkeys(email.lower() for email in emails))
+    object_ids, invalid = {}, []
+    for employee_id in ids:
+        if ObjectId.is_valid(employee_id):
+            object_ids[employee_id] = ObjectId(employee_id)
+        else:
+            invalid.append(employee_id)
+
+    branches = []
+    if object_ids:
+        branches.append({"_id": {"$in": list(object_ids.values())}})
+    if emails:
+        branches.append({"email": {"$in": emails}})
+    if fields:
+        fields = [*fields, "email"]                                        # needed to match email keys back
+    found = profile_sections.load_profiles(db, {"$or": branches}, fields) if branches else []
+
+    by_id = {str(employee["_id"]): employee for employee in found}
+    by_email = {employee.get("email"): employee for employee in found}
+    employees, missing_ids, missing_emails = [], [], []
+    for employee_id in object_ids:
+        if employee_id in by_id:
+            employees.append(by_id[employee_id])
+        else:
+            missing_ids.append(employee_id)
+    for email in emails:
+        if email in by_email:
+            employees.append(by_email[email])
+        else:
+            missing_emails.append(email)
+    employees = [{**employee, "_id": str(employee["_id"])} for employee in employees]
+    return {"employees": employees, "missing_ids": missing_ids, "missing_emails": missing_emails, "invalid_ids": invalid}
+
+#---------------VERSION ONLY (conditional GET, see app/common/http_cache.py) ---------------
+def get_employee_version(db: Database, employee_id: str) -> Optional[Dict]:
+    try:
+        return db["employee_db"].find_one({"_id": ObjectId(employee_id)}, {"version": 1, "updated_at": 1})
+    except InvalidId:
+        return None
+
+def get_employees_list_version(db: Database) -> tuple:
+    """(count, newest updated_at) of the list get_all_employees returns: any insert or write changes one of them"""
+    query = {"role": {"$in": ["employee", "manager"]}}
+    newest = db["employee_db"].find_one(query, {"updated_at": 1}, sort=[("updated_at", -1)])
+    return db["employee_db"].count_documents(query), (newest or {}).get("updated_at")
+
 #---------------GET employee by EMAIL------------------------------------------------
 def get_by_email(db: Database, email: str) -> Optional[Dict]:
         employee = db["employee_db"].find_one({"email": email.lower()}, {"password": 0})
@@ -87,62 +152,162 @@ def get_by_email(db: Database, email: str) -> Optional[Dict]:
         return employee
 
 
+#---------------GET leave balance------------------------------------------------
+@cached(tags=lambda employee_id, as_of=None: [employee_tag(employee_id)])
+def get_leave_balance(db: Database, employee_id: str, as_of: Optional[datetime] = None) -> Optional[Dict]:
+    if as_of is not None:                                                 # point in time: only the ledger knows
+        return leave_ledger.get_ledger_balance(db, employee_id, as_of)
+    return profile_sections.get_leave_balance(db, employee_id)
+
+def adjust_leave_allowance(db: Database, employee_id: str, event: str, leave_type: str, days: int,
+                           note: Optional[str] = None) -> Optional[bool]:
+    """Grant, accrual or rollover: move the allowance counter the reservation checks and record the event.
+    None when the employee does not exist, False when a negative rollover would go below the days used or reserved"""
+    if not profile_sections.adjust_allowance(db, employee_id, event, leave_type, days, note):
+        return None if db["employee_db"].find_one({"_id": ObjectId(employee_id)}, {"_id": 1}) is None else False
+    touch_employee(db, {"_id": ObjectId(employee_id)})                     # profile ETag covers the balance
+    invalidate_tags(db, employee_tag(employee_id))
+    return True
+
+
+def _invalidate_employee(db: Database, employee_id: str):
+    invalidate_tags(db, employee_tag(employee_id), EMPLOYEES_TAG)         # detail, leave balance and search results
+
 # ---------------- Basic Info ---------------------------------------------------
 def update_employee_basic(db: Database, employee_id: str, update_data: dict):
-    return db["employee_db"].update_one(
+    result = db["employee_db"].update_one(
         {"_id": ObjectId(employee_id)},
-        {"$set": update_data}
+        versioned({"$set": update_data})
     )
+    _invalidate_employee(db, employee_id)
+    return result
 
 # ---------------- Current Address ----------------------------------------------
 def update_current_address(db: Database, employee_id: str, address_data: dict):
-    return db["employee_db"].update_one(
-        {"_id": ObjectId(employee_id)},
-        {"$set": {"current_address": address_data}}
-    )
+    result = update_section(db, employee_id, ADDRESS_COLLECTION, {"$set": {"current_address": address_data}})
+    _invalidate_employee(db, employee_id)
+    return result
 
 # ---------------- Permanent Address ---------------------------------------------
 def update_permanent_address(db: Database, employee_id: str, address_data: dict):
-    return db["employee_db"].update_one(
-        {"_id": ObjectId(employee_id)},
-        {"$set": {"permanent_address": address_data}}
-    )
+    result = update_section(db, employee_id, ADDRESS_COLLECTION, {"$set": {"permanent_address": address_data}})
+    _invalidate_employee(db, employee_id)
+    return result
 
 # ---------------- Job Info ----------------------------------------------------
 def update_job_info(db: Database, employee_id: str, job_data: dict):
-    return db["employee_db"].update_one(
+    previous = db["employee_db"].find_one({"_id": ObjectId(employee_id)}, {"email": 1, "job_info.reporting_manager": 1})
+    old_manager = ((previous or {}).get("job_info") or {}).get("reporting_manager")
+    new_manager = job_data.get("reporting_manager")
+    manager_changed = previous is not None and old_manager != new_manager
+    if manager_changed:
+        new_path = org_chart.validate_move(db, previous["email"], new_manager)   # before writing: unknown manager / cycle
+    result = db["employee_db"].update_one(
         {"_id": ObjectId(employee_id)},
-        {"$set": {"job_info": job_data}}
+        versioned({"$set": {"job_info": job_data}})
     )
+    if manager_changed:
+        org_chart.move_employee(db, previous["email"], new_manager, new_path)    # keeps org_path of the whole subtree in sync
+    _invalidate_employee(db, employee_id)
+    return result
 
 
 # ---------------- Education -----------------------------------------------------
 def add_education(db: Database, employee_id: str, edu_data: dict):
-    return db["employee_db"].update_one(
-        {"_id": ObjectId(employee_id)},
-        {"$push": {"education": edu_data}}                      #$push automatically appends a new element at the end of the education array...You don’t need an index, because MongoDB just adds it at the next available position. 
-    )
+    result = update_section(db, employee_id, ARRAY_SECTIONS["education"],
+        {"$push": {"education": edu_data}})            #$push automatically appends a new element at the end of the education array...You don’t need an index, because MongoDB just adds it at the next available position. 
+    _invalidate_employee(db, employee_id)
+    return result
 
 def update_education(db: Database, employee_id: str, edu_index: int, edu_data: dict):
-    return db["employee_db"].update_one(
-        {"_id": ObjectId(employee_id)},
-        {"$set": {f"education.{edu_index}": edu_data}}          #$set operator is used to add new fields or update the values of existing fields within a document. It is a commonly used update operator
-    )
+    result = update_section(db, employee_id, ARRAY_SECTIONS["education"],
+        {"$set": {f"education.{edu_index}": edu_data}},   #$set operator is used to add new fields or update the values of existing fields within a document. It is a commonly used update operator
+        upsert=False)                                      # an index into a list that does not exist yet is not an upsert
+    _invalidate_employee(db, employee_id)
+    return result
 
 # ---------------- Work Experience -----------------------------------------------
 def add_work_experience(db: Database, employee_id: str, work_data: dict):
-    return db["employee_db"].update_one(
-        {"_id": ObjectId(employee_id)},
-        {"$push": {"work_experience": work_data}}     
-    )
+    result = update_section(db, employee_id, ARRAY_SECTIONS["work_experience"], {"$push": {"work_experience": work_data}})
+    _invalidate_employee(db, employee_id)
+    return result
 
 def update_work_experience(db: Database, employee_id: str, work_index: int, work_data: dict):
-    return db["employee_db"].update_one(
-        {"_id": ObjectId(employee_id)},
-        {"$set": {f"work_experience.{work_index}": work_data}}
-    )
+    result = update_section(db, employee_id, ARRAY_SECTIONS["work_experience"],
+                            {"$set": {f"work_experience.{work_index}": work_data}}, upsert=False)
+    _invalidate_employee(db, employee_id)
+    return result
+
+# ---------------- All sections at once (PATCH) -----------------------------------
+def _update_document(set_fields: dict, push_fields: dict) -> dict:
+    update = {}
+    if set_fields:
+        update["$set"] = set_fields
+    if push_fields:
+        update["$push"] = push_fields
+    return update
+
+def build_employee_patch(patch: dict) -> dict:
+    """Merge an EmployeePatch dump into one update document per collection (same fields the per-section updates write)"""
+    employee_fields = {**(patch.get("basic") or {}), **({"job_info": patch["job_info"]} if "job_info" in patch else {})}
+    updates = {"employee_db": _update_document(employee_fields, {})}
+    addresses = {field: patch[field] for field in ("current_address", "permanent_address") if field in patch}
+    if addresses:
+        updates[ADDRESS_COLLECTION] = {"$set": addresses}
+    for array, collection in ARRAY_SECTIONS.items():
+        set_fields = {f"{array}.{index}": entry for index, entry in (patch.get(f"update_{array}") or {}).items()}
+        push_fields = {array: {"$each": patch[f"add_{array}"]}} if patch.get(f"add_{array}") else {}
+        if set_fields or push_fields:
+            updates[collection] = _update_document(set_fields, push_fields)
+    return {collection: update for collection, update in updates.items() if update}
+
+def _write_employee_patch(db: Database, employee_id: str, updates: dict, move: Optional[tuple], session=None) -> bool:
+    # the employee_db write also bumps the version for section-only patches, and tells us whether the employee exists
+    result = db["employee_db"].update_one({"_id": ObjectId(employee_id)}, versioned(updates.get("employee_db", {})), session=session)
+    if result.matched_count == 0:
+        return False
+    sections = [(collection, update) for collection, update in updates.items() if collection != "employee_db"]
+    for collection, update in sorted(sections, key=lambda section: "$push" in section[1]):     # $set sections before pushes
+        # an address or a push can create the section document; "education.3" needs the array to be there already
+        db[collection].update_one({"_id": ObjectId(employee_id)}, update, upsert=collection == ADDRESS_COLLECTION or "$push" in update,
+                                  session=session)
+    if move:
+        org_chart.move_employee(db, *move, session=session)
+    return True
+
+def patch_employee(db: Database, employee_id: str, patch: dict) -> Optional[Dict]:
+    """Apply every section (one update per collection it touches) and return the updated employee (None if not found).
+    The sections live in several collections, so the writes are one transaction where the deployment supports them
+    (replica set / sharded cluster). On a standalone mongod a failure part-way leaves the patch half applied; every
+    write but the array pushes is a $set, and the pushes go last, so retrying the same patch converges unless a push
+    already landed (it would be added twice)."""
+    updates = build_employee_patch(patch)
+    if not updates:
+        raise ValueError("No changes provided")
+    move = None
+    if "job_info" in patch:                                                # reporting line may change: validate before writing
+        previous = db["employee_db"].find_one({"_id": ObjectId(employee_id)}, {"email": 1, "job_info.reporting_manager": 1})
+        if previous is None:
+            return None
+        new_manager = patch["job_info"].get("reporting_manager")
+        if ((previous.get("job_info") or {}).get("reporting_manager")) != new_manager:
+            move = (previous["email"], new_manager, org_chart.validate_move(db, previous["email"], new_manager))
+    if supports_transactions(db):
+        with db.client.start_session() as session:
+            found = session.with_transaction(lambda s: _write_employee_patch(db, employee_id, updates, move, s))
+    else:
+        found = _write_employee_patch(db, employee_id, updates, move)
+    if not found:
+        return None
+    _invalidate_employee(db, employee_id)
+    if move:
+        invalidate_tags(db, org_chart.ORG_TAG)                             # again, now that the move is committed
+    employee = load_profile(db, {"_id": ObjectId(employee_id)})          # the merged result, in one read
+    employee["_id"] = str(employee["_id"])
+    return employee
 
 #---------search employee by anything in SEARCH BAR-------------------------------
+@cached(tags=lambda search_params: [EMPLOYEES_TAG], ttl=60)
 def search_employees(db, search_params: EmployeeSearch):
     query = {}                                                #here query i used to store the search criteria like jaise agar first name me "ab" likha to wo abhay ko bhi laake dega
     search_dict = search_params.model_dump(exclude_none=True)  
@@ -172,17 +337,21 @@ def search_employees(db, search_params: EmployeeSearch):
 # ---------Activate/Deactivate employee---------------------
 def activate_employee(db: Database, employee_id: str):
     """Activate an employee (mark as active/at work)"""
-    return db["employee_db"].update_one(
+    result = db["employee_db"].update_one(
         {"_id": ObjectId(employee_id)},
-        {"$set": {"status": "active"}}          
+        versioned({"$set": {"status": "active"}})          
     )
+    _invalidate_employee(db, employee_id)
+    return result
 
 def deactivate_employee(db: Database, employee_id: str):
     """Deactivate an employee (soft delete / mark as inactive)"""
-    return db["employee_db"].update_one(
+    result = db["employee_db"].update_one(
         {"_id": ObjectId(employee_id)},
-        {"$set": {"status": "inactive"}}
+        versioned({"$set": {"status": "inactive"}})
     )
+    _invalidate_employee(db, employee_id)
+    return result
 
 # ===================ATTENDANCE===============================================================
 # -----------ADD ATTENDANCE-------------------------------------
@@ -268,49 +437,316 @@ def get_all_leave_requests(db: Database, query: Optional[dict] = None):
 #     #         leave["end_date"] = leave["end_date"].isoformat()
 #     # return leaves"""
 
- #-----------------------UPDATE LEAVE REQUEST-----------------------------------------------------
-def update_leave_status(db: Database, leave_id: str, update_data: dict, approver_id: str = None):    
-
-    leave_request = db["leave_db"].find_one({"_id": ObjectId(leave_id)})     # 1. Fetch leave request
-    if not leave_request:
-        return None 
+ #-----------------------LEAVE STATE MACHINE-----------------------------------------------------
+# A leave is decided once: Pending -> Approved | Rejected (cancelling deletes a Pending leave). Every decision is a
+# conditional write whose filter only matches a status the target can be reached from, so a double click or two
+# managers deciding at the same moment race on the same document and exactly one wins; only the winner charges
+# the balance. With LEAVE_TRANSACTIONS=true (replica set required) the decision and the charge commit together.
+LEAVE_TRANSITIONS = {"Pending": ("Approved", "Rejected")}
+LEAVE_DECISION_PROJECTION = {"employee_id": 1, "manager_id": 1, "leave_type": 1, "start_date": 1, "end_date": 1, "status": 1,
+                             "days_requested": 1, "reserved": 1}
+
+def leave_sources(new_status: str) -> list:
+    """Statuses a leave may be in for new_status to be a valid transition"""
+    return [source for source, targets in LEAVE_TRANSITIONS.items() if new_status in targets]
+
+def _leave_days(leave_request: dict) -> int:
+    start_date = leave_request.get("start_date")
+    end_date = leave_request.get("end_date")
+    if not start_date or not end_date or not leave_request.get("leave_type"):
+        raise ValueError("Invalid leave request data")
+    return (end_date - start_date).days + 1
+
+def _changes_balance(leave_request: dict, new_status: str) -> bool:
+    return new_status == "Approved" or bool(leave_request.get("reserved"))      # charge, or release what apply reserved
+
+def _decide_leave(db: Database, query: dict, update_data: dict, session=None) -> Optional[Dict]:
+    leave_request = db["leave_db"].find_one_and_update(query, {"$set": update_data}, projection=LEAVE_DECISION_PROJECTION,
+                                                       session=session)
+    if leave_request is None or not _changes_balance(leave_request, update_data["status"]):
+        return leave_request
+    employee = ObjectId(leave_request["employee_id"])         # the transition happened: settle the balance, once
+    settle_leave_days(db, employee, leave_request["leave_type"], leave_request.get("days_requested") or _leave_days(leave_request),
+                      approved=update_data["status"] == "Approved", reserved=bool(leave_request.get("reserved")),
+                      leave_id=leave_request["_id"], session=session)
+    touch_employee(db, {"_id": employee}, session=session)     # profile ETag covers the balance
+    return leave_request
 
-    approver_id = update_data.get("approved_by")         #if approved id provided, check authorization of approver   
+ #-----------------------UPDATE LEAVE REQUEST-----------------------------------------------------
+def update_leave_status(db: Database, leave_id: str, update_data: dict, approver_id: str = None):
+    """Decide a leave in one conditional write: returns (leave as it was, None), or (None, (reason, current status))"""
+    new_status = update_data.get("status")
+    sources = leave_sources(new_status)
+    if not sources:
+        raise ValueError(f"A leave cannot be set to {new_status}")
+    query = {"_id": ObjectId(leave_id), "status": {"$in": sources}}     # 1. the preconditions are part of the filter
+
+    approver_id = update_data.get("approved_by")         #if approved id provided, only the assigned manager may decide
     if approver_id:                                          
-        assigned_manager = leave_request.get("manager_id")
-        if assigned_manager and assigned_manager != approver_id:
-            raise ValueError("Not authorized to approve this leave request")
-        
-        
+        query["manager_id"] = approver_id
         update_data["approved_by"] = approver_id      #approved_by and approved_at to update_data
         update_data["approved_at"] = datetime.utcnow()
     
-    result = db["leave_db"].update_one(              #3. Update leave request
-        {"_id": ObjectId(leave_id)},
-        {"$set": update_data}
+    if LEAVE_TRANSACTIONS:                                #2. Update leave request (and the balance when approved)
+        with db.client.start_session() as session:
+            leave_request = session.with_transaction(lambda s: _decide_leave(db, query, update_data, s))
+    else:
+        leave_request = _decide_leave(db, query, update_data)
+    if leave_request is None:
+        reason, current_status = leave_failure_reason(db, leave_id, "manager_id", approver_id)
+        if reason == LEAVE_WRONG_STATUS and current_status == new_status:
+            reason = LEAVE_UNCHANGED                       # a repeat of the decision that already won
+        return None, (reason, current_status)
+
+    invalidate_tags(db, leave_tag(leave_id))
+    if _changes_balance(leave_request, new_status):
+        invalidate_tags(db, employee_tag(leave_request["employee_id"]))          # leave balance changed
+    return leave_request, None
+
+ #-----------------------DECIDE MANY LEAVES AT ONCE-----------------------------------------------------
+# The same state machine for a whole batch in a fixed number of round trips: one $in read for ownership and
+# status, one bulk_write of conditional updates, one $inc per affected employee and one version bump for all of
+# them. Every update still carries the transition preconditions, so a single-leave decision racing the batch
+# cannot make a leave be decided (or charged) twice: the winners are recognised by the batch's decision_batch stamp.
+def _decision_failure(leave: Optional[dict], new_status: str, approver_id: str) -> tuple:
+    if leave is None:
+        return LEAVE_NOT_FOUND, None
+    if leave.get("manager_id") != approver_id:
+        return LEAVE_FORBIDDEN, None                             # nothing about other managers' leaves
+    if leave.get("status") == new_status:
+        return LEAVE_UNCHANGED, leave.get("status")
+    return LEAVE_WRONG_STATUS, leave.get("status")
+
+def _apply_decisions(db: Database, candidates: list, approver_id: str, batch_id: ObjectId, session=None) -> list:
+    """Write the transitions and settle the balances; returns the (decision, leave) pairs this batch won"""
+    decided_at = datetime.utcnow()
+    writes = [UpdateOne({"_id": leave["_id"], "manager_id": approver_id, "status": {"$in": leave_sources(decision["status"])}},
+                        {"$set": {"status": decision["status"], "remarks": decision.get("remarks"), "approved_by": approver_id,
+                                  "approved_at": decided_at, "decision_batch": batch_id}})
+              for decision, leave in candidates]
+    result = db["leave_db"].bulk_write(writes, ordered=False, session=session)
+    won = candidates
+    if result.modified_count != len(candidates):                 # someone else decided some of them in between
+        stamped = {leave["_id"] for leave in db["leave_db"].find(
+            {"_id": {"$in": [leave["_id"] for _, leave in candidates]}, "decision_batch": batch_id}, {"_id": 1}, session=session)}
+        won = [(decision, leave) for decision, leave in candidates if leave["_id"] in stamped]
+
+    increments, events = {}, []                                  # employee -> one combined $inc; ledger events for all
+    for decision, leave in won:
+        if _changes_balance(leave, decision["status"]):
+            settlement = dict(leave_type=leave["leave_type"], days=leave.get("days_requested") or _leave_days(leave),
+                              approved=decision["status"] == "Approved", reserved=bool(leave.get("reserved")))
+            profile_sections.settlement_inc(**settlement, inc=increments.setdefault(ObjectId(leave["employee_id"]), {}))
+            events += leave_ledger.settlement_events(leave["employee_id"], **settlement, leave_id=leave["_id"])
+    if increments:
+        # balances still embedded in employee_db (not migrated) get their document before the $inc, never after:
+        # a document that appears in between (created by a concurrent request) would otherwise lose this batch's $inc
+        for employee in profile_sections.missing_leave_balances(db, list(increments), session=session):
+            profile_sections.ensure_leave_balance(db, employee, session=session)
+        db[LEAVE_BALANCE_COLLECTION].bulk_write([UpdateOne({"_id": employee}, {"$inc": inc})
+                                                 for employee, inc in increments.items()], ordered=False, session=session)
+        try:
+            leave_ledger.append_events(db, events, session=session)
+        except Exception:                                        # counters and ledger move together (see write_balance_change)
+            if session is None or not session.in_transaction:
+                db[LEAVE_BALANCE_COLLECTION].bulk_write([UpdateOne({"_id": employee}, {"$inc": {field: -days for field, days in inc.items()}})
+                                                         for employee, inc in increments.items()], ordered=False)
+            raise
+        db["employee_db"].update_many({"_id": {"$in": list(increments)}}, versioned({}), session=session)
+    return won
+
+def decide_leaves(db: Database, decisions: list, approver_id: str) -> list:
+    """Decide many leaves of one approver; returns one {leave_id, status, result, current_status} per decision"""
+    results = {decision["leave_id"]: {"leave_id": decision["leave_id"], "status": decision["status"]} for decision in decisions}
+    ids = {}
+    for decision in decisions:
+        try:
+            ids[decision["leave_id"]] = ObjectId(decision["leave_id"])
+        except (InvalidId, TypeError):
+            results[decision["leave_id"]].update(result=LEAVE_NOT_FOUND, current_status=None)
+
+    leaves = {str(leave["_id"]): leave
+              for leave in db["leave_db"].find({"_id": {"$in": list(ids.values())}}, LEAVE_DECISION_PROJECTION)}   # 1. ownership + status
+    candidates = []
+    for decision in decisions:
+        if decision["leave_id"] not in ids:
+            continue
+        leave = leaves.get(decision["leave_id"])
+        if leave is not None and leave.get("manager_id") == approver_id and leave.get("status") in leave_sources(decision["status"]):
+            candidates.append((decision, leave))
+        else:
+            reason, current_status = _decision_failure(leave, decision["status"], approver_id)
+            results[decision["leave_id"]].update(result=reason, current_status=current_status)
+
+    won = []
+    if candidates:                                                                           # 2. transitions + balances
+        batch_id = ObjectId()
+        if LEAVE_TRANSACTIONS:
+            with db.client.start_session() as session:
+                won = session.with_transaction(lambda s: _apply_decisions(db, candidates, approver_id, batch_id, s))
+        else:
+            won = _apply_decisions(db, candidates, approver_id, batch_id)
+    won_ids = {str(leave["_id"]) for _, leave in won}
+
+    lost = [decision for decision, _ in candidates if decision["leave_id"] not in won_ids]
+    if lost:                                                    # raced: report what the leave is now
+        current = {str(leave["_id"]): leave for leave in db["leave_db"].find(
+            {"_id": {"$in": [ids[decision["leave_id"]] for decision in lost]}}, {"manager_id": 1, "status": 1})}
+        for decision in lost:
+            reason, current_status = _decision_failure(current.get(decision["leave_id"]), decision["status"], approver_id)
+            results[decision["leave_id"]].update(result=reason, current_status=current_status)
+    for decision, leave in won:
+        results[decision["leave_id"]].update(result="decided", current_status=decision["status"])
+
+    if won:
+        invalidate_tags(db, *(leave_tag(str(leave["_id"])) for _, leave in won),
+                        *{employee_tag(leave["employee_id"]) for decision, leave in won if _changes_balance(leave, decision["status"])})
+    return [results[decision["leave_id"]] for decision in decisions]
+
+
+
+# ===================BUDGET ANALYTICS===============================================================
+# Closed months never change once the month is over (requests are only created "now"), so they are
+# aggregated once into budget_monthly_summary_db and historical queries read those small bucket docs
+# instead of rescanning budget_request_db. Only the open month is aggregated live.
+BUDGET_ANALYTICS_CACHE_TTL = int(os.getenv("BUDGET_ANALYTICS_CACHE_TTL", 300))
+BUDGET_ANALYTICS_MAX_MONTHS = 60
+budget_analytics_cache = TTLCache("budget_analytics", ttl=BUDGET_ANALYTICS_CACHE_TTL)
+
+PENDING_BUDGET_STATUSES = ["pending", "pending_manager"]
+BUDGET_COUNTERS = ["requests", "amount", "approved", "approved_amount", "rejected", "pending"]
+
+def _month_key(value: datetime) -> str:
+    return value.strftime("%Y-%m")
+
+def _month_start(month: str) -> datetime:
+    return datetime.strptime(month, "%Y-%m")
+
+def _add_months(month_start: datetime, months: int) -> datetime:
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return month_start.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+def _months_between(from_month: str, to_month: str) -> list:
+    months, current = [], _month_start(from_month)
+    while _month_key(current) <= to_month:
+        months.append(_month_key(current))
+        current = _add_months(current, 1)
+    return months
+
+def _budget_group_pipeline(match: dict) -> list:
+    status_value = {"$toLower": {"$ifNull": ["$status", ""]}}             # statuses are stored as "Pending" and as enum values like "approved"
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "month": {"$dateToString": {"format": "%Y-%m", "date": "$created_at"}},
+                "department": {"$ifNull": ["$department", ""]},
+                "category": {"$ifNull": ["$category", "Other"]},
+            },
+            "requests": {"$sum": 1},
+            "amount": {"$sum": "$amount"},
+            "approved": {"$sum": {"$cond": [{"$eq": [status_value, "approved"]}, 1, 0]}},
+            "approved_amount": {"$sum": {"$cond": [{"$eq": [status_value, "approved"]}, "$amount", 0]}},
+            "rejected": {"$sum": {"$cond": [{"$eq": [status_value, "rejected"]}, 1, 0]}},
+            "pending": {"$sum": {"$cond": [{"$in": [status_value, PENDING_BUDGET_STATUSES]}, 1, 0]}},
+        }},
+    ]
+
+def _flatten_bucket(row: dict) -> dict:
+    key = row.pop("_id")
+    return {**key, **row}
+
+def _build_monthly_buckets(db: Database, months: list) -> dict:
+    """Aggregate closed months once and store one summary doc per month"""
+    start = _month_start(months[0])
+    end = _add_months(_month_start(months[-1]), 1)
+    buckets = {month: [] for month in months}                             # months without requests are stored too, so they are never rescanned
+    for row in db["budget_request_db"].aggregate(_budget_group_pipeline({"created_at": {"$gte": start, "$lt": end}})):
+        bucket = _flatten_bucket(row)
+        month = bucket.pop("month")
+        if month in buckets:
+            buckets[month].append(bucket)
+
+    computed_at = datetime.utcnow()
+    db["budget_monthly_summary_db"].bulk_write(
+        [ReplaceOne({"_id": month}, {"buckets": rows, "computed_at": computed_at}, upsert=True) for month, rows in buckets.items()],
+        ordered=False,
     )
+    return buckets
+
+def _rollup(rows: list, field: Optional[str]) -> list:
+    totals: Dict[str, dict] = {}
+    for row in rows:
+        key = row[field] if field else "all"
+        entry = totals.setdefault(key, {counter: 0 for counter in BUDGET_COUNTERS})
+        for counter in BUDGET_COUNTERS:
+            entry[counter] += row.get(counter, 0)
+
+    result = []
+    for key, entry in sorted(totals.items()):
+        decided = entry["approved"] + entry["rejected"]
+        entry["approval_rate"] = round(entry["approved"] / decided, 4) if decided else None     # share of decided requests that were approved
+        if field:
+            entry[field] = key
+        result.append(entry)
+    return result
 
-    new_status = update_data.get("status")           #4. if approved, update employee leave balance
-    if new_status and new_status.lower() == "approved":
-        employee = leave_request["employee_id"]
-        leave_type = leave_request.get("leave_type").lower()
-        start_date = leave_request.get("start_date")
-        end_date = leave_request.get("end_date")
-        
-        if not start_date or not end_date or not leave_type:
-            raise ValueError("Invalid leave request data")
-
-        # Calculate number of days
-        days_requested = (end_date - start_date).days + 1
-
-         # Update leave balance
-        leave_balance_field = f"{leave_type}_used"
-        db["employee_db"].update_one(
-            {"_id": ObjectId(employee)},
-            {"$inc": {f"leave_balance.{leave_balance_field}": days_requested}})      #$inc operator increments the value of the field by the specified amount. If the field does not exist, it will be created and set to the specified value.
-  
+def get_budget_analytics(db: Database, department: Optional[str] = None, category: Optional[str] = None,
+                         from_month: Optional[str] = None, to_month: Optional[str] = None):
+    current_month = _month_key(datetime.now())
+    to_month = to_month or current_month
+    from_month = from_month or _month_key(_add_months(_month_start(to_month), -11))        # default: trailing 12 months
+    if from_month > to_month:
+        raise ValueError("from_month cannot be after to_month")
+
+    months = _months_between(from_month, to_month)
+    if len(months) > BUDGET_ANALYTICS_MAX_MONTHS:
+        raise ValueError(f"Date range cannot exceed {BUDGET_ANALYTICS_MAX_MONTHS} months")
+
+    cache_key = (department, category, from_month, to_month)
+    cached = budget_analytics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    #1. Closed months come from the precomputed buckets, missing ones are built once
+    closed_months = [month for month in months if month < current_month]
+    buckets = {doc["_id"]: doc["buckets"] for doc in db["budget_monthly_summary_db"].find({"_id": {"$in": closed_months}})}
+    missing = [month for month in closed_months if month not in buckets]
+    if missing:
+        buckets.update(_build_monthly_buckets(db, missing))
+    rows = [{"month": month, **bucket} for month in closed_months for bucket in buckets[month]]
+
+    #2. The open month is still changing, aggregate it live
+    if current_month in months:
+        match = {"created_at": {"$gte": _month_start(current_month), "$lt": _add_months(_month_start(current_month), 1)}}
+        if department:
+            match["department"] = department
+        if category:
+            match["category"] = category
+        rows.extend(_flatten_bucket(row) for row in db["budget_request_db"].aggregate(_budget_group_pipeline(match)))
+
+    rows = [row for row in rows
+            if (not department or row["department"] == department) and (not category or row["category"] == category)]
+    rows.sort(key=lambda row: (row["month"], row["department"], row["category"]))
+
+    result = {
+        "from_month": from_month,
+        "to_month": to_month,
+        "filters": {"department": department, "category": category},
+        "totals": _rollup(rows, None)[0] if rows else None,
+        "by_month": _rollup(rows, "month"),
+        "by_department": _rollup(rows, "department"),
+        "by_category": _rollup(rows, "category"),
+        "buckets": rows,
+    }
+    budget_analytics_cache.set(cache_key, result)
     return result
 
+def invalidate_budget_analytics(db: Database, created_at: Optional[datetime] = None):
+    """Called by every budget write; drops cached results and the summary of a closed month if it changed"""
+    budget_analytics_cache.clear()
+    if created_at and _month_key(created_at) < _month_key(datetime.now()):
+        db["budget_monthly_summary_db"].delete_one({"_id": _month_key(created_at)})
 
 
 """ Flow
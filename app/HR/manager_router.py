@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, Response , status
+from fastapi import APIRouter, Depends, Response , status, Query
 from pymongo.database import Database
 from app.database import get_db
 from app.Auth.helper import get_current_user
-from app.HR.schemas import LeaveApproval
-from app.HR.crud import get_all_leave_requests,update_leave_status
+from app.HR.schemas import LeaveApproval, LeaveDecisionBatch
+from app.HR.crud import get_all_leave_requests,update_leave_status,decide_leaves
+from app.common.utils import LEAVE_NOT_FOUND, LEAVE_FORBIDDEN, LEAVE_UNCHANGED
+from app.HR.org_chart import get_team, get_team_leaves
 from bson import ObjectId
 from app.HR.helper import require_manager_role
 from datetime import datetime
+from typing import Optional
+from app.common.logger import get_logger
+from app.common.profiler import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)                 # sync endpoints show up in request profiles
+logger = get_logger(__name__)
 
 # ============= MANAGER LEAVE APPROVAL ROUTES ====================================
 # -------------------GET MY TEAM'S PENDING LEAVES (Manager only) -----------------
@@ -16,7 +22,7 @@ router = APIRouter()
 def fetch_my_team_pending_leaves(res: Response, db: Database = Depends(get_db), current_user: dict = Depends(require_manager_role)):
     try:
         manager_email = current_user.get("email")                                   #Use email instead of _id,Filter leaaves where current user is the assigned manager
-        print(f"🔍 DEBUG - Manager's email: {manager_email}")
+        logger.debug("Fetching pending team leaves", extra={"manager_email": manager_email})
         query = {"manager_id": manager_email, "status": "Pending"}
         
         result = get_all_leave_requests(db, query=query)                             #query= query , means in crud.py the parameter is query = None
@@ -62,25 +68,23 @@ def approve_team_leave(leave_id: str, res: Response, payload: LeaveApproval, db:
     try:
         manager_email = current_user.get("email")  # Use email instead of _id
 
-        leave_request = db["leave_db"].find_one({"_id": ObjectId(leave_id)})
-
-        if not leave_request:
-            res.status_code = status.HTTP_404_NOT_FOUND
-            return {"message": "Leave request not found"}
-        
-        # Verify current user is the assigned manager
-        if leave_request.get("manager_id") != manager_email:
-            res.status_code = status.HTTP_403_FORBIDDEN
-            return {"message": "You are not authorized to approve this leave request"}
-        
         update_data = payload.model_dump(exclude_unset=True)
-        update_data["approved_by"] = manager_email
-        update_data["approved_at"] = datetime.utcnow()
+        update_data["approved_by"] = manager_email       # update_leave_status only matches leaves assigned to this manager
 
-        result = update_leave_status(db, leave_id, update_data)
-        if result.matched_count == 0:
-            res.status_code = status.HTTP_404_NOT_FOUND
-            return {"message": "Leave request not found "}
+        leave_request, failure = update_leave_status(db, leave_id, update_data)
+        if leave_request is None:
+            reason, current_status = failure
+            if reason == LEAVE_NOT_FOUND:
+                res.status_code = status.HTTP_404_NOT_FOUND
+                return {"message": "Leave request not found"}
+            if reason == LEAVE_FORBIDDEN:
+                res.status_code = status.HTTP_403_FORBIDDEN
+                return {"message": "You are not authorized to approve this leave request"}
+            if reason == LEAVE_UNCHANGED:                 # retry / double click: same answer, balance untouched
+                res.status_code = status.HTTP_200_OK
+                return {"message": f"Leave request already {current_status.lower()}"}
+            res.status_code = status.HTTP_409_CONFLICT
+            return {"message": f"Leave request is already {current_status} and cannot be {payload.status.lower()}"}
         
         res.status_code = status.HTTP_200_OK
         return {"message": f"Leave request {payload.status.lower()} successfully"}
@@ -89,6 +93,56 @@ def approve_team_leave(leave_id: str, res: Response, payload: LeaveApproval, db:
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": f"Error: {str(e)}"}
 
+#-------------------DECIDE MANY LEAVES AT ONCE (assigned Manager only) -------------------------
+@router.post("/manager/leaves/decide")
+def decide_team_leaves(payload: LeaveDecisionBatch, res: Response, db: Database = Depends(get_db), current_user: dict = Depends(require_manager_role)):
+    try:
+        decisions = [decision.model_dump() for decision in payload.decisions]
+        results = decide_leaves(db, decisions, current_user.get("email"))    # per item: decided/unchanged/not_found/forbidden/wrong_status
+        decided = sum(1 for item in results if item["result"] == "decided")
+        res.status_code = status.HTTP_200_OK
+        return {"message": f"{decided} of {len(results)} leave request(s) decided", "data": results}
+
+    except Exception:
+        logger.exception("Error deciding leave requests")
+        res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"message": "Failed to decide leave requests"}
+
+# ============= MANAGER TEAM VIEWS (direct + skip-level) ====================================
+#-------------------MY WHOLE REPORTING TREE (level 1 = direct reports) -------------------------
+@router.get("/manager/team")
+def fetch_my_team(res: Response, depth: Optional[int] = Query(None, ge=1, le=10), db: Database = Depends(get_db),
+                  current_user: dict = Depends(require_manager_role)):
+    try:
+        team = get_team(db, current_user.get("email"), depth)
+        res.status_code = status.HTTP_200_OK
+        return {
+            "message": f"{len(team)} team member(s) found",
+            "data": {
+                "direct_reports": sum(1 for member in team if member["level"] == 1),
+                "skip_level": sum(1 for member in team if member["level"] > 1),
+                "members": team,
+            },
+        }
+    except Exception:
+        logger.exception("Error fetching team")
+        res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"message": "Failed to fetch team"}
+
+#-------------------LEAVES ACROSS MY REPORTING TREE (read-only for skip levels) -----------------
+@router.get("/manager/team/leaves")
+def fetch_my_team_tree_leaves(res: Response, leave_status: Optional[str] = Query(None, alias="status", pattern="^(Pending|Approved|Rejected)$"),
+                              depth: Optional[int] = Query(None, ge=1, le=10), db: Database = Depends(get_db),
+                              current_user: dict = Depends(require_manager_role)):
+    try:
+        leaves = get_team_leaves(db, current_user.get("email"), leave_status, depth)
+        res.status_code = status.HTTP_200_OK
+        return {"message": f"{len(leaves)} leave request(s) found across your team", "data": leaves}
+    except Exception:
+        logger.exception("Error fetching team leaves")
+        res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"message": "Failed to fetch team leaves"}
+
 #ERROR-------------------APPROVE/REJECT LEAVE (assigned Manager only) -------------------------
 """@router.put("/manager/leave/{leave_id}/approve")
 def approve_team_leave(leave_id: str, res: Response, payload: LeaveApproval,db: Database = Depends(get_db), current_user: dict = Depends(require_manager_role)):
@@ -127,7 +181,7 @@ def approve_team_leave(leave_id: str, res: Response, payload: LeaveApproval,db:
 def fetch_my_team_all_leaves(res: Response, db: Database = Depends(get_db), current_user: dict = Depends(require_manager_role)):
     try:
         manager_email = current_user.get("email")  # Use email instead of _id
-        print(f"🔍 DEBUG - Manager's email: {manager_email}")
+        logger.debug("Fetching all team leaves", extra={"manager_email": manager_email})
         query = {"manager_id": manager_email}    # Get ALL leaves (Pending, Approved, Rejected)
         
         result = get_all_leave_requests(db, query=query)
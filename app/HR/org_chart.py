@@ -0,0 +1,196 @@
+import os
+from typing import Optional
+from pymongo import UpdateOne
+from pymongo.database import Database
+from app.common.cache import cached, invalidate_tags, EMPLOYEES_TAG
+from app.common.logger import get_logger
+from app.common.utils import serialize_leave, versioned
+
+logger = get_logger(__name__)
+
+
+#===================ORG CHART ========================================================================
+# Reporting lines are stored once, as job_info.reporting_manager (the manager's email). On top of that every
+# employee carries a materialised ancestor path:
+#     org_path  = [top manager email, ..., direct manager email]      org_depth = len(org_path)
+# so "everyone under X" is the indexed query {"org_path": X} (multikey index org_path_1) instead of a recursive walk.
+# rebuild_org_paths() recomputes all paths with $graphLookup; move_employee() keeps them correct incrementally when
+# update_job_info changes a reporting manager. Employees stored before org paths existed are backfilled at startup
+# (backfill_org_paths, from main.lifespan). Trees and teams are cached under ORG_TAG (see app.common.cache).
+ORG_TAG = "org_chart"
+ORG_MAX_DEPTH = int(os.getenv("ORG_MAX_DEPTH", 20))                  # deeper chains are treated as data errors
+ORG_CHART_MAX_NODES = int(os.getenv("ORG_CHART_MAX_NODES", 5000))    # one org-chart response never builds more nodes
+ORG_REBUILD_BATCH = 1000
+
+ORG_MEMBER_PROJECTION = {"_id": 1, "email": 1, "first_name": 1, "last_name": 1, "role": 1, "status": 1,
+                         "job_info.designation": 1, "job_info.department": 1, "job_info.reporting_manager": 1,
+                         "org_path": 1, "org_depth": 1}
+
+
+def _member(employee: dict) -> dict:
+    job_info = employee.get("job_info") or {}
+    return {
+        "_id": str(employee["_id"]),
+        "email": employee.get("email"),
+        "name": f"{employee.get('first_name', '')} {employee.get('last_name', '')}".strip(),
+        "role": employee.get("role"),
+        "status": employee.get("status"),
+        "designation": job_info.get("designation"),
+        "department": job_info.get("department"),
+        "reporting_manager": job_info.get("reporting_manager"),
+    }
+
+
+#-------------------full rebuild ($graphLookup) -------------------------------------------------------
+def rebuild_org_paths(db: Database) -> dict:
+    """Recompute org_path/org_depth for every employee; only documents whose path changed are written"""
+    pipeline = [
+        {"$match": {"role": {"$in": ["employee", "manager"]}}},
+        {"$project": {"email": 1, "org_path": 1, "job_info.reporting_manager": 1}},
+        {"$graphLookup": {
+            "from": "employee_db",
+            "startWith": "$job_info.reporting_manager",
+            "connectFromField": "job_info.reporting_manager",
+            "connectToField": "email",                                 # email_1 index serves every hop
+            "as": "ancestors",
+            "maxDepth": ORG_MAX_DEPTH,
+            "depthField": "distance",
+        }},
+        {"$project": {"email": 1, "org_path": 1, "ancestors.email": 1, "ancestors.distance": 1}},
+    ]
+    updates, scanned, changed, cycles = [], 0, 0, 0
+    for employee in db["employee_db"].aggregate(pipeline, allowDiskUse=True):
+        scanned += 1
+        ancestors = sorted(employee["ancestors"], key=lambda ancestor: ancestor["distance"], reverse=True)
+        path = [ancestor["email"] for ancestor in ancestors]
+        if employee.get("email") in path:                              # A reports to B reports to A
+            cycles += 1
+            logger.warning("Reporting line cycle, path truncated", extra={"email": employee.get("email")})
+            path = path[path.index(employee["email"]) + 1:]
+        if path != employee.get("org_path"):
+            changed += 1
+            updates.append(UpdateOne({"_id": employee["_id"]}, versioned({"$set": {"org_path": path, "org_depth": len(path)}})))
+        if len(updates) >= ORG_REBUILD_BATCH:
+            db["employee_db"].bulk_write(updates, ordered=False)
+            updates = []
+    if updates:
+        db["employee_db"].bulk_write(updates, ordered=False)
+    invalidate_tags(db, ORG_TAG)
+    return {"scanned": scanned, "changed": changed, "cycles": cycles}
+
+def backfill_org_paths(db: Database) -> Optional[dict]:
+    """Run rebuild_org_paths when some employee has no org_path yet (data from before org paths existed);
+    called at startup, None when every path is already there"""
+    missing = db["employee_db"].find_one({"role": {"$in": ["employee", "manager"]}, "org_path": {"$exists": False}}, {"_id": 1})
+    if missing is None:
+        return None
+    result = rebuild_org_paths(db)
+    logger.info("Backfilled org paths", extra=result)
+    return result
+
+
+#-------------------incremental updates ---------------------------------------------------------------
+def path_under(db: Database, manager_email: Optional[str]) -> list:
+    """org_path of someone who reports to manager_email"""
+    if not manager_email:
+        return []
+    manager = db["employee_db"].find_one({"email": manager_email}, {"org_path": 1})
+    if manager is None:
+        raise ValueError(f"Reporting manager {manager_email} not found")
+    return (manager.get("org_path") or []) + [manager_email]
+
+def validate_move(db: Database, email: str, new_manager: Optional[str]) -> list:
+    """org_path `email` would get under new_manager; ValueError for an unknown manager or a cycle"""
+    new_path = path_under(db, new_manager)
+    if email in new_path:
+        raise ValueError("An employee cannot report to someone in their own reporting line")
+    return new_path
+
+def move_employee(db: Database, email: str, new_manager: Optional[str], new_path: Optional[list] = None, session=None) -> int:
+    """Re-home `email` (and everyone below them) under new_manager; returns how many paths changed"""
+    if new_path is None:
+        new_path = validate_move(db, email, new_manager)
+    moved = db["employee_db"].update_one({"email": email}, versioned({"$set": {"org_path": new_path, "org_depth": len(new_path)}}),
+                                         session=session)
+    # the subtree keeps everything from `email` downwards and swaps the prefix above it, in one indexed update
+    subtree = db["employee_db"].update_many({"org_path": email}, [{"$set": {"org_path": {"$concatArrays": [
+        new_path,
+        {"$slice": ["$org_path", {"$indexOfArray": ["$org_path", email]}, ORG_MAX_DEPTH + 1]},
+    ]}}}, {"$set": {"org_depth": {"$size": "$org_path"}, "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+                    "updated_at": "$$NOW"}}], session=session)
+    invalidate_tags(db, ORG_TAG)
+    return moved.modified_count + subtree.modified_count
+
+
+#-------------------reads (cached) ---------------------------------------------------------------------
+@cached(tags=lambda root_email=None, depth=3: [ORG_TAG, EMPLOYEES_TAG])
+def get_org_chart(db: Database, root_email: Optional[str] = None, depth: int = 3) -> Optional[dict]:
+    """Nested tree `depth` levels deep, below root_email or below the top of the organisation"""
+    if root_email:
+        root = db["employee_db"].find_one({"email": root_email}, ORG_MEMBER_PROJECTION)
+        if root is None:
+            return None
+        roots = [root]
+        base_depth = root.get("org_depth", 0)
+        query = {"org_path": root_email, "org_depth": {"$lte": base_depth + depth}}
+    else:
+        roots = list(db["employee_db"].find({"role": {"$in": ["employee", "manager"]}, "org_depth": 0}, ORG_MEMBER_PROJECTION))
+        base_depth = 0
+        query = {"org_depth": {"$gte": 1, "$lte": depth}}
+    descendants = list(db["employee_db"].find(query, ORG_MEMBER_PROJECTION).sort("org_depth", 1).limit(ORG_CHART_MAX_NODES))
+
+    children: dict = {}
+    for employee in descendants:
+        children.setdefault(employee["org_path"][-1], []).append(employee)
+
+    def node(employee: dict, level: int) -> dict:
+        reports = children.get(employee.get("email"), []) if level < depth else []
+        entry = _member(employee)
+        entry["level"] = level
+        entry["more_below"] = level == depth and employee.get("role") == "manager"    # ask again with root=this email
+        entry["reports"] = [node(report, level + 1) for report in sorted(reports, key=lambda item: item.get("first_name", ""))]
+        return entry
+
+    return {
+        "root": root_email,
+        "depth": depth,
+        "base_depth": base_depth,
+        "truncated": len(descendants) >= ORG_CHART_MAX_NODES,
+        "nodes": len(roots) + len(descendants),
+        "tree": [node(root, 0) for root in roots],
+    }
+
+@cached(tags=lambda manager_email, max_depth=None: [ORG_TAG, EMPLOYEES_TAG])
+def get_team(db: Database, manager_email: str, max_depth: Optional[int] = None) -> list:
+    """Everyone below manager_email (transitively), with level 1 = direct report, 2 = skip-level, ..."""
+    manager = db["employee_db"].find_one({"email": manager_email}, {"org_depth": 1})
+    if manager is None:
+        return []
+    base_depth = manager.get("org_depth", 0)
+    query = {"org_path": manager_email}
+    if max_depth:
+        query["org_depth"] = {"$lte": base_depth + max_depth}
+    team = []
+    for employee in db["employee_db"].find(query, ORG_MEMBER_PROJECTION).sort([("org_depth", 1), ("first_name", 1)]):
+        member = _member(employee)
+        member["level"] = employee.get("org_depth", 0) - base_depth
+        member["via"] = employee["org_path"][base_depth + 1:]          # managers between us and them
+        team.append(member)
+    return team
+
+def get_team_leaves(db: Database, manager_email: str, status: Optional[str] = None, max_depth: Optional[int] = None) -> list:
+    """Leaves of the whole transitive team (read-only: only the direct manager can approve)"""
+    team = {member["_id"]: member for member in get_team(db, manager_email, max_depth)}
+    if not team:
+        return []
+    query = {"employee_id": {"$in": list(team)}}
+    if status:
+        query["status"] = status
+    leaves = []
+    for leave in db["leave_db"].find(query).sort("start_date", -1):
+        member = team[leave["employee_id"]]
+        leave = serialize_leave(leave)
+        leave.update({"employee_name": member["name"], "email": member["email"], "level": member["level"],
+                      "reporting_manager": member["reporting_manager"]})
+        leaves.append(leave)
+    return leaves
@@ -1,26 +1,34 @@
-from fastapi import APIRouter, Depends, status,Response, Body
+from fastapi import APIRouter, Depends, status,Response, Body, Query, Request
 from app.database import get_db
 from pymongo.database import Database
 import app.HR.crud as crud
+from app.HR import org_chart
 from app.Auth.utils import hash_password
 from .helper import require_hr_role
-from .schemas import (EmployeeRegister,CurrentAddress,PermanentAddress,JobInfo, EmployeeBasicUpdate,Education,WorkExperience,EmployeeSearch,AttendanceCreate,AttendanceUpdate,LeaveApproval)
+from .schemas import (EmployeeRegister,CurrentAddress,PermanentAddress,JobInfo, EmployeeBasicUpdate,Education,WorkExperience,EmployeeSearch,EmployeeBatchGet,EmployeePatch,AttendanceCreate,AttendanceUpdate,LeaveApproval,LeaveAllowanceAdjustment)
 from typing import Optional
 from pydantic import EmailStr
-from datetime import datetime
+from datetime import datetime, date
 from bson import ObjectId
 from app.common.utils import get_leave_request_by_id
+from app.Employees.schemas import BudgetCategory
+from app.common.logger import get_logger
+from app.common.profiler import ProfiledRoute
+from app.common.singleflight import SingleFlight, flight_key
+from app.common.http_cache import make_etag, document_etag, not_modified_response, set_validators
 
 
 #Always convert Pydantic model → dict before passing to CRUD...as mongodb excepts dict only not a pydantic model object.
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)                 # sync endpoints show up in request profiles
+logger = get_logger(__name__)
+hr_reads = SingleFlight("hr_reads")              # identical concurrent dashboard reads share one MongoDB scan
 
 #---------------Register employee--------------------------------------
 @router.post("/register_employee")
 def register_employee(employee: EmployeeRegister,res: Response,_current_user: dict = Depends(require_hr_role),db: Database = Depends(get_db)):
     try:
-        print(f"DEBUG: Received employee data: {employee.model_dump()}")
+        logger.debug("Registering employee", extra={"email": employee.email, "role": employee.role})
         
         if not employee.password:
             res.status_code = status.HTTP_400_BAD_REQUEST
@@ -41,45 +49,59 @@ def register_employee(employee: EmployeeRegister,res: Response,_current_user: di
             # Employee already exists or other error
             return {"message": result["message"]}                  #["message"] here is a dictionary key coming from crud.py file in create_employee function
             
-    except Exception as e:
-        print(f"Registration error: {str(e)}")
+    except Exception:
+        logger.exception("Registration error")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to register employee"}
     
 
 # ---------------- get list of all employee ----------------------------
 @router.get("/employees")
-def list_employees(res: Response, _current_user: dict = Depends(require_hr_role),db: Database = Depends(get_db)):
+def list_employees(request: Request, res: Response, _current_user: dict = Depends(require_hr_role),db: Database = Depends(get_db)):
         try:
-            employees = crud.get_all_employees(db)
+            count, newest = crud.get_employees_list_version(db)                          # two index-only reads
+            etag = make_etag("employees", count, newest.timestamp() if newest else 0)
+            unchanged = not_modified_response(request, "/hr/employees", etag, newest)
+            if unchanged:
+                return unchanged
+            # the list and its validators come from the same flight, so a shared result never carries a newer ETag
+            (count, newest), employees = hr_reads.do(flight_key("/hr/employees", None, _current_user),
+                                                     lambda: (crud.get_employees_list_version(db), crud.get_all_employees(db)))
+            set_validators(res, "/hr/employees", make_etag("employees", count, newest.timestamp() if newest else 0), newest)
             res.status_code = status.HTTP_200_OK                                                       #this [status] is comming from the crud function in which the status is returing a message = 200 ok
             return{
             "message": "Employees data fetched succesfully",
             "employees": employees
             }
         
-        except Exception as e:
-            print(f"Error fetching employees: {str(e)}")
+        except Exception:
+            logger.exception("Error fetching employees")
             res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
             return {"message": "Failed to fetch employees"}
 
 # ---------------- get employee by _id-----------------------------------
 @router.get("/employee/{employee_id}")
-def get_employee(employee_id: str, res: Response, _current_user: dict = Depends(require_hr_role),db: Database = Depends(get_db)):
+def get_employee(employee_id: str, request: Request, res: Response, _current_user: dict = Depends(require_hr_role),db: Database = Depends(get_db)):
     try:
+        current = crud.get_employee_version(db, employee_id)                              # version-only projection
+        if current:
+            unchanged = not_modified_response(request, "/hr/employee/{employee_id}", document_etag("employee", current), current.get("updated_at"))
+            if unchanged:
+                return unchanged
         employee = crud.get_employee_by_id(db, employee_id)
         if not employee:
             res.status_code = status.HTTP_404_NOT_FOUND
             return {"message": "Employee not found"}
         
+        set_validators(res, "/hr/employee/{employee_id}", document_etag("employee", employee), employee.get("updated_at"))   # from the body we send
         res.status_code = status.HTTP_200_OK
         return{
             "message": "Employee fetched successfully",
             "employee": employee
         }
 
-    except Exception as e:
-        print(f"Error fetching employee: {str(e)}")
+    except Exception:
+        logger.exception("Error fetching employee")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to fetch employee"}
 
@@ -94,8 +116,8 @@ def update_basic(employee_id: str, payload: EmployeeBasicUpdate, res: Response,
             res.status_code = status.HTTP_404_NOT_FOUND
             return {"message": "Employee not found"}
 
-    except Exception as e:
-        print(f"Error updating basic info: {str(e)}")
+    except Exception:
+        logger.exception("Error updating basic info")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to update basic info"}
     
@@ -112,8 +134,8 @@ def update_current(employee_id: str, payload: CurrentAddress, res: Response,
         if result.matched_count == 0:
             res.status_code = status.HTTP_404_NOT_FOUND
             return {"message": "Employee not found"}
-    except Exception as e:
-        print(f"Error updating current address: {str(e)}")
+    except Exception:
+        logger.exception("Error updating current address")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to update current address"}
     
@@ -130,8 +152,8 @@ def update_permanent(employee_id: str, payload: PermanentAddress, res: Response,
         if result.matched_count == 0:
             res.status_code = status.HTTP_404_NOT_FOUND
             return {"message": "Employee not found"}
-    except Exception as e:
-        print(f"Error updating permanent address: {str(e)}")
+    except Exception:
+        logger.exception("Error updating permanent address")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to update permanent address"}
     res.status_code = status.HTTP_200_OK
@@ -147,13 +169,35 @@ def update_job(employee_id: str, payload: JobInfo, res: Response,
         if result.matched_count == 0:
             res.status_code = status.HTTP_404_NOT_FOUND
             return {"message": "Employee not found"}
-    except Exception as e:
-        print(f"Error updating job info: {str(e)}")
+    except ValueError as ve:                                     # unknown reporting manager or a reporting-line cycle
+        res.status_code = status.HTTP_400_BAD_REQUEST
+        return {"message": str(ve)}
+    except Exception:
+        logger.exception("Error updating job info")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to update job info"}
     res.status_code = status.HTTP_200_OK
     return {"message": "Job info updated"}
 
+# ---------------- Any sections in one request ----------------------------
+@router.patch("/employee/{employee_id}")
+def patch_employee(employee_id: str, payload: EmployeePatch, res: Response,
+                   db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
+    try:
+        employee = crud.patch_employee(db, employee_id, payload.model_dump(exclude_unset=True))
+        if employee is None:
+            res.status_code = status.HTTP_404_NOT_FOUND
+            return {"message": "Employee not found"}
+    except ValueError as ve:                                     # nothing to change, unknown manager or reporting-line cycle
+        res.status_code = status.HTTP_400_BAD_REQUEST
+        return {"message": str(ve)}
+    except Exception:
+        logger.exception("Error patching employee")
+        res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"message": "Failed to update employee"}
+    res.status_code = status.HTTP_200_OK
+    return {"message": "Employee updated", "employee": employee}
+
 # ---------------- Education Added---------------------------------------
 @router.post("/employee/{employee_id}/education")
 def add_edu(employee_id: str, payload: Education, res: Response,
@@ -164,8 +208,8 @@ def add_edu(employee_id: str, payload: Education, res: Response,
         if result.matched_count == 0:
             res.status_code = status.HTTP_404_NOT_FOUND
             return {"message": "Employee not found"}
-    except Exception as e:
-        print(f"Error adding education: {str(e)}")  # Log to console for debugging
+    except Exception:
+        logger.exception("Error adding education")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to add education"}
     res.status_code = status.HTTP_200_OK
@@ -181,8 +225,8 @@ def update_edu(employee_id: str, index: int, payload: Education, res: Response,
         if result.matched_count == 0:
             res.status_code = status.HTTP_404_NOT_FOUND
             return {"message": "Employee not found"}
-    except Exception as e:
-        print(f"Error updating education: {str(e)}")  # Log to console for debugging
+    except Exception:
+        logger.exception("Error updating education")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to update education"}
     res.status_code = status.HTTP_200_OK
@@ -198,8 +242,8 @@ def add_work(employee_id: str, payload: WorkExperience, res: Response,
         if result.matched_count == 0:
             res.status_code = status.HTTP_404_NOT_FOUND
             return {"message": "Employee not found"}
-    except Exception as e:
-        print(f"Error adding work experience: {str(e)}")  # Log to console for debugging
+    except Exception:
+        logger.exception("Error adding work experience")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to add work experience"}
     res.status_code = status.HTTP_200_OK    
@@ -215,13 +259,26 @@ def update_work(employee_id: str, index: int, payload: WorkExperience, res: Resp
         if result.matched_count == 0:
             res.status_code = status.HTTP_404_NOT_FOUND
             return {"message": "Employee not found"}
-    except Exception as e:
-        print(f"Error updating work experience: {str(e)}")  # Log to console for debugging
+    except Exception:
+        logger.exception("Error updating work experience")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to update work experience"}
     res.status_code = status.HTTP_200_OK
     return {"message": "Work experience updated"}
    
+#---------resolve many employees at once (team members, leave applicants) ---------------------
+@router.post("/employees/batch-get")
+def batch_get_employees(payload: EmployeeBatchGet, res: Response, db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
+    try:
+        result = crud.get_employees_batch(db, payload.ids, payload.emails, payload.fields)
+        res.status_code = status.HTTP_200_OK
+        return {"message": f"{len(result['employees'])} employees found", "data": result}
+
+    except Exception:
+        logger.exception("Error fetching employees batch")
+        res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"message": "Failed to fetch employees"}
+
 #---------search employees by anything in SEARCH BAR---------------------
 @router.post("/employees/search")
 def search_employee(payload:EmployeeSearch,res: Response,db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
@@ -234,8 +291,8 @@ def search_employee(payload:EmployeeSearch,res: Response,db: Database = Depends(
         res.status_code = status.HTTP_200_OK
         return{"message":f"{len(result)} employees found"}
     
-    except Exception as e:
-        print(f"Error searching employees: {str(e)}")
+    except Exception:
+        logger.exception("Error searching employees")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to search employees"}
         
@@ -256,8 +313,8 @@ def activate_employee(employee_id: str, res: Response, db: Database = Depends(ge
         res.status_code = status.HTTP_200_OK
         return {"message": "Employee activated successfully"}
     
-    except Exception as e:
-        print(f"Error activating employee: {str(e)}")
+    except Exception:
+        logger.exception("Error activating employee")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to activate employee"}
 
@@ -274,8 +331,8 @@ def deactivate_employee(employee_id: str,res: Response, db: Database = Depends(g
         res.status_code = status.HTTP_200_OK
         return {"message": "Employee deactivated successfully"}
     
-    except Exception as e:
-        print(f"Error deactivating employee: {str(e)}")
+    except Exception:
+        logger.exception("Error deactivating employee")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to deactivate employee"}
     
@@ -307,8 +364,8 @@ def mark_attendance(payload: AttendanceCreate,res: Response, db: Database = Depe
         res.status_code = status.HTTP_201_CREATED
         return {"message": "Attendance marked successfully"}
         
-    except Exception as e:
-        print(f"Error marking attendance: {str(e)}")
+    except Exception:
+        logger.exception("Error marking attendance")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to mark attendance"}
     
@@ -335,8 +392,8 @@ def fetch_attendance(employee_id: Optional[str] = None, email: Optional[EmailStr
         res.status_code = status.HTTP_200_OK
         return {"message": f"{len(result)} records found", "data": result}
         
-    except Exception as e:
-        print(f"Error fetching attendance: {str(e)}")
+    except Exception:
+        logger.exception("Error fetching attendance")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to fetch attendance"}
 
@@ -344,14 +401,15 @@ def fetch_attendance(employee_id: Optional[str] = None, email: Optional[EmailStr
 @router.get("/attendance/summary/today")
 def get_today_summary(res: Response,db: Database = Depends(get_db),_current_user: dict = Depends(require_hr_role)):      # Returns count of Present, Absent, Leave, Half-Day for today
     try:
-        result = crud.get_today_attendance_summary(db)
+        result = hr_reads.do(flight_key("/hr/attendance/summary/today", {"date": datetime.now().date()}, _current_user),
+                             crud.get_today_attendance_summary, db)
         res.status_code = status.HTTP_200_OK
         return {
             "message": "Today's attendance summary",
             "summary": result
         }
-    except Exception as e:
-        print(f"Error fetching attendance summary: {str(e)}")
+    except Exception:
+        logger.exception("Error fetching attendance summary")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to fetch attendance summary"}
 
@@ -378,7 +436,7 @@ def modify_attendance(employee_id: str, date: str,payload: AttendanceUpdate,res:
 @router.get("/leaves")
 def fetch_all_leaves(res: Response,db: Database = Depends(get_db),_current_user: dict = Depends(require_hr_role)):
     try:
-        result = crud.get_all_leave_requests(db)
+        result = hr_reads.do(flight_key("/hr/leaves", None, _current_user), crud.get_all_leave_requests, db)
        
         if not result:
             res.status_code = status.HTTP_404_NOT_FOUND
@@ -386,8 +444,8 @@ def fetch_all_leaves(res: Response,db: Database = Depends(get_db),_current_user:
             
         res.status_code = status.HTTP_200_OK
         return {"message": f"{len(result)} leave request found", "data": result}
-    except Exception as e:
-        print(f"Error fetching leaves: {str(e)}")
+    except Exception:
+        logger.exception("Error fetching leaves")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to fetch leaves"}
     
@@ -405,8 +463,8 @@ def fetch_leave_by_id(leave_id : str,res: Response, db: Database = Depends(get_d
         res.status_code = status.HTTP_200_OK
         return {"message": "Leave request found", "data": result}
     
-    except Exception as e:
-        print(f"Error fetching leave: {str(e)}")
+    except Exception:
+        logger.exception("Error fetching leave")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to fetch leave"}
 
@@ -414,7 +472,8 @@ def fetch_leave_by_id(leave_id : str,res: Response, db: Database = Depends(get_d
 @router.get("/leaves/pending")
 def fetch_pending_leaves(res: Response, db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
     try:
-        result = crud.get_all_leave_requests(db, query={"status": "Pending"})
+        result = hr_reads.do(flight_key("/hr/leaves", {"status": "Pending"}, _current_user),
+                             crud.get_all_leave_requests, db, query={"status": "Pending"})
         
         if not result:
             res.status_code = status.HTTP_404_NOT_FOUND
@@ -424,8 +483,8 @@ def fetch_pending_leaves(res: Response, db: Database = Depends(get_db), _current
         res.status_code = status.HTTP_200_OK
         return {"message": f"{len(result)} pending leave request found", "data": result}
     
-    except Exception as e:
-        print(f"Error fetching pending leaves: {str(e)}")
+    except Exception:
+        logger.exception("Error fetching pending leaves")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to fetch pending leaves"}
 
@@ -433,7 +492,8 @@ def fetch_pending_leaves(res: Response, db: Database = Depends(get_db), _current
 @router.get("/leaves/approved")
 def fetch_approved_leaves(res: Response, db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
     try:
-        result = crud.get_all_leave_requests(db, query={"status": "Approved"})
+        result = hr_reads.do(flight_key("/hr/leaves", {"status": "Approved"}, _current_user),
+                             crud.get_all_leave_requests, db, query={"status": "Approved"})
         
         if not result:
             res.status_code = status.HTTP_404_NOT_FOUND
@@ -442,8 +502,8 @@ def fetch_approved_leaves(res: Response, db: Database = Depends(get_db), _curren
         res.status_code = status.HTTP_200_OK
         return {"message": f"{len(result)} approved leave request found", "data": result}
     
-    except Exception as e:
-        print(f"Error fetching approved leaves: {str(e)}")
+    except Exception:
+        logger.exception("Error fetching approved leaves")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to fetch approved leaves"}
 
@@ -451,7 +511,8 @@ def fetch_approved_leaves(res: Response, db: Database = Depends(get_db), _curren
 @router.get("/leaves/rejected")
 def fetch_rejected_leaves(res: Response, db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
     try:
-        result = crud.get_all_leave_requests(db, query={"status": "Rejected"})
+        result = hr_reads.do(flight_key("/hr/leaves", {"status": "Rejected"}, _current_user),
+                             crud.get_all_leave_requests, db, query={"status": "Rejected"})
         
         if not result:
             res.status_code = status.HTTP_404_NOT_FOUND
@@ -460,29 +521,109 @@ def fetch_rejected_leaves(res: Response, db: Database = Depends(get_db), _curren
         res.status_code = status.HTTP_200_OK
         return {"message": f"{len(result)} rejected leave request found", "data": result}
     
-    except Exception as e:
-        print(f"Error fetching rejected leaves: {str(e)}")
+    except Exception:
+        logger.exception("Error fetching rejected leaves")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to fetch rejected leaves"}
 
 #-------------------LEAVE BALANCE UPDATE ------------------------------------------------------
 @router.get("/hr/employee/{employee_id}/leave_balance")
-def get_leave_balance(employee_id: str, res: Response, db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
+def get_leave_balance(employee_id: str, res: Response, as_of: Optional[date] = Query(None, description="balance at the end of this day"),
+                      db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
     try:
-        employee = db["employee_db"].find_one({"_id": ObjectId(employee_id)})
-        if not employee:
+        as_of_end = datetime.combine(as_of, datetime.max.time()) if as_of else None
+        leave_balance = crud.get_leave_balance(db, employee_id, as_of_end)
+        if leave_balance is None:
             res.status_code = status.HTTP_404_NOT_FOUND
-            return {"message": "Employee not found"}
+            return {"message": "No leave history for this employee on that date" if as_of else "Employee not found"}
         
-        leave_balance = employee.get("leave_balance",{})
         res.status_code = status.HTTP_200_OK
-        return {"employee_id": employee_id, "leave_balance": leave_balance}
+        return {"employee_id": employee_id, "as_of": as_of, "leave_balance": leave_balance}
     
-    except Exception as e:
-        print(f"Error fetching leave balance: {str(e)}")
+    except Exception:
+        logger.exception("Error fetching leave balance")
         res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return {"message": "Failed to fetch leave balance"}
 
+#-------------------LEAVE ALLOWANCE (grant / accrual / rollover, recorded in the leave ledger) ---------
+@router.post("/employee/{employee_id}/leave_ledger")
+def adjust_leave_allowance(employee_id: str, payload: LeaveAllowanceAdjustment, res: Response, db: Database = Depends(get_db),
+                           _current_user: dict = Depends(require_hr_role)):
+    try:
+        applied = crud.adjust_leave_allowance(db, employee_id, payload.event, payload.leave_type, payload.days, payload.note)
+        if applied is None:
+            res.status_code = status.HTTP_404_NOT_FOUND
+            return {"message": "Employee not found"}
+        if not applied:
+            res.status_code = status.HTTP_400_BAD_REQUEST
+            return {"message": f"Cannot expire {-payload.days} {payload.leave_type} day(s): they are already used or reserved"}
+
+        res.status_code = status.HTTP_201_CREATED
+        return {"message": f"{payload.days} {payload.leave_type} day(s) recorded as {payload.event}"}
+
+    except Exception:
+        logger.exception("Error adjusting leave allowance")
+        res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"message": "Failed to adjust leave allowance"}
+
+
+# ======================ORG CHART ===================================================================
+#--------------------REPORTING TREE (below `root`, or the whole organisation) ----------------------
+@router.get("/org-chart")
+def fetch_org_chart(res: Response,
+                    root: Optional[EmailStr] = None,                                   # manager email; omitted = top of the organisation
+                    depth: int = Query(3, ge=1, le=10),
+                    db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
+    try:
+        result = org_chart.get_org_chart(db, root.lower() if root else None, depth)
+        if result is None:
+            res.status_code = status.HTTP_404_NOT_FOUND
+            return {"message": "Employee not found"}
+        res.status_code = status.HTTP_200_OK
+        return {"message": "Org chart fetched successfully", "data": result}
+
+    except Exception:
+        logger.exception("Error fetching org chart")
+        res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"message": "Failed to fetch org chart"}
+
+#--------------------REBUILD MATERIALISED PATHS (after imports / bulk edits) -----------------------
+@router.post("/org-chart/rebuild")
+def rebuild_org_chart(res: Response, db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
+    try:
+        result = org_chart.rebuild_org_paths(db)
+        res.status_code = status.HTTP_200_OK
+        return {"message": "Org chart rebuilt", "data": result}
+
+    except Exception:
+        logger.exception("Error rebuilding org chart")
+        res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"message": "Failed to rebuild org chart"}
+
+
+# ======================BUDGET ANALYTICS ============================================================
+#--------------------SPEND BY DEPARTMENT / CATEGORY / MONTH ----------------------------------------
+@router.get("/budget/analytics")
+def fetch_budget_analytics(res: Response,
+                           department: Optional[str] = None,
+                           category: Optional[BudgetCategory] = None,
+                           from_month: Optional[str] = Query(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$"),      # YYYY-MM
+                           to_month: Optional[str] = Query(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$"),
+                           db: Database = Depends(get_db), _current_user: dict = Depends(require_hr_role)):
+    try:
+        result = crud.get_budget_analytics(db, department, category.value if category else None, from_month, to_month)
+        res.status_code = status.HTTP_200_OK
+        return {"message": "Budget analytics fetched successfully", "data": result}
+
+    except ValueError as ve:
+        res.status_code = status.HTTP_400_BAD_REQUEST
+        return {"message": str(ve)}
+
+    except Exception:
+        logger.exception("Error fetching budget analytics")
+        res.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"message": "Failed to fetch budget analytics"}
+
 
 #remove this route as HR will nto approve/reject the leave rquest,only assigned manager will do it 
 """#----------------------UPDATE LEAVE STATUS ACCEPT/REJECT -------------------------------------------
@@ -1,7 +1,8 @@
 from pydantic import BaseModel, EmailStr, field_validator, model_validator
 from datetime import datetime, date
-from typing import Optional
+from typing import Optional, List, Dict
 from app.Auth.helper import EmailPasswordValidator
+from app.common.leave_ledger import LEAVE_TYPES
 import re
 
 class EmployeeBase(BaseModel):                                       #inheratance 
@@ -165,6 +166,69 @@ class EmployeeSearch(BaseModel):
     model_config = {"extra": "forbid"}
 
 
+class EmployeePatch(BaseModel):                                      # any subset of the per-section PUT payloads, applied in one update
+    basic: Optional[EmployeeBasicUpdate] = None
+    current_address: Optional[CurrentAddress] = None
+    permanent_address: Optional[PermanentAddress] = None
+    job_info: Optional[JobInfo] = None
+    add_education: List[Education] = []
+    update_education: Dict[int, Education] = {}                      # array index -> new entry
+    add_work_experience: List[WorkExperience] = []
+    update_work_experience: Dict[int, WorkExperience] = {}
+    model_config = {"extra": "forbid"}
+
+    @field_validator("update_education", "update_work_experience")
+    def non_negative_index(cls, v):
+        if any(index < 0 for index in v):
+            raise ValueError("Array index must be 0 or greater")
+        return v
+
+    @model_validator(mode="after")
+    def no_null_sections(self):
+        # a section is either left out or replaced; null would wipe it (addresses) or break the reporting-line check
+        nulls = [field for field in ("basic", "current_address", "permanent_address", "job_info")
+                 if field in self.model_fields_set and getattr(self, field) is None]
+        if nulls:
+            raise ValueError(f"Leave out sections you do not change instead of sending null: {', '.join(nulls)}")
+        return self
+
+    @model_validator(mode="after")
+    def check_arrays(self):
+        # MongoDB rejects $push and $set on the same array in one update ("would create a conflict")
+        if self.add_education and self.update_education:
+            raise ValueError("Add and update education in separate requests")
+        if self.add_work_experience and self.update_work_experience:
+            raise ValueError("Add and update work experience in separate requests")
+        return self
+
+
+BATCH_GET_MAX_KEYS = 500
+
+class EmployeeBatchGet(BaseModel):                                   # resolve many employees in one request/query
+    ids: List[str] = []
+    emails: List[EmailStr] = []
+    fields: Optional[List[str]] = None                               # fields to return, sections and dotted paths too; None = whole profile
+    model_config = {"extra": "forbid"}
+
+    @field_validator("fields")
+    def no_password(cls, v):
+        if v is not None:
+            for field in v:
+                if field and any(not part or part.startswith("$") for part in field.split(".")):
+                    raise ValueError(f"Invalid field path: {field}")          # would reach the $project as an operator
+            v = [field for field in v if field and field.split(".")[0] != "password"]
+        return v
+
+    @model_validator(mode="after")
+    def check_size(self):
+        total = len(self.ids) + len(self.emails)
+        if total == 0:
+            raise ValueError("Provide at least one id or email")
+        if total > BATCH_GET_MAX_KEYS:
+            raise ValueError(f"At most {BATCH_GET_MAX_KEYS} ids and emails per request")
+        return self
+
+
 class AttendanceBase(BaseModel):
     email : Optional[EmailStr] = None
     employee_id: str              # Reference to employee
@@ -275,6 +339,53 @@ class LeaveApproval(BaseModel):
     model_config = {"extra": "forbid"} 
 
 
+LEAVE_DECIDE_MAX_ITEMS = 200
+
+class LeaveDecision(LeaveApproval):                                   # one item of POST /manager/leaves/decide
+    leave_id: str
+
+class LeaveDecisionBatch(BaseModel):
+    decisions: List[LeaveDecision]
+    model_config = {"extra": "forbid"}
+
+    @model_validator(mode="after")
+    def check_size(self):
+        if not self.decisions:
+            raise ValueError("Provide at least one decision")
+        if len(self.decisions) > LEAVE_DECIDE_MAX_ITEMS:
+            raise ValueError(f"At most {LEAVE_DECIDE_MAX_ITEMS} decisions per request")
+        if len({decision.leave_id for decision in self.decisions}) != len(self.decisions):
+            raise ValueError("Each leave may appear only once per request")
+        return self
+
+
+class LeaveAllowanceAdjustment(BaseModel):                           # appended to the leave ledger (app.common.leave_ledger)
+    event: str                                                        # grant, accrue or rollover
+    leave_type: str
+    days: int
+    note: Optional[str] = None
+    model_config = {"extra": "forbid"}
+
+    @field_validator("event")
+    def validate_event(cls, v):
+        if v not in ["grant", "accrue", "rollover"]:
+            raise ValueError("Event must be 'grant', 'accrue' or 'rollover'")
+        return v
+
+    @field_validator("leave_type")
+    def validate_leave_type(cls, v):
+        allowed_types = [leave_type.capitalize() for leave_type in LEAVE_TYPES]     # the types the ledger folds
+        if v not in allowed_types:
+            raise ValueError(f"Leave type must be one of {allowed_types}")
+        return v
+
+    @model_validator(mode="after")
+    def check_days(self):
+        if self.days == 0 or (self.days < 0 and self.event != "rollover"):
+            raise ValueError("Days must be positive (a negative rollover expires carried-over days)")
+        return self
+
+
 class LeaveBalance(BaseModel):
     employee_id: str
     annual: int = 12
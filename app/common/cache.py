@@ -0,0 +1,297 @@
+import copy
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+from dotenv import load_dotenv
+from pymongo.database import Database
+
+from app.common.metrics import counter
+
+load_dotenv()
+
+
+#===========IN-PROCESS TTL CACHE ===========================================
+CACHES: list = []                                          # every cache created in the process, reported at /admin/caches
+
+#----------Small thread-safe cache for expensive read results ------------------
+class TTLCache:
+    """Thread-safe key/value cache where every entry expires after `ttl` seconds"""
+
+    def __init__(self, name: str, ttl: float = 300, max_entries: int = 1024):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: dict = {}
+        self._lock = threading.Lock()                      # sync routes run in the threadpool, so access must be locked
+        self.hits = 0
+        self.misses = 0
+        CACHES.append(self)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._data.pop(key, None)                  # drop expired entry so it doesn't sit in memory
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                self._data.pop(next(iter(self._data)))     # dicts keep insertion order -> evict the oldest entry
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def cache_stats() -> list:
+    rows = []
+    for cache in CACHES:
+        stats = cache.stats()
+        rows.extend(stats if isinstance(stats, list) else [stats])    # a TagCache reports one row per cached function
+    return rows
+
+
+#===========TAGGED READ-THROUGH CACHE (crud reads) ===========================================
+# Crud read functions are wrapped with @cached(tags=...): the result is stored under a key built from the
+# function name and its arguments (never the db handle) together with the entity tags it depends on
+# ("employee:<id>", "leave:<id>", ...). Every crud write calls invalidate_tags(db, ...) with the tags it
+# touches, so a cached read is never served after the data behind it changed.
+# CACHE_BACKEND=memory keeps entries in this process (LRU); CACHE_BACKEND=mongo shares them between workers
+# through the cache_entries collection (TTL index on expires_at) so an invalidation in one worker is seen by all.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", 300))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+CACHE_COLLECTION = "cache_entries"
+
+CACHE_REQUESTS = counter("erp_cache_requests_total", "Cached crud reads by function and result (hit/miss)", ["function", "result"])
+
+_MISSING = object()
+
+
+#----------entity tags (shared by readers and writers) -----------------
+EMPLOYEES_TAG = "employees"                                # any change to any employee (search results)
+
+def employee_tag(employee_id) -> str:
+    return f"employee:{employee_id}"
+
+def employee_email_tag(email) -> str:
+    return f"employee_email:{str(email).lower()}"          # Employees.crud writes by email, not by _id
+
+def leave_tag(leave_id) -> str:
+    return f"leave:{leave_id}"
+
+
+#----------backends -----------------
+class LRUBackend:
+    """In-process LRU with a tag -> keys index"""
+    name = "memory"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()   # key -> (expires_at, value, tags)
+        self._tags: dict = {}                                     # tag -> set of keys
+        self._lock = threading.Lock()
+
+    def get(self, db: Database, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                return _MISSING
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, db: Database, key: str, value: Any, ttl: float, tags: Iterable[str]):
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            while len(self._data) >= self.max_entries:
+                self._drop(next(iter(self._data)))                # least recently used
+            tags = tuple(tags)
+            self._data[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+    def invalidate(self, db: Database, tags: Iterable[str]) -> int:
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.get(tag, set())
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def _drop(self, key: str):
+        """Caller holds _lock"""
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def entries(self, prefix: str) -> Optional[int]:
+        with self._lock:
+            return sum(1 for key in self._data if key.startswith(prefix))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+
+class MongoCacheBackend:
+    """Entries shared by every worker, stored in the same database the crud function was called with"""
+    name = "mongo"
+
+    def get(self, db: Database, key: str) -> Any:
+        entry = db[CACHE_COLLECTION].find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}}, {"value": 1})
+        return _MISSING if entry is None else entry["value"]
+
+    def set(self, db: Database, key: str, value: Any, ttl: float, tags: Iterable[str]):
+        db[CACHE_COLLECTION].replace_one(
+            {"_id": key},
+            {"value": value, "tags": list(tags), "expires_at": datetime.utcnow() + timedelta(seconds=ttl)},
+            upsert=True,
+        )
+
+    def invalidate(self, db: Database, tags: Iterable[str]) -> int:
+        return db[CACHE_COLLECTION].delete_many({"tags": {"$in": list(tags)}}).deleted_count
+
+    def entries(self, prefix: str) -> Optional[int]:
+        return None                                        # lives in MongoDB; not counted from here
+
+    def clear(self):
+        pass                                               # entries expire through the TTL index
+
+
+def make_backend(name: str = CACHE_BACKEND):
+    if name == "mongo":
+        return MongoCacheBackend()
+    if name != "memory":
+        raise ValueError(f"Unknown CACHE_BACKEND {name!r} (expected 'memory' or 'mongo')")
+    return LRUBackend()
+
+
+#----------decorator -----------------
+class TagCache:
+    def __init__(self, backend=None, default_ttl: float = CACHE_DEFAULT_TTL):
+        self.backend = backend or make_backend()
+        self.default_ttl = default_ttl
+        self._stats: dict = {}                             # function label -> [hits, misses]
+        self._invalidations = 0                            # bumped on every invalidation (see cached())
+        self.publishers: list = []                         # fn(db, tags) told about local writes (app.common.invalidation_bus)
+        self._lock = threading.Lock()
+        CACHES.append(self)
+
+    def cached(self, tags: Callable[..., Iterable[str]], result_tags: Optional[Callable[[Any], Iterable[str]]] = None,
+               ttl: Optional[float] = None):
+        """Cache fn(db, *args) by its arguments. `tags(*args)` names the entities the result depends on;
+        `result_tags(result)` adds the ones only known after the read (e.g. the employee a leave belongs to).
+        None results are not cached, and callers always get their own copy."""
+        def decorator(fn):
+            label = f"{fn.__module__.removeprefix('app.')}.{fn.__name__}"     # e.g. HR.crud.get_employee_by_id
+            with self._lock:
+                self._stats.setdefault(label, [0, 0])
+
+            @functools.wraps(fn)
+            def wrapper(db: Database, *args, **kwargs):
+                key = _cache_key(label, args, kwargs)
+                value = self.backend.get(db, key)
+                if value is not _MISSING:
+                    self._count(label, hit=True)
+                    return copy.deepcopy(value)
+                self._count(label, hit=False)
+                with self._lock:
+                    generation = self._invalidations
+                value = fn(db, *args, **kwargs)
+                if value is None:
+                    return value
+                entry_tags = list(tags(*args, **kwargs))
+                if result_tags is not None:
+                    entry_tags.extend(result_tags(value))
+                with self._lock:
+                    stale = generation != self._invalidations          # a write landed while we were reading
+                if not stale:
+                    self.backend.set(db, key, copy.deepcopy(value), ttl or self.default_ttl, entry_tags)
+                return value
+
+            wrapper.uncached = fn
+            return wrapper
+        return decorator
+
+    def invalidate(self, db: Database, *tags: str) -> int:
+        tags = [tag for tag in tags if tag]
+        if not tags:
+            return 0
+        evicted = self.evict(db, tags)
+        for publish in list(self.publishers):
+            publish(db, tags)
+        return evicted
+
+    def evict(self, db: Optional[Database], tags: Iterable[str]) -> int:
+        """Drop entries without telling other workers (used for invalidations received from them)"""
+        with self._lock:
+            self._invalidations += 1
+        return self.backend.invalidate(db, tags)
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += 1
+        self.backend.clear()
+
+    def _count(self, label: str, hit: bool):
+        CACHE_REQUESTS.inc(function=label, result="hit" if hit else "miss")
+        with self._lock:
+            self._stats[label][0 if hit else 1] += 1
+
+    def stats(self) -> list:
+        with self._lock:
+            rows = [(label, hits, misses) for label, (hits, misses) in self._stats.items()]
+        return [{
+            "name": f"{self.backend.name}:{label}",
+            "entries": self.backend.entries(f"{label}:"),
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        } for label, hits, misses in rows]
+
+
+def _cache_key(label: str, args: tuple, kwargs: dict) -> str:
+    """Arguments are reduced to a digest so keys stay short and valid as Mongo _id values"""
+    raw = repr((args, sorted(kwargs.items())))
+    return f"{label}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+tag_cache = TagCache()
+cached = tag_cache.cached
+invalidate_tags = tag_cache.invalidate
@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+import bson
+from pymongo import monitoring
+
+from app.common.metrics import (MONGO_COMMANDS, MONGO_FAILURES, MONGO_LATENCY, MONGO_REQUEST_BYTES, MONGO_REPLY_BYTES,
+                                MONGO_POOL_CHECKED_OUT, MONGO_POOL_CONNECTIONS, MONGO_POOL_CHECKOUT_FAILURES, MONGO_POOL_WAIT)
+from app.common.request_context import RequestContext, get_request_context
+from app.common.slow_queries import SLOW_QUERY_MS, record_slow_query
+
+
+#===========MONGODB COMMAND MONITORING ===========================================
+# Registered on the shared MongoClient in app.database. Every command the app sends (find, update, aggregate,
+# getMore, ...) is counted per collection and attributed to the HTTP request that issued it.
+logger = logging.getLogger(__name__)
+
+# N+1 detector: the same query shape against the same collection more than QUERY_REPEAT_THRESHOLD times in one
+# request usually means a per-row lookup inside a loop (e.g. enriching every leave with its own find_one).
+# Off by default: fingerprinting every command costs a json.dumps; the test suite turns it on (tests/conftest.py).
+N_PLUS_ONE_MODE = os.getenv("N_PLUS_ONE_MODE", "off").lower()           # off | warn | raise (raise turns the response into a 500, for CI)
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", 10))
+
+SHAPE_FIELDS = {"find": "filter", "count": "query", "distinct": "query", "findAndModify": "query", "aggregate": "pipeline"}
+
+def command_collection(command_name: str, command) -> str:
+    """Collection a command targets; "-" for database-level commands like ping or endSessions"""
+    if command_name == "getMore":
+        return command.get("collection", "-")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else "-"
+
+def _bson_size(document) -> int:
+    try:
+        return len(bson.encode(document))
+    except Exception:
+        return 0
+
+
+def _redact(value):
+    if isinstance(value, dict):
+        return {key: _redact(item) for key, item in value.items()}        # keep field names and operators
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, dict) for item in value):
+        return [_redact(item) for item in value]                          # $and/$or clauses and pipeline stages
+    return "?"                                                            # literal values (and $in lists) never matter for the shape
+
+def query_shape(command_name: str, command) -> str:
+    """Command name plus its filter with every literal value replaced by "?" """
+    if command_name in ("update", "delete"):
+        statements = command.get(f"{command_name}s") or [{}]
+        body = statements[0].get("q")                                     # pymongo sends single-document writes as one statement
+    else:
+        body = command.get(SHAPE_FIELDS.get(command_name, ""))
+    return f"{command_name} {json.dumps(_redact(body), default=str)}"
+
+
+class CommandMonitor(monitoring.CommandListener):
+    def __init__(self):
+        self._inflight: dict = {}                          # (connection_id, request_id) -> (collection, command name, request context, database, command)
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        collection = command_collection(event.command_name, event.command)
+        ctx = get_request_context()
+        MONGO_REQUEST_BYTES.inc(_bson_size(event.command), collection=collection)
+        self._inflight[(event.connection_id, event.request_id)] = (
+            collection, event.command_name, ctx, event.database_name, event.command,
+        )
+        if ctx is not None and N_PLUS_ONE_MODE != "off" and collection != "-" and event.command_name != "getMore":
+            self._check_repeated(ctx, collection, event.command_name, event.command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        inflight = self._inflight.pop((event.connection_id, event.request_id), None)
+        if inflight is None:
+            return
+        collection, command_name, ctx, database, command = inflight
+        duration = event.duration_micros / 1_000_000
+        MONGO_COMMANDS.inc(collection=collection, command=command_name)
+        MONGO_LATENCY.observe(duration, collection=collection, command=command_name)
+        MONGO_REPLY_BYTES.inc(_bson_size(event.reply), collection=collection)
+        self._record_for_request(ctx, collection, duration)
+        self._check_slow(collection, command_name, ctx, database, command, duration)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        inflight = self._inflight.pop((event.connection_id, event.request_id), None)
+        if inflight is None:
+            return
+        collection, command_name, ctx, database, command = inflight
+        duration = event.duration_micros / 1_000_000
+        MONGO_FAILURES.inc(collection=collection, command=command_name)
+        MONGO_LATENCY.observe(duration, collection=collection, command=command_name)
+        self._record_for_request(ctx, collection, duration)
+        self._check_slow(collection, command_name, ctx, database, command, duration, failed=True)
+
+    @staticmethod
+    def _check_repeated(ctx: RequestContext, collection: str, command_name: str, command):
+        shape = query_shape(command_name, command)
+        if ctx.record_shape(collection, shape) == QUERY_REPEAT_THRESHOLD + 1:      # report each shape once per request
+            ctx.repeated_queries.append((collection, shape))
+            logger.warning("Possible N+1 query: %s on %s issued more than %d times while serving %s %s",
+                           shape, collection, QUERY_REPEAT_THRESHOLD, ctx.method, ctx.path)
+
+    @staticmethod
+    def _check_slow(collection: str, command_name: str, ctx: Optional[RequestContext], database: str, command,
+                    duration: float, failed: bool = False):
+        if duration * 1000 < SLOW_QUERY_MS or collection == "-":            # "-" also skips the explain commands we send ourselves
+            return
+        record_slow_query(collection, command_name, query_shape(command_name, command), duration, ctx, database, command, failed)
+
+    @staticmethod
+    def _record_for_request(ctx: Optional[RequestContext], collection: str, duration: float):
+        if ctx is not None:                                # commands issued outside a request (startup, scripts) have no context
+            ctx.record_command(collection, duration)
+
+
+command_monitor = CommandMonitor()
+
+
+#===========CONNECTION POOL MONITORING ===========================================
+# Also registered on the shared MongoClient. Keeps per-server counters in memory for /admin/pool and /metrics;
+# a pool where checked_out sits at max_pool_size with growing wait times is starving the threadpool.
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._pools: dict = {}                             # "host:port" -> counters
+        self._lock = threading.Lock()
+
+    def _pool(self, address) -> dict:
+        key = "%s:%s" % address if isinstance(address, tuple) else str(address)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = {"address": key, "open": 0, "checked_out": 0, "max_checked_out": 0, "created": 0,
+                                       "closed": 0, "checkouts": 0, "checkout_failures": 0, "cleared": 0,
+                                       "wait_seconds_total": 0.0, "wait_seconds_max": 0.0, "max_pool_size": None}
+        return pool
+
+    def _update(self, address, **changes):
+        with self._lock:
+            pool = self._pool(address)
+            for name, delta in changes.items():
+                pool[name] += delta
+            pool["max_checked_out"] = max(pool["max_checked_out"], pool["checked_out"])
+            return pool
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)["max_pool_size"] = (event.options or {}).get("maxPoolSize")
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._update(event.address, cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pool = self._update(event.address, open=1, created=1)
+        MONGO_POOL_CONNECTIONS.set(pool["open"], address=pool["address"])
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool = self._update(event.address, open=-1, closed=1)
+        MONGO_POOL_CONNECTIONS.set(pool["open"], address=pool["address"])
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pool = self._update(event.address, checkout_failures=1)
+        MONGO_POOL_CHECKOUT_FAILURES.inc(address=pool["address"], reason=str(event.reason))
+
+    def connection_checked_out(self, event):
+        waited = getattr(event, "duration", None)                         # time spent waiting for the pool (pymongo >= 4.7)
+        pool = self._update(event.address, checked_out=1, checkouts=1)
+        MONGO_POOL_CHECKED_OUT.set(pool["checked_out"], address=pool["address"])
+        if waited is not None:
+            with self._lock:
+                pool["wait_seconds_total"] += waited
+                pool["wait_seconds_max"] = max(pool["wait_seconds_max"], waited)
+            MONGO_POOL_WAIT.observe(waited, address=pool["address"])
+
+    def connection_checked_in(self, event):
+        pool = self._update(event.address, checked_out=-1)
+        MONGO_POOL_CHECKED_OUT.set(pool["checked_out"], address=pool["address"])
+
+    def stats(self) -> list:
+        with self._lock:
+            return [dict(pool) for pool in self._pools.values()]
+
+
+pool_monitor = PoolMonitor()
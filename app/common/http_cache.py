@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+from app.common.metrics import counter
+
+
+#===========CONDITIONAL GET (ETag / Last-Modified) ===========================================
+# Employee documents carry a `version` that every write $inc's and an `updated_at` it $set's (see
+# app.common.utils.versioned). Polled routes first read only those two fields; when they match what the client
+# already has (If-None-Match / If-Modified-Since) the route answers 304 and never loads or serialises the document.
+# ETags are weak (W/"...") because the JSON body is not byte-for-byte stable, only semantically equal.
+CONDITIONAL_RESPONSES = counter("erp_conditional_get_total", "Conditional GETs by route and result (not_modified/full)", ["route", "result"])
+
+
+def make_etag(*parts) -> str:
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+def document_etag(kind: str, document: dict) -> str:
+    return make_etag(kind, document.get("_id"), f"v{document.get('version', 0)}")
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)   # stored naive UTC
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/"x" and "x" are the same validator"""
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:                                 # takes precedence over If-Modified-Since (RFC 9110)
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _as_utc(last_modified).replace(microsecond=0) <= since.astimezone(timezone.utc)
+    return False
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}        # browsers keep it but always revalidate
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+def not_modified_response(request: Request, route: str, etag: str, last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """304 response when the client's copy is current, otherwise None (and the route builds the full body)"""
+    if not is_not_modified(request, etag, last_modified):
+        return None
+    CONDITIONAL_RESPONSES.inc(route=route, result="not_modified")
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
+
+def set_validators(res: Response, route: str, etag: str, last_modified: Optional[datetime] = None):
+    CONDITIONAL_RESPONSES.inc(route=route, result="full")
+    res.headers.update(validator_headers(etag, last_modified))
@@ -0,0 +1,151 @@
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+from pymongo import CursorType
+from pymongo.database import Database
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from app.common.cache import TagCache, tag_cache
+from app.common.jobs import register_job
+from app.common.logger import get_logger
+from app.common.metrics import counter, histogram
+
+load_dotenv()
+logger = get_logger(__name__)
+
+
+#===========CROSS-WORKER INVALIDATION BUS ===========================================
+# With CACHE_BACKEND=memory every uvicorn worker has its own copy of the tagged read cache, so a write handled by
+# worker A must also evict the entries held by workers B, C... Writers already call invalidate_tags(); the bus
+# appends those tags to a small capped collection and every worker tails it with a tailable/await cursor, which
+# MongoDB wakes up as soon as a document is inserted, so remote eviction takes milliseconds and needs nothing
+# beyond the database we already use. Capped collections keep insertion order, which is what the tail follows.
+INVALIDATION_BUS = os.getenv("INVALIDATION_BUS", "true").lower() in ("1", "true", "yes")
+INVALIDATION_BUS_COLLECTION = os.getenv("INVALIDATION_BUS_COLLECTION", "cache_invalidations")
+INVALIDATION_BUS_SIZE_BYTES = int(os.getenv("INVALIDATION_BUS_SIZE_BYTES", 4 * 1024 * 1024))
+INVALIDATION_BUS_MAX_DOCS = int(os.getenv("INVALIDATION_BUS_MAX_DOCS", 20000))
+INVALIDATION_BUS_AWAIT_MS = int(os.getenv("INVALIDATION_BUS_AWAIT_MS", 500))     # how often the tail wakes up to check stop()
+INVALIDATION_BUS_RETRY_SECONDS = float(os.getenv("INVALIDATION_BUS_RETRY_SECONDS", 1))
+
+BUS_MESSAGES = counter("erp_cache_bus_messages_total", "Invalidation bus messages by direction (published/applied/failed)", ["direction"])
+BUS_DELIVERY = histogram("erp_cache_bus_delivery_seconds", "Time from publish on one worker to eviction on another",
+                         buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+
+
+def ensure_bus_collection(db: Database, size_bytes: int = INVALIDATION_BUS_SIZE_BYTES, max_docs: int = INVALIDATION_BUS_MAX_DOCS):
+    """Create the capped collection once; a tailable cursor dies on an empty collection, so seed it with a no-op"""
+    try:
+        db.create_collection(INVALIDATION_BUS_COLLECTION, capped=True, size=size_bytes, max=max_docs)
+    except CollectionInvalid:
+        pass                                               # already exists (another worker got there first)
+    if db[INVALIDATION_BUS_COLLECTION].find_one({}, {"_id": 1}) is None:
+        db[INVALIDATION_BUS_COLLECTION].insert_one({"origin": "init", "tags": [], "at": datetime.utcnow()})
+
+
+class InvalidationBus:
+    def __init__(self, cache: TagCache, origin: Optional[str] = None, name: str = "cache_invalidation_bus"):
+        self.cache = cache
+        self.origin = origin or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"    # messages from ourselves are already applied
+        self.job = register_job(name, "Tails the capped invalidation collection and evicts cached reads written by other workers")
+        self._db: Optional[Database] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_id = None                                # last message seen, to resume the tail after an error
+
+    #----------publishing (runs in the request thread of the writer) -----------------
+    def publish(self, db: Database, tags: Iterable[str]):
+        try:
+            db[INVALIDATION_BUS_COLLECTION].insert_one({"origin": self.origin, "tags": list(tags), "at": datetime.utcnow()})
+            BUS_MESSAGES.inc(direction="published")
+        except PyMongoError:
+            BUS_MESSAGES.inc(direction="failed")            # the write itself succeeded; other workers fall back to the TTL
+            logger.warning("Could not publish cache invalidation", extra={"tags": list(tags)}, exc_info=True)
+
+    #----------lifecycle -----------------
+    def start(self, db: Database):
+        if self._thread is not None:
+            return
+        ensure_bus_collection(db)
+        self._db = db
+        self._last_id = self._newest_id()                   # only messages published from now on
+        self._stop.clear()
+        self.cache.publishers.append(self.publish)
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation-bus", daemon=True)
+        self._thread.start()
+        logger.info("Cache invalidation bus started", extra={"origin": self.origin, "collection": INVALIDATION_BUS_COLLECTION})
+
+    def stop(self, timeout: float = 5):
+        if self._thread is None:
+            return
+        self._stop.set()
+        if self.publish in self.cache.publishers:
+            self.cache.publishers.remove(self.publish)
+        self._thread.join(timeout)
+        self._thread = None
+        self.job.stopped()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    #----------tailing (background thread) -----------------
+    def _newest_id(self):
+        newest = self._db[INVALIDATION_BUS_COLLECTION].find_one({}, {"_id": 1}, sort=[("$natural", -1)])
+        return newest["_id"] if newest else None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._tail()
+            except PyMongoError as e:
+                logger.warning("Cache invalidation bus interrupted, reconnecting", extra={"error": type(e).__name__})
+                self.job.stopped(f"{type(e).__name__}: {e}")
+            self._stop.wait(INVALIDATION_BUS_RETRY_SECONDS)
+
+    def _tail(self):
+        collection = self._db[INVALIDATION_BUS_COLLECTION]
+        skip_until = self._last_id
+        if skip_until is not None and collection.find_one({"_id": skip_until}, {"_id": 1}) is None:
+            # our position was overwritten while we were away: messages were lost, so drop everything cached
+            logger.warning("Cache invalidation bus fell behind the capped collection, clearing the local cache")
+            self.cache.clear()
+            skip_until = None
+        # ObjectIds from different processes are not ordered, so resume by skipping in natural (insertion) order
+        cursor = collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT).max_await_time_ms(INVALIDATION_BUS_AWAIT_MS)
+        try:
+            while cursor.alive and not self._stop.is_set():
+                self.job.heartbeat()
+                for message in cursor:
+                    if skip_until is not None:
+                        if message["_id"] == skip_until:
+                            skip_until = None
+                        continue
+                    self._apply(message)
+                    if self._stop.is_set():
+                        break
+        finally:
+            cursor.close()
+
+    def _apply(self, message: dict):
+        self._last_id = message["_id"]
+        if message.get("origin") == self.origin or not message.get("tags"):
+            return
+        self.cache.evict(None, message["tags"])
+        BUS_MESSAGES.inc(direction="applied")
+        if isinstance(message.get("at"), datetime):
+            BUS_DELIVERY.observe(max((datetime.utcnow() - message["at"]).total_seconds(), 0))
+
+
+invalidation_bus = InvalidationBus(tag_cache)
+
+
+def start_invalidation_bus(db: Database) -> bool:
+    """Started from the app lifespan; only useful while every worker keeps its own cache"""
+    if not INVALIDATION_BUS or tag_cache.backend.name != "memory":
+        return False
+    invalidation_bus.start(db)
+    return True
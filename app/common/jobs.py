@@ -0,0 +1,100 @@
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+
+#===========BACKGROUND JOB REGISTRY ===========================================
+# Anything that runs outside a request (startup index build, explain capture, listener threads) registers here
+# so /admin/jobs can show whether it ran, how long it took and why it last failed.
+class BackgroundJob:
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self.state = "idle"                                # idle | running | failed | stopped
+        self.runs = 0
+        self.failures = 0
+        self.running = 0
+        self.last_started: Optional[float] = None
+        self.last_finished: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.heartbeat_at: Optional[float] = None         # long-running loops call heartbeat() instead of run()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def run(self):
+        started = time.time()
+        with self._lock:
+            self.running += 1
+            self.state = "running"
+            self.last_started = started
+        try:
+            yield self
+        except Exception as e:
+            self._finish(started, f"{type(e).__name__}: {e}", traceback.format_exc(limit=3))
+            raise
+        else:
+            self._finish(started, None, None)
+
+    def _finish(self, started: float, error: Optional[str], trace: Optional[str]):
+        with self._lock:
+            self.running -= 1
+            self.runs += 1
+            self.last_finished = time.time()
+            self.last_duration = self.last_finished - started
+            if error:
+                self.failures += 1
+                self.last_error = trace or error
+            self.state = "running" if self.running else ("failed" if error else "idle")
+
+    def heartbeat(self):
+        with self._lock:
+            self.heartbeat_at = time.time()
+            if self.state != "running":
+                self.state = "running"
+
+    def stopped(self, error: Optional[str] = None):
+        with self._lock:
+            self.state = "failed" if error else "stopped"
+            if error:
+                self.failures += 1
+                self.last_error = error
+
+    def status(self) -> dict:
+        def iso(timestamp):
+            return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+        with self._lock:
+            return {
+                "name": self.name,
+                "description": self.description,
+                "state": self.state,
+                "runs": self.runs,
+                "failures": self.failures,
+                "running": self.running,
+                "last_started": iso(self.last_started),
+                "last_finished": iso(self.last_finished),
+                "last_duration_ms": round(self.last_duration * 1000, 2) if self.last_duration is not None else None,
+                "last_error": self.last_error,
+                "heartbeat_at": iso(self.heartbeat_at),
+            }
+
+
+JOBS: dict = {}
+_jobs_lock = threading.Lock()
+
+
+def register_job(name: str, description: str = "") -> BackgroundJob:
+    """Get or create the job called `name` (safe to call at import time from several modules)"""
+    with _jobs_lock:
+        job = JOBS.get(name)
+        if job is None:
+            job = JOBS[name] = BackgroundJob(name, description)
+        return job
+
+def job_statuses() -> list:
+    with _jobs_lock:
+        jobs = list(JOBS.values())
+    return [job.status() for job in jobs]
@@ -0,0 +1,144 @@
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from bson import ObjectId
+from pymongo.database import Database
+
+from app.common.cache import cached, employee_tag
+
+
+#===========LEAVE LEDGER (append-only balance history) ===========================================
+# Every change to a leave balance is appended to leave_ledger as an event that is never updated or deleted:
+#     {employee_id, at, event, leave_type, days, leave_id, note}
+#     grant / accrue / rollover   add to the allowance ({type}); rollover may be negative (expired carry-over)
+#     reserve / release           a Pending leave holds / gives back days ({type}_pending)
+#     consume                     an approved leave uses days ({type}_used)
+# A balance is the fold of those events. leave_ledger_snapshots keeps the folded balance of one employee up to a
+# cutoff time, so a read is the latest snapshot at or before the requested time plus the events after it (tail
+# replay): "balance as of March 31" costs the events between the snapshot before March 31 and March 31.
+# Reads whose tail grew past LEDGER_SNAPSHOT_EVERY write a new snapshot; scripts/leave_ledger.py snapshots everyone.
+# A snapshot's cutoff trails the clock by LEDGER_SNAPSHOT_LAG seconds so an event stamped just before the cutoff
+# but still in flight is never left out of it.
+# leave_balances (app.common.profile_sections) stays as the counter the conditional reservation checks; balance
+# reads return the ledger. Every write moves both as one unit (profile_sections.write_balance_change), and
+# scripts/leave_ledger.py --check reports counters that drifted from it anyway (data from before the ledger, crashes).
+LEDGER_COLLECTION = "leave_ledger"
+SNAPSHOT_COLLECTION = "leave_ledger_snapshots"
+LEDGER_SNAPSHOT_EVERY = int(os.getenv("LEDGER_SNAPSHOT_EVERY", 50))     # tail length that makes a read snapshot
+LEDGER_SNAPSHOT_LAG = int(os.getenv("LEDGER_SNAPSHOT_LAG", 300))
+BACKFILLED_FLAG = "ledger"                     # on leave_balances documents whose history is in the ledger
+
+LEAVE_TYPES = ("annual", "sick", "personal", "emergency")
+ALLOWANCE_EVENTS = ("grant", "accrue", "rollover")
+LEDGER_EVENTS = {                                      # event -> (balance field suffix, sign)
+    "grant": ("", 1),
+    "accrue": ("", 1),
+    "rollover": ("", 1),
+    "reserve": ("_pending", 1),
+    "release": ("_pending", -1),
+    "consume": ("_used", 1),
+}
+
+
+def ledger_event(employee_id, event: str, leave_type: str, days: int, leave_id=None, note: Optional[str] = None,
+                 at: Optional[datetime] = None) -> dict:
+    if event not in LEDGER_EVENTS:
+        raise ValueError(f"Unknown leave ledger event {event}")
+    return {"employee_id": ObjectId(employee_id), "at": at or datetime.utcnow(), "event": event,
+            "leave_type": leave_type.lower(), "days": days, "leave_id": str(leave_id) if leave_id else None, "note": note}
+
+def opening_events(employee_id, balance: dict, at: Optional[datetime] = None, note: str = "opening balance") -> list:
+    """Events that reproduce a counter balance ({type}, {type}_used, {type}_pending) from nothing"""
+    events = []
+    for leave_type in LEAVE_TYPES:
+        for event, field in (("grant", leave_type), ("consume", f"{leave_type}_used"), ("reserve", f"{leave_type}_pending")):
+            if balance.get(field):
+                events.append(ledger_event(employee_id, event, leave_type, balance[field], note=note, at=at))
+    return events
+
+def settlement_events(employee_id, leave_type: str, days: int, approved: bool, reserved: bool, leave_id=None) -> list:
+    """Same split as profile_sections.settlement_inc: give back the reservation, then charge when approved"""
+    events = []
+    if reserved:
+        events.append(ledger_event(employee_id, "release", leave_type, days, leave_id))
+    if approved:
+        events.append(ledger_event(employee_id, "consume", leave_type, days, leave_id))
+    return events
+
+def append_events(db: Database, events: list, session=None):
+    if events:
+        db[LEDGER_COLLECTION].insert_many(events, ordered=True, session=session)
+
+
+#-------------------folding -------------------------------------------------------------------------
+def empty_balance() -> dict:
+    return {f"{leave_type}{suffix}": 0 for leave_type in LEAVE_TYPES for suffix in ("", "_used", "_pending")}
+
+def fold(events, balance: Optional[dict] = None) -> dict:
+    balance = dict(balance) if balance is not None else empty_balance()
+    for event in events:
+        suffix, sign = LEDGER_EVENTS[event["event"]]
+        field = f"{event['leave_type']}{suffix}"
+        balance[field] = balance.get(field, 0) + sign * event["days"]
+    return balance
+
+
+#-------------------reads (snapshot + tail replay) --------------------------------------------------------
+def _latest_snapshot(db: Database, employee_id: ObjectId, as_of: datetime) -> Optional[dict]:
+    return db[SNAPSHOT_COLLECTION].find_one({"employee_id": employee_id, "at": {"$lte": as_of}},
+                                            {"at": 1, "balance": 1}, sort=[("at", -1)])
+
+def _tail(db: Database, employee_id: ObjectId, after: Optional[datetime], as_of: datetime) -> list:
+    at = {"$lte": as_of} if after is None else {"$gt": after, "$lte": as_of}
+    return list(db[LEDGER_COLLECTION].find({"employee_id": employee_id, "at": at},           # folding is a sum: any order
+                                           {"_id": 0, "at": 1, "event": 1, "leave_type": 1, "days": 1}))
+
+def write_snapshot(db: Database, employee_id, snapshot: Optional[dict] = None, tail: Optional[list] = None) -> Optional[datetime]:
+    """Fold everything up to now - LEDGER_SNAPSHOT_LAG into a snapshot; returns its cutoff (None: nothing new)"""
+    employee_id = ObjectId(employee_id)
+    cutoff = datetime.utcnow() - timedelta(seconds=LEDGER_SNAPSHOT_LAG)
+    if tail is None:
+        snapshot = _latest_snapshot(db, employee_id, cutoff)
+        tail = _tail(db, employee_id, snapshot["at"] if snapshot else None, cutoff)
+    covered = [event for event in tail if event["at"] <= cutoff]
+    if not covered:
+        return None
+    db[SNAPSHOT_COLLECTION].update_one(                                # concurrent readers may snapshot the same cutoff
+        {"employee_id": employee_id, "at": cutoff},
+        {"$setOnInsert": {"balance": fold(covered, snapshot["balance"] if snapshot else None), "events": len(covered)}},
+        upsert=True)
+    return cutoff
+
+@cached(tags=lambda employee_id, as_of=None: [employee_tag(str(employee_id))])
+def get_ledger_balance(db: Database, employee_id, as_of: Optional[datetime] = None) -> Optional[dict]:
+    """Balance now or as of a moment in the past; None when the employee has no ledger yet (not backfilled)"""
+    employee_id = ObjectId(employee_id)
+    until = as_of or datetime.utcnow()
+    snapshot = _latest_snapshot(db, employee_id, until)
+    tail = _tail(db, employee_id, snapshot["at"] if snapshot else None, until)
+    if snapshot is None and not tail:
+        return None
+    if as_of is None and len(tail) >= LEDGER_SNAPSHOT_EVERY:
+        write_snapshot(db, employee_id, snapshot, tail)
+    return fold(tail, snapshot["balance"] if snapshot else None)
+
+def get_ledger_balances(db: Database, employee_ids: list) -> dict:
+    """Current balance of many employees in two queries (latest snapshots, then every tail in one $or);
+    {employee_id: balance}, employees without a ledger are left out"""
+    employee_ids = list(dict.fromkeys(ObjectId(employee_id) for employee_id in employee_ids))
+    if not employee_ids:
+        return {}
+    now = datetime.utcnow()
+    snapshots = {snapshot["_id"]: snapshot for snapshot in db[SNAPSHOT_COLLECTION].aggregate([
+        {"$match": {"employee_id": {"$in": employee_ids}, "at": {"$lte": now}}},
+        {"$sort": {"employee_id": 1, "at": -1}},
+        {"$group": {"_id": "$employee_id", "at": {"$first": "$at"}, "balance": {"$first": "$balance"}}},
+    ])}
+    clauses = [{"employee_id": employee_id, "at": {"$gt": snapshots[employee_id]["at"], "$lte": now} if employee_id in snapshots
+                else {"$lte": now}} for employee_id in employee_ids]
+    tails = {}
+    for event in db[LEDGER_COLLECTION].find({"$or": clauses}, {"_id": 0, "employee_id": 1, "event": 1, "leave_type": 1, "days": 1}):
+        tails.setdefault(event["employee_id"], []).append(event)
+    return {employee_id: fold(tails.get(employee_id, []), snapshots[employee_id]["balance"] if employee_id in snapshots else None)
+            for employee_id in employee_ids if employee_id in snapshots or employee_id in tails}
@@ -0,0 +1,140 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from app.common.request_context import get_request_context
+
+load_dotenv()
+
+
+#===========STRUCTURED, NON-BLOCKING LOGGING ===========================================
+# Request threads only put records on an in-memory queue; a QueueListener thread formats them as JSON and
+# writes to stdout, so slow terminals or log shippers never add latency to a request.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_SAMPLE_RATES = {                                                    # share of records kept per level, WARNING and above are never sampled
+    logging.DEBUG: float(os.getenv("LOG_SAMPLE_DEBUG", 0.1)),
+    logging.INFO: float(os.getenv("LOG_SAMPLE_INFO", 1.0)),
+}
+
+SENSITIVE_KEYS = {"password", "hashed_password", "new_password", "token", "access_token", "authorization", "secret", "secret_key"}
+SECRET_PATTERNS = [
+    re.compile(r"\$2[aby]?\$\d{2}\$[./A-Za-z0-9]{53}"),                  # bcrypt hashes
+    re.compile(r"(?i)bearer\s+[A-Za-z0-9\-_.=]+"),                       # bearer tokens / JWTs
+]
+
+# attributes every LogRecord has; anything else was passed through `extra=` and goes into the JSON document
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id", "asctime", "taskName"}
+
+dropped_records = 0                                                     # records lost because the queue was full
+
+
+def redact(value):
+    if isinstance(value, dict):
+        return {key: "[REDACTED]" if str(key).lower() in SENSITIVE_KEYS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        for pattern in SECRET_PATTERNS:
+            value = pattern.sub("[REDACTED]", value)
+    return value
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id (runs in the calling thread, where the request context is visible)"""
+    def filter(self, record):
+        ctx = get_request_context()
+        record.request_id = ctx.request_id if ctx else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def filter(self, record):
+        rate = LOG_SAMPLE_RATES.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        document = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                document[key] = value
+        if record.exc_info:
+            document["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            document["exception"] = record.exc_text
+        return json.dumps(redact(document), default=str)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Only merge args and render the traceback here; JSON formatting happens on the listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        global dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:                                              # never block a request on logging
+            dropped_records += 1
+
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging():
+    """Route the root logger through the background queue writer (idempotent)"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter())
+
+        queue_handler = _NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        queue_handler.addFilter(SamplingFilter())                       # drop sampled records before they cost anything
+        queue_handler.addFilter(RequestIdFilter())
+
+        root = logging.getLogger()
+        root.handlers = [queue_handler]
+        root.setLevel(LOG_LEVEL)
+
+        _listener = logging.handlers.QueueListener(queue_handler.queue, stream, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)                                 # flush what is still queued on shutdown
+
+
+def queue_stats() -> dict:
+    log_queue = _listener.queue if _listener is not None else None
+    return {
+        "queued": log_queue.qsize() if log_queue is not None else 0,
+        "queue_size": LOG_QUEUE_SIZE,
+        "dropped": dropped_records,
+    }
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
@@ -0,0 +1,149 @@
+import itertools
+import os
+import threading
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from app.common.metrics import gauge
+
+load_dotenv()
+
+
+#===========MEMORY DIAGNOSTICS (tracemalloc) ===========================================
+# Off by default: tracing is started and stopped from the admin API (/admin/memory/...). While it is on, every
+# request records how far the traced peak rose while it ran, so the routes behind RSS growth (big list(find())
+# materialisations) stand out. Overlapping requests share one peak, so the per-request value is an upper bound.
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", 1))
+MEMORY_SNAPSHOTS = int(os.getenv("MEMORY_SNAPSHOTS", 5))                # snapshots kept in memory for diffing
+
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+REQUEST_PEAK_MEMORY = gauge("erp_request_peak_memory_bytes",
+                            "Highest traced memory growth of one request since tracemalloc was started, by route", ["route"])
+
+_snapshots: "OrderedDict[int, dict]" = OrderedDict()
+_snapshot_ids = itertools.count(1)
+_route_peaks: dict = {}                                                   # route -> {"peak_bytes", "requests", "path"}
+_inflight = 0
+_lock = threading.Lock()
+
+
+#----------tracing control -----------------
+def start_tracing(frames: int = TRACEMALLOC_FRAMES) -> dict:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    with _lock:
+        for route in _route_peaks:
+            REQUEST_PEAK_MEMORY.set(0, route=route)                       # a new tracing session starts from zero
+        _route_peaks.clear()
+    return tracing_status()
+
+def stop_tracing() -> dict:
+    tracemalloc.stop()                                                    # frees the traces; snapshots already taken stay
+    return tracing_status()
+
+def tracing_status() -> dict:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {
+        "tracing": tracing,
+        "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+        "traced_current_kb": round(current / 1024, 1),
+        "traced_peak_kb": round(peak / 1024, 1),
+        "tracemalloc_overhead_kb": round(tracemalloc.get_tracemalloc_memory() / 1024, 1),
+        "snapshots": [_snapshot_info(snapshot_id, entry) for snapshot_id, entry in _snapshots.items()],
+    }
+
+
+#----------snapshots and diffs -----------------
+def _stat_row(stat) -> dict:
+    frame = stat.traceback[0]
+    row = {"file": frame.filename, "line": frame.lineno, "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        row["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+        row["count_diff"] = stat.count_diff
+    if len(stat.traceback) > 1:
+        row["traceback"] = [f"{item.filename}:{item.lineno}" for item in stat.traceback]
+    return row
+
+def _snapshot_info(snapshot_id: int, entry: dict) -> dict:
+    return {"id": snapshot_id, "label": entry["label"], "taken_at": entry["taken_at"], "total_kb": entry["total_kb"]}
+
+def take_snapshot(label: Optional[str] = None, limit: int = 25, group_by: str = "lineno") -> dict:
+    if not tracemalloc.is_tracing():
+        raise ValueError("tracemalloc is not running; start it first")
+    snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+    stats = snapshot.statistics(group_by)
+    entry = {
+        "snapshot": snapshot,
+        "label": label,
+        "taken_at": datetime.now(timezone.utc).isoformat(),
+        "total_kb": round(sum(stat.size for stat in stats) / 1024, 1),
+    }
+    with _lock:
+        snapshot_id = next(_snapshot_ids)
+        _snapshots[snapshot_id] = entry
+        while len(_snapshots) > MEMORY_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return {**_snapshot_info(snapshot_id, entry), "top": [_stat_row(stat) for stat in stats[:limit]]}
+
+def diff_snapshots(from_id: int, to_id: Optional[int] = None, limit: int = 25, group_by: str = "lineno") -> dict:
+    """Largest allocation changes between two snapshots; to_id=None diffs against a new snapshot taken now"""
+    with _lock:
+        old = _snapshots.get(from_id)
+        new = _snapshots.get(to_id) if to_id is not None else None
+    if old is None or (to_id is not None and new is None):
+        raise LookupError("Snapshot not found")
+    if new is None:
+        to_id = take_snapshot(label="diff", limit=0)["id"]
+        new = _snapshots[to_id]
+    stats = new["snapshot"].compare_to(old["snapshot"], group_by)
+    return {
+        "from": from_id,
+        "to": to_id,
+        "group_by": group_by,
+        "total_diff_kb": round(sum(stat.size_diff for stat in stats) / 1024, 1),
+        "top": [_stat_row(stat) for stat in stats[:limit]],
+    }
+
+
+#----------per-request peak (called by app.common.middleware) -----------------
+def request_started() -> Optional[int]:
+    """Traced memory when the request started, or None when tracing is off (the only cost then)"""
+    global _inflight
+    if not tracemalloc.is_tracing():
+        return None
+    with _lock:
+        if _inflight == 0:
+            tracemalloc.reset_peak()                                      # only when idle, so running requests keep their peak
+        _inflight += 1
+    return tracemalloc.get_traced_memory()[0]
+
+def request_finished(route: str, path: str, started_bytes: int):
+    global _inflight
+    with _lock:
+        _inflight = max(_inflight - 1, 0)
+    if not tracemalloc.is_tracing():
+        return
+    growth = max(tracemalloc.get_traced_memory()[1] - started_bytes, 0)
+    with _lock:
+        entry = _route_peaks.setdefault(route, {"peak_bytes": 0, "requests": 0, "path": path})
+        entry["requests"] += 1
+        if growth > entry["peak_bytes"]:
+            entry["peak_bytes"], entry["path"] = growth, path
+            REQUEST_PEAK_MEMORY.set(growth, route=route)
+
+def route_peaks() -> list:
+    with _lock:
+        rows = [{"route": route, "peak_kb": round(entry["peak_bytes"] / 1024, 1), "requests": entry["requests"],
+                 "example_path": entry["path"]} for route, entry in _route_peaks.items()]
+    return sorted(rows, key=lambda row: row["peak_kb"], reverse=True)
@@ -0,0 +1,173 @@
+import threading
+from typing import Dict, Iterable, Tuple
+
+
+#===========IN-PROCESS METRICS (Prometheus text format) ===========================================
+# Plain counters kept in memory and rendered on /metrics. Label values must stay low-cardinality:
+# use route templates and collection names, never raw paths, ids or emails.
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values, extra)} {_format_number(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        for key, value in sorted(self.values().items()):
+            yield "", self.labelnames, key, "", value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}               # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break                                  # stored per-bucket, made cumulative when rendered
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self) -> Dict[Tuple, list]:
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def samples(self):
+        for key, series in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield "_bucket", self.labelnames, key, f'le="{_format_number(bound)}"', cumulative
+            yield "_bucket", self.labelnames, key, 'le="+Inf"', series[-1]
+            yield "_sum", self.labelnames, key, "", series[-2]
+            yield "_count", self.labelnames, key, "", series[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+def counter(name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labels))
+
+def gauge(name: str, documentation: str, labels: Iterable[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labels))
+
+def histogram(name: str, documentation: str, labels: Iterable[str] = (), buckets=DEFAULT_LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labels, buckets))
+
+
+#----------HTTP metrics (recorded by app.common.middleware) -----------------
+HTTP_REQUESTS = counter("erp_http_requests_total", "HTTP requests by route template and status code", ["method", "route", "status"])
+HTTP_LATENCY = histogram("erp_http_request_duration_seconds", "HTTP request latency by route template", ["method", "route"])
+HTTP_IN_PROGRESS = gauge("erp_http_requests_in_progress", "HTTP requests currently being served")
+
+#----------MongoDB metrics (recorded by app.common.db_monitor) ---------------
+MONGO_COMMANDS = counter("erp_mongo_commands_total", "MongoDB commands by collection and command name", ["collection", "command"])
+MONGO_FAILURES = counter("erp_mongo_command_failures_total", "Failed MongoDB commands by collection and command name", ["collection", "command"])
+MONGO_LATENCY = histogram("erp_mongo_command_duration_seconds", "MongoDB command latency by collection", ["collection", "command"])
+MONGO_REQUEST_BYTES = counter("erp_mongo_command_request_bytes_total", "BSON bytes sent to MongoDB by collection", ["collection"])
+MONGO_REPLY_BYTES = counter("erp_mongo_command_reply_bytes_total", "BSON bytes received from MongoDB by collection", ["collection"])
+
+#----------MongoDB connection pool (recorded by app.common.db_monitor.PoolMonitor) ----
+MONGO_POOL_CONNECTIONS = gauge("erp_mongo_pool_connections", "Open connections in the MongoDB pool", ["address"])
+MONGO_POOL_CHECKED_OUT = gauge("erp_mongo_pool_checked_out", "MongoDB connections currently checked out", ["address"])
+MONGO_POOL_CHECKOUT_FAILURES = counter("erp_mongo_pool_checkout_failures_total", "Failed MongoDB connection checkouts", ["address", "reason"])
+MONGO_POOL_WAIT = histogram("erp_mongo_pool_wait_seconds", "Time spent waiting to check a connection out of the pool", ["address"],
+                            buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+
+#----------MongoDB usage per HTTP route ---------------------------------------
+ROUTE_MONGO_COMMANDS = counter("erp_route_mongo_commands_total", "MongoDB commands issued while serving a route, by collection", ["route", "collection"])
+ROUTE_MONGO_DURATION = counter("erp_route_mongo_duration_seconds_total", "Time spent in MongoDB while serving a route", ["route"])
+REQUEST_MONGO_COMMANDS = histogram("erp_request_mongo_commands", "MongoDB commands per HTTP request", ["route"],
+                                   buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100, 250))
+N_PLUS_ONE_DETECTIONS = counter("erp_n_plus_one_detections_total", "Requests that repeated one query shape past the threshold", ["route"])
@@ -0,0 +1,69 @@
+import time
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+
+from app.common.metrics import (HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_PROGRESS, ROUTE_MONGO_COMMANDS,
+                                ROUTE_MONGO_DURATION, REQUEST_MONGO_COMMANDS, N_PLUS_ONE_DETECTIONS)
+from app.common.db_monitor import N_PLUS_ONE_MODE
+from app.common.profiler import SamplingProfiler, profiling_requested, save_profile
+from app.common.memory import request_started, request_finished
+from app.common.request_context import RequestContext, route_template, set_request_context, reset_request_context
+
+
+#===========OBSERVABILITY MIDDLEWARE ===========================================
+#----------Request id, per-route latency/status and MongoDB usage per request ----------
+REQUEST_OBSERVERS: list = []                                            # callables run with every finished RequestContext (see tests/conftest.py)
+
+async def observability_middleware(request: Request, call_next):
+    ctx = RequestContext(request.headers.get("x-request-id"), request.method, request.url.path)
+    ctx.scope = request.scope
+    token = set_request_context(ctx)
+    profiler = SamplingProfiler(ctx) if profiling_requested(request.headers) else None     # opt-in, see app.common.profiler
+    HTTP_IN_PROGRESS.inc()
+    traced_bytes = request_started()                                    # None unless tracemalloc was started from /admin/memory
+    started = time.perf_counter()
+    status_code = 500                                                   # stays 500 if the app raised
+    if profiler:
+        profiler.start()
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        HTTP_IN_PROGRESS.dec()
+        ctx.route = route_template(request.scope)                       # template, not the raw path, to keep label cardinality bounded
+        _record_request(ctx, status_code, elapsed)
+        if traced_bytes is not None:
+            request_finished(ctx.route, ctx.path, traced_bytes)
+        reset_request_context(token)
+        if profiler:
+            profiler.stop()
+            save_profile(profiler, status_code)
+
+    if ctx.repeated_queries and N_PLUS_ONE_MODE == "raise":
+        response = JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": "N+1 query pattern detected", "repeated_queries": repeated_query_report(ctx)},
+        )
+    response.headers["X-Request-ID"] = ctx.request_id
+    return response
+
+
+def _record_request(ctx: RequestContext, status_code: int, elapsed: float):
+    HTTP_REQUESTS.inc(method=ctx.method, route=ctx.route, status=str(status_code))
+    HTTP_LATENCY.observe(elapsed, method=ctx.method, route=ctx.route)
+    REQUEST_MONGO_COMMANDS.observe(ctx.mongo_commands, route=ctx.route)
+    if ctx.mongo_commands:
+        ROUTE_MONGO_DURATION.inc(ctx.mongo_duration, route=ctx.route)
+        for collection, count in ctx.mongo_by_collection.items():
+            ROUTE_MONGO_COMMANDS.inc(count, route=ctx.route, collection=collection)
+    if ctx.repeated_queries:
+        N_PLUS_ONE_DETECTIONS.inc(len(ctx.repeated_queries), route=ctx.route)
+    for observer in REQUEST_OBSERVERS:
+        observer(ctx)
+
+
+def repeated_query_report(ctx: RequestContext) -> list:
+    return [{"collection": collection, "shape": shape, "count": ctx.query_shapes[(collection, shape)]}
+            for collection, shape in ctx.repeated_queries]
@@ -0,0 +1,290 @@
+import os
+from typing import Optional
+
+from bson import ObjectId
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError
+
+from app.common.utils import versioned
+from app.common.leave_ledger import (BACKFILLED_FLAG, append_events, get_ledger_balance, get_ledger_balances, ledger_event,
+                                     opening_events, settlement_events)
+
+
+#===========PROFILE SECTIONS (kept out of employee_db) ===========================================
+# employee_db is read on every authenticated request and by every list/search, so it only holds what those need.
+# The bulky, rarely read parts of a profile live in their own collections, one document per employee whose _id
+# is the employee's _id (the _id index is all they need):
+#     employee_education        {_id, education: [...]}
+#     employee_work_experience  {_id, work_experience: [...]}
+#     employee_addresses        {_id, current_address, permanent_address}
+#     leave_balances            {_id, annual, annual_used, annual_pending, sick, ...}
+# Only the endpoints that show them load them (load_profile joins all four in one aggregate). Every section write
+# also bumps the employee's version/updated_at (touch_employee), so ETags and list versions still cover the whole
+# profile. scripts/migrate_profile_sections.py moves existing embedded data out.
+EDUCATION_COLLECTION = "employee_education"
+WORK_EXPERIENCE_COLLECTION = "employee_work_experience"
+ADDRESS_COLLECTION = "employee_addresses"
+LEAVE_BALANCE_COLLECTION = "leave_balances"
+
+ARRAY_SECTIONS = {"education": EDUCATION_COLLECTION, "work_experience": WORK_EXPERIENCE_COLLECTION}
+ADDRESS_FIELDS = ("current_address", "permanent_address")
+SECTION_FIELDS = (*ARRAY_SECTIONS, *ADDRESS_FIELDS, "leave_balance")     # no longer stored on employee_db
+SECTION_COLLECTIONS = (*ARRAY_SECTIONS.values(), ADDRESS_COLLECTION, LEAVE_BALANCE_COLLECTION)
+SECTION_FIELD_COLLECTIONS = {**ARRAY_SECTIONS, **{field: ADDRESS_COLLECTION for field in ADDRESS_FIELDS},
+                             "leave_balance": LEAVE_BALANCE_COLLECTION}
+MIGRATED_FLAG = "migrated"                        # set by scripts/migrate_profile_sections.py, never returned by the API
+LEAVE_TRANSACTIONS = os.getenv("LEAVE_TRANSACTIONS", "false").lower() in ("1", "true", "yes")   # replica set required
+
+DEFAULT_LEAVE_BALANCE = {
+    "annual": 12,
+    "sick": 6,
+    "personal": 3,
+    "emergency": 2,
+
+    "annual_used": 0,
+    "sick_used": 0,
+    "personal_used": 0,
+    "emergency_used": 0,
+
+    "annual_pending": 0,                          # reserved by leaves that are still Pending
+    "sick_pending": 0,
+    "personal_pending": 0,
+    "emergency_pending": 0,
+}
+
+
+def as_object_id(employee_id) -> ObjectId:
+    return employee_id if isinstance(employee_id, ObjectId) else ObjectId(employee_id)
+
+def split_sections(employee: dict) -> dict:
+    """Pop the section fields off an employee document; returns {collection: section document} (no _id yet)"""
+    sections = {}
+    for field, collection in ARRAY_SECTIONS.items():
+        if field in employee:
+            sections[collection] = {field: employee.pop(field) or []}
+    addresses = {field: employee.pop(field) for field in ADDRESS_FIELDS if field in employee}
+    if addresses:
+        sections[ADDRESS_COLLECTION] = addresses
+    if "leave_balance" in employee:
+        sections[LEAVE_BALANCE_COLLECTION] = dict(employee.pop("leave_balance") or {})
+    return sections
+
+def insert_sections(db: Database, employee_id, sections: dict):
+    """Section documents of a new employee (create_employee, after the employee_db insert)"""
+    for collection, document in sections.items():
+        db[collection].insert_one({**document, "_id": as_object_id(employee_id)})
+
+
+#-------------------writes -------------------------------------------------------------------------
+def touch_employee(db: Database, employee_filter: dict, session=None):
+    """Bump version/updated_at of the owning employee; matched_count == 0 means there is no such employee"""
+    return db["employee_db"].update_one(employee_filter, versioned({}), session=session)
+
+def update_section(db: Database, employee_id, collection: str, update: dict, upsert: bool = True):
+    """Write one section of an existing employee: employee first (404 check + version), then the section"""
+    touched = touch_employee(db, {"_id": as_object_id(employee_id)})
+    if touched.matched_count:
+        db[collection].update_one({"_id": as_object_id(employee_id)}, update, upsert=upsert)
+    return touched
+
+
+#-------------------reads -------------------------------------------------------------------------
+def _lookup(collection: str, alias: str) -> dict:
+    return {"$lookup": {"from": collection, "localField": "_id", "foreignField": "_id", "as": alias}}
+
+def merge_sections(employee: dict) -> dict:
+    """Fold the $lookup results of load_profile into the shape the API always returned"""
+    for field, collection in ARRAY_SECTIONS.items():
+        found = employee.pop(f"_{collection}", [])
+        if found:                                                     # otherwise keep a not yet migrated embedded copy
+            employee[field] = found[0].get(field, [])
+    found = employee.pop(f"_{ADDRESS_COLLECTION}", [])
+    if found:
+        employee.update({field: found[0][field] for field in ADDRESS_FIELDS if field in found[0]})
+    found = employee.pop(f"_{LEAVE_BALANCE_COLLECTION}", [])
+    if found:
+        employee["leave_balance"] = {key: value for key, value in found[0].items() if key not in ("_id", MIGRATED_FLAG, BACKFILLED_FLAG)}
+    return employee
+
+def load_profile(db: Database, employee_filter: dict, projection: Optional[dict] = None) -> Optional[dict]:
+    """One employee with every section, in a single round trip ($lookup on the sections' _id index)"""
+    pipeline = [{"$match": employee_filter}, {"$limit": 1}, {"$project": projection or {"password": 0}}]
+    pipeline += [_lookup(collection, f"_{collection}") for collection in SECTION_COLLECTIONS]
+    employee = next(db["employee_db"].aggregate(pipeline), None)
+    if employee is None:
+        return None
+    employee = merge_sections(employee)
+    if "leave_balance" in employee:
+        employee["leave_balance"] = get_ledger_balance(db, employee["_id"]) or employee["leave_balance"]   # ledger is the record
+    return employee
+
+def project_fields(document: dict, fields: list) -> dict:
+    """Inclusion projection applied in Python, for documents assembled after the query (sections merged in):
+    dotted paths reach into sub-documents and arrays of them, like they do in a MongoDB projection"""
+    paths: dict = {}
+    for field in fields:
+        head, _, rest = field.partition(".")
+        paths.setdefault(head, []).append(rest)
+    projected = {}
+    for head, rests in paths.items():
+        if head not in document:
+            continue
+        value = document[head]
+        if "" in rests:
+            projected[head] = value
+        elif isinstance(value, dict):
+            projected[head] = project_fields(value, rests)
+        elif isinstance(value, list):
+            projected[head] = [project_fields(item, rests) for item in value if isinstance(item, dict)]
+    return projected
+
+def collapse_paths(fields: list) -> list:
+    """Drop duplicates and paths already covered by a parent path ("job_info" covers "job_info.department"):
+    MongoDB rejects a projection that names both as a path collision"""
+    unique = list(dict.fromkeys(fields))
+    covered = set(unique)
+    return [field for field in unique
+            if not any(".".join(field.split(".")[:depth]) in covered for depth in range(1, field.count(".") + 1))]
+
+def load_profiles(db: Database, employee_filter: dict, fields: Optional[list] = None) -> list:
+    """Every matching employee with its sections in one aggregate, leave balances from the ledger in two more queries.
+    `fields` (top-level or dotted, sections included) limits what is read and joined; None = whole profiles."""
+    if fields:
+        fields = collapse_paths(fields)
+    roots = {field.split(".")[0] for field in fields} if fields else set(SECTION_FIELDS)
+    sections = [field for field in SECTION_FIELDS if field in roots]
+    if fields:
+        projection = {field: 1 for field in fields if field.split(".")[0] not in SECTION_FIELDS}
+        projection.update({field: 1 for field in sections})                # embedded copies not migrated yet
+    else:
+        projection = {"password": 0}
+    pipeline = [{"$match": employee_filter}, {"$project": projection}]
+    pipeline += [_lookup(collection, f"_{collection}") for collection in dict.fromkeys(SECTION_FIELD_COLLECTIONS[field] for field in sections)]
+    employees = [merge_sections(employee) for employee in db["employee_db"].aggregate(pipeline)]
+
+    ledgers = get_ledger_balances(db, [employee["_id"] for employee in employees if "leave_balance" in employee])
+    for employee in employees:
+        if employee["_id"] in ledgers:
+            employee["leave_balance"] = ledgers[employee["_id"]]                  # ledger is the record
+    return [project_fields(employee, ["_id", *fields]) for employee in employees] if fields else employees
+
+def get_leave_balance(db: Database, employee_id) -> Optional[dict]:
+    balance = get_ledger_balance(db, as_object_id(employee_id))                  # app.common.leave_ledger, cached
+    if balance is not None:
+        return balance
+    balance = db[LEAVE_BALANCE_COLLECTION].find_one({"_id": as_object_id(employee_id)},
+                                                    {"_id": 0, MIGRATED_FLAG: 0, BACKFILLED_FLAG: 0})   # not backfilled yet
+    if balance is not None:
+        return balance
+    employee = db["employee_db"].find_one({"_id": as_object_id(employee_id)}, {"leave_balance": 1})   # not migrated yet
+    return None if employee is None else employee.get("leave_balance", {})
+
+
+#-------------------leave balance reservations -------------------------------------------------------------
+# Applying for leave reserves the days ({type}_pending) in the same conditional update that checks they are
+# available, so parallel applications cannot overbook; the decision later converts (approve) or releases
+# (reject/cancel) exactly what was reserved. Leaves carry `reserved: True` when their days were reserved.
+# Each change is also appended to the leave ledger (app.common.leave_ledger) as reserve/release/consume events, and
+# the two are written as one unit (write_balance_change): in a transaction with LEAVE_TRANSACTIONS=true, otherwise
+# counter first, then the events, with the counter change undone if the events cannot be written. Balance reads come
+# from the ledger and admission checks from the counters, so neither may move without the other.
+# Writes only ever update an existing leave_balances document; an employee who has none yet (balance still embedded
+# in employee_db because the migration has not run) gets it from ensure_leave_balance, seeded with exactly what
+# get_leave_balance shows, so reads and writes agree.
+def _balance_fields(leave_type: str) -> tuple:
+    leave_type = leave_type.lower()
+    return leave_type, f"{leave_type}_used", f"{leave_type}_pending"
+
+def ensure_leave_balance(db: Database, employee_id, session=None) -> bool:
+    """Create a missing leave_balances document from the embedded balance (or the defaults); True if created now"""
+    employee = db["employee_db"].find_one({"_id": as_object_id(employee_id)}, {"leave_balance": 1}, session=session)
+    if employee is None:
+        return False
+    balance = {**DEFAULT_LEAVE_BALANCE, **(employee.get("leave_balance") or {})}
+    try:
+        result = db[LEAVE_BALANCE_COLLECTION].update_one(                   # the migration skips documents marked migrated
+            {"_id": employee["_id"]}, {"$setOnInsert": {**balance, MIGRATED_FLAG: True, BACKFILLED_FLAG: True}},
+            upsert=True, session=session)
+    except DuplicateKeyError:                                               # a concurrent request created it first
+        return False
+    if result.upserted_id is None:
+        return False
+    append_events(db, opening_events(employee["_id"], balance), session=session)
+    return True
+
+def missing_leave_balances(db: Database, employee_ids: list, session=None) -> list:
+    """The employees among employee_ids that have no leave_balances document yet"""
+    existing = set(db[LEAVE_BALANCE_COLLECTION].distinct("_id", {"_id": {"$in": employee_ids}}, session=session))
+    return [employee_id for employee_id in employee_ids if employee_id not in existing]
+
+def update_leave_balance(db: Database, balance_filter: dict, update: dict, session=None):
+    """update_one on leave_balances; when the employee has no document yet it is created first and the write retried.
+    A conditional filter that simply does not hold (not enough balance) costs one _id lookup, nothing more."""
+    result = db[LEAVE_BALANCE_COLLECTION].update_one(balance_filter, update, session=session)
+    if result.matched_count == 0 and db[LEAVE_BALANCE_COLLECTION].find_one(
+            {"_id": balance_filter["_id"]}, {"_id": 1}, session=session) is None:
+        ensure_leave_balance(db, balance_filter["_id"], session=session)      # created now or by a concurrent request:
+        result = db[LEAVE_BALANCE_COLLECTION].update_one(balance_filter, update, session=session)    # it exists now
+    return result
+
+def write_balance_change(db: Database, balance_filter: dict, inc: dict, events: list, session=None) -> bool:
+    """$inc the counters matching balance_filter and append the ledger events describing it, both or neither;
+    False when the filter did not match (e.g. not enough balance left) and nothing was written"""
+    if session is None and LEAVE_TRANSACTIONS:
+        with db.client.start_session() as own_session:
+            return own_session.with_transaction(lambda s: write_balance_change(db, balance_filter, inc, events, s))
+    result = update_leave_balance(db, balance_filter, {"$inc": inc}, session=session)
+    if result.modified_count != 1:
+        return False
+    try:
+        append_events(db, events, session=session)
+    except Exception:
+        if session is None or not session.in_transaction:                 # nothing will roll the counter back for us
+            db[LEAVE_BALANCE_COLLECTION].update_one({"_id": balance_filter["_id"]},
+                                                    {"$inc": {field: -days for field, days in inc.items()}})
+        raise
+    return True
+
+def reserve_leave_days(db: Database, employee_id, leave_type: str, days: int, leave_id=None, session=None) -> bool:
+    """Add `days` to {type}_pending only if total - used - pending still covers them"""
+    total, used, pending = _balance_fields(leave_type)
+    return write_balance_change(
+        db,
+        {"_id": as_object_id(employee_id), "$expr": {"$lte": [
+            {"$add": [{"$ifNull": [f"${used}", 0]}, {"$ifNull": [f"${pending}", 0]}, days]},
+            {"$ifNull": [f"${total}", 0]},
+        ]}},
+        {pending: days},
+        [ledger_event(employee_id, "reserve", leave_type, days, leave_id)],
+        session=session,
+    )
+
+def adjust_allowance(db: Database, employee_id, event: str, leave_type: str, days: int, note: Optional[str] = None) -> bool:
+    """Grant, accrual or rollover of {type}; a negative rollover only applies if the allowance stays at or above what
+    is already used or reserved (False otherwise, nothing written)"""
+    total, used, pending = _balance_fields(leave_type)
+    balance_filter = {"_id": as_object_id(employee_id)}
+    if days < 0:
+        balance_filter["$expr"] = {"$lte": [
+            {"$add": [{"$ifNull": [f"${used}", 0]}, {"$ifNull": [f"${pending}", 0]}]},
+            {"$add": [{"$ifNull": [f"${total}", 0]}, days]},
+        ]}
+    return write_balance_change(db, balance_filter, {total: days}, [ledger_event(employee_id, event, leave_type, days, note=note)])
+
+def settlement_inc(leave_type: str, days: int, approved: bool, reserved: bool, inc: Optional[dict] = None) -> dict:
+    """$inc that releases the reservation and, when approved, charges the days (added onto `inc` if given)"""
+    _, used, pending = _balance_fields(leave_type)
+    inc = {} if inc is None else inc
+    if reserved:
+        inc[pending] = inc.get(pending, 0) - days
+    if approved:
+        inc[used] = inc.get(used, 0) + days
+    return inc
+
+def settle_leave_days(db: Database, employee_id, leave_type: str, days: int, approved: bool, reserved: bool, leave_id=None,
+                      session=None):
+    """Decision or cancellation: release the reservation and, when approved, charge the days"""
+    inc = settlement_inc(leave_type, days, approved, reserved)
+    if inc:
+        write_balance_change(db, {"_id": as_object_id(employee_id)}, inc,
+                             settlement_events(employee_id, leave_type, days, approved, reserved, leave_id), session=session)
@@ -0,0 +1,189 @@
+import functools
+import inspect
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from uuid import uuid4
+
+from dotenv import load_dotenv
+from fastapi.routing import APIRoute
+
+from app.common.logger import get_logger
+from app.common.request_context import RequestContext, get_request_context
+
+load_dotenv()
+logger = get_logger(__name__)
+
+
+#===========OPT-IN PER-REQUEST PROFILING ===========================================
+# Disabled unless PROFILING_TOKEN is set. A request is profiled only when it sends the same value in the
+# X-Profile-Token header; every other request pays one string comparison. Sync routes run in the threadpool,
+# so a sampling thread is used instead of cProfile (which only sees its own thread): it samples the event loop
+# thread plus the worker threads running the request's sync code. Those register themselves for exactly as long as
+# they run it (profiled(): sync endpoints through ProfiledRoute, explicit run_in_threadpool calls by hand), so a
+# pooled thread is never attributed to the request it served before.
+# Profiles are written in speedscope format (https://www.speedscope.app) and listed at /admin/profiles.
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_HEADER = "x-profile-token"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", 2)) / 1000
+PROFILE_HISTORY = int(os.getenv("PROFILE_HISTORY", 50))                 # profiles kept in the index (and on disk)
+
+_recent_profiles: deque = deque(maxlen=PROFILE_HISTORY)
+_recent_lock = threading.Lock()
+
+
+def profiling_requested(headers) -> bool:
+    return bool(PROFILING_TOKEN) and headers.get(PROFILE_HEADER) == PROFILING_TOKEN
+
+
+class SamplingProfiler:
+    """Samples the stacks of the threads serving one request until stop() is called"""
+    def __init__(self, ctx: RequestContext, interval: float = PROFILE_INTERVAL):
+        self.ctx = ctx
+        self.interval = interval
+        self.frames: list = []                                      # speedscope shared frame table
+        self._frame_index: dict = {}                                # (name, file, line) -> index in self.frames
+        self.samples: dict = {}                                     # thread id -> [(stack frame indexes, weight in ms)]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{ctx.request_id}", daemon=True)
+        ctx.profile_threads = {threading.get_ident()}               # the event loop thread; worker threads register in profiled()
+        self.started = self.stopped = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+
+    def _frame_id(self, code, line: int) -> int:
+        key = (code.co_name, code.co_filename, line)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({"name": code.co_name, "file": code.co_filename, "line": line})
+        return index
+
+    def _run(self):
+        own_id = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = (now - last) * 1000, now
+            frames = sys._current_frames()
+            for thread_id in list(self.ctx.profile_threads):
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_id(frame.f_code, frame.f_lineno))
+                    frame = frame.f_back
+                stack.reverse()                                     # speedscope wants root first
+                self.samples.setdefault(thread_id, []).append((stack, weight))
+
+    def to_speedscope(self) -> dict:
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        profiles = []
+        for thread_id, samples in self.samples.items():
+            profiles.append({
+                "type": "sampled",
+                "name": f"{self.ctx.method} {self.ctx.route or self.ctx.path} [{thread_names.get(thread_id, thread_id)}]",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weight for _, weight in samples), 3),
+                "samples": [stack for stack, _ in samples],
+                "weights": [round(weight, 3) for _, weight in samples],
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.ctx.method} {self.ctx.path} ({self.ctx.request_id})",
+            "exporter": "erp-fastapi-backend",
+            "shared": {"frames": self.frames},
+            "profiles": profiles,
+        }
+
+
+def profiled(func: Callable) -> Callable:
+    """Wrap a sync callable that runs in a worker thread: while it runs for a profiled request, the thread is sampled"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        ctx = get_request_context()
+        threads = ctx.profile_threads if ctx is not None else None
+        thread_id = threading.get_ident()
+        if threads is None or thread_id in threads:
+            return func(*args, **kwargs)
+        threads.add(thread_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            threads.discard(thread_id)                              # the pool hands this thread to other requests next
+    return wrapper
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose sync endpoint registers its worker thread with the request's profiler (route_class of the routers)"""
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = profiled(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _profile_path(request_id: str) -> str:
+    safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", request_id)[:64]          # request ids can come from the X-Request-ID header
+    return os.path.join(PROFILE_DIR, f"{safe_id}-{uuid4().hex[:12]}.speedscope.json")   # X-Request-ID can repeat
+
+def save_profile(profiler: SamplingProfiler, status_code: int) -> Optional[dict]:
+    """Write the profile to PROFILE_DIR and add it to the recent-profiles index"""
+    ctx = profiler.ctx
+    path = _profile_path(ctx.request_id)
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(path, "w") as handle:
+            json.dump(profiler.to_speedscope(), handle)
+    except OSError:
+        logger.exception("Could not write profile", extra={"path": path})
+        return None
+    entry = {
+        "request_id": ctx.request_id,
+        "method": ctx.method,
+        "path": ctx.path,
+        "route": ctx.route,
+        "status": status_code,
+        "duration_ms": round((profiler.stopped - profiler.started) * 1000, 2),
+        "samples": sum(len(samples) for samples in profiler.samples.values()),
+        "threads": len(profiler.samples),
+        "mongo_commands": ctx.mongo_commands,
+        "file": path,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with _recent_lock:
+        if len(_recent_profiles) == _recent_profiles.maxlen:
+            _remove_file(_recent_profiles[0]["file"])               # oldest profile falls out of the index
+        _recent_profiles.append(entry)
+    logger.info("Saved request profile", extra={"profile_file": path, "route": ctx.route})
+    return entry
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def recent_profiles() -> list:
+    with _recent_lock:
+        return list(reversed(_recent_profiles))                     # newest first
+
+def profile_file(request_id: str) -> Optional[str]:
+    """File of the newest profile of request_id; only files listed in the index are served, never arbitrary paths"""
+    with _recent_lock:
+        path = next((entry["file"] for entry in reversed(_recent_profiles) if entry["request_id"] == request_id), None)
+    return path if path and os.path.exists(path) else None
@@ -0,0 +1,65 @@
+import threading
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+
+#===========PER-REQUEST CONTEXT ===========================================
+# Set by the HTTP middleware for every request. Sync routes run in the threadpool, but Starlette copies the
+# context into the worker thread, so pymongo listeners and loggers running there still see the same object.
+class RequestContext:
+    def __init__(self, request_id: Optional[str] = None, method: str = "", path: str = ""):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None                   # route template ("/hr/employee/{employee_id}"), set when the request finishes
+        self.scope: Optional[dict] = None                  # ASGI scope, lets current_route() resolve the template mid-request
+        self.mongo_commands = 0
+        self.mongo_duration = 0.0                          # seconds spent waiting on MongoDB
+        self.mongo_by_collection: dict = {}                # collection -> number of commands
+        self.query_shapes: dict = {}                       # (collection, shape) -> times issued, used by the N+1 detector
+        self.repeated_queries: list = []                   # shapes that went over QUERY_REPEAT_THRESHOLD
+        self.profile_threads: Optional[set] = None         # thread ids to sample, only set while the request is profiled
+        self._lock = threading.Lock()                      # one request can run DB calls from several threads (asyncio.gather + threadpool)
+
+    def record_command(self, collection: str, duration: float):
+        with self._lock:
+            self.mongo_commands += 1
+            self.mongo_duration += duration
+            self.mongo_by_collection[collection] = self.mongo_by_collection.get(collection, 0) + 1
+
+    def current_route(self) -> str:
+        if self.route:
+            return self.route
+        return route_template(self.scope) if self.scope is not None else self.path
+
+    def record_shape(self, collection: str, shape: str) -> int:
+        with self._lock:
+            count = self.query_shapes.get((collection, shape), 0) + 1
+            self.query_shapes[(collection, shape)] = count
+            return count
+
+
+def route_template(scope: dict) -> str:
+    """Full route template ("/hr/employee/{employee_id}") of the matched route, "unmatched" for 404s"""
+    route_path = getattr(scope.get("route"), "path", None)
+    if not route_path:
+        return "unmatched"
+    # route.path is the full template when include_router copies the routes; newer FastAPI versions keep the original
+    # route and record the (combined) include_router prefix on the include the request was routed through instead
+    included_router = (scope.get("fastapi") or {}).get("included_router")
+    prefix = getattr(getattr(included_router, "include_context", None), "prefix", "")
+    return prefix + route_path
+
+
+_current_request: ContextVar[Optional[RequestContext]] = ContextVar("current_request", default=None)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    return _current_request.get()
+
+def set_request_context(ctx: RequestContext):
+    return _current_request.set(ctx)                       # returns a token for reset_request_context
+
+def reset_request_context(token):
+    _current_request.reset(token)
@@ -0,0 +1,60 @@
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Optional
+
+from app.common.metrics import counter
+
+
+#===========SINGLE-FLIGHT (request coalescing) ===========================================
+# When identical expensive reads arrive while one is already running (HR dashboards all opening at 9:00),
+# only the first caller (the leader) runs the function; the others wait for its result instead of rescanning
+# MongoDB. Nothing is cached: once the leader finishes, the next call runs again.
+SINGLEFLIGHT_CALLS = counter("erp_singleflight_calls_total", "Coalesced reads by group and role (leader ran it, shared waited)", ["group", "role"])
+
+
+def auth_scope(current_user: Optional[dict]) -> str:
+    """Authorization scope of a caller: every HR user sees the same data, anyone else only their own"""
+    if not current_user:
+        return "anonymous"
+    if current_user.get("role") == "HR":
+        return "role:HR"
+    return f"user:{current_user.get('email')}"
+
+def flight_key(route: str, params: Optional[dict] = None, current_user: Optional[dict] = None) -> tuple:
+    """Route + normalized params + authorization scope"""
+    normalized = tuple(sorted((name, str(value).strip().lower()) for name, value in (params or {}).items() if value is not None))
+    return route, normalized, auth_scope(current_user)
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict = {}                             # key -> Future of the in-flight call
+        self._lock = threading.Lock()                      # sync routes run concurrently in the threadpool
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            SINGLEFLIGHT_CALLS.inc(group=self.name, role="shared")
+            return copy.deepcopy(call.result())            # callers may mutate what they get back
+        SINGLEFLIGHT_CALLS.inc(group=self.name, role="leader")
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.set_exception(e)                          # waiters fail the same way the leader did
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
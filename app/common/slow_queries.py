@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from app.common.jobs import register_job
+from app.common.logger import get_logger
+from app.common.metrics import counter
+from app.common.request_context import RequestContext
+
+load_dotenv()
+logger = get_logger(__name__)
+
+
+#===========SLOW-QUERY LOG ===========================================
+# Fed by app.common.db_monitor.CommandMonitor: every command slower than SLOW_QUERY_MS is kept in a bounded
+# in-memory log (redacted shape, duration, route) and aggregated per shape. The first time a shape ranks among
+# the SLOW_QUERY_EXPLAIN_TOP slowest, its command is explained on a background thread so the plan is ready
+# when someone looks at /admin/slow-queries. Literal values are never stored; only the explain job sees them.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 100))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", 200))
+SLOW_QUERY_MAX_SHAPES = int(os.getenv("SLOW_QUERY_MAX_SHAPES", 500))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_EXPLAIN_TOP = int(os.getenv("SLOW_QUERY_EXPLAIN_TOP", 10))
+SLOW_QUERY_EXPLAIN_VERBOSITY = os.getenv("SLOW_QUERY_EXPLAIN_VERBOSITY", "queryPlanner")   # executionStats re-runs the query
+
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# command fields added by the driver that explain does not accept
+_DRIVER_FIELDS = {"lsid", "$db", "$clusterTime", "txnNumber", "$readPreference", "readConcern", "writeConcern",
+                  "startTransaction", "autocommit", "apiVersion", "apiStrict", "apiDeprecationErrors"}
+
+MONGO_SLOW_QUERIES = counter("erp_mongo_slow_queries_total", "MongoDB commands slower than SLOW_QUERY_MS", ["collection", "command"])
+
+_recent: deque = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_shapes: dict = {}                                         # (collection, shape) -> aggregated stats and captured explain
+_lock = threading.Lock()
+_explainer: Optional[ThreadPoolExecutor] = None
+explain_job = register_job("slow_query_explain", "Captures explain plans for the slowest query shapes")
+
+
+def record_slow_query(collection: str, command_name: str, shape: str, duration: float, ctx: Optional[RequestContext],
+                      database: str, command: dict, failed: bool = False):
+    duration_ms = duration * 1000
+    MONGO_SLOW_QUERIES.inc(collection=collection, command=command_name)
+    entry = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "collection": collection,
+        "command": command_name,
+        "shape": shape,
+        "duration_ms": round(duration_ms, 2),
+        "failed": failed,
+        "route": ctx.current_route() if ctx else None,
+        "method": ctx.method if ctx else None,
+        "request_id": ctx.request_id if ctx else None,
+    }
+    key = (collection, shape)
+    with _lock:
+        _recent.append(entry)
+        stats = _shapes.get(key)
+        if stats is None:
+            if len(_shapes) >= SLOW_QUERY_MAX_SHAPES:
+                _shapes.pop(min(_shapes, key=lambda item: _shapes[item]["last_seen"]))     # forget the stalest shape
+            stats = _shapes[key] = {"collection": collection, "command": command_name, "shape": shape, "count": 0,
+                                    "total_ms": 0.0, "max_ms": 0.0, "last_seen": 0.0, "routes": set(), "explain": None}
+        stats["count"] += 1
+        stats["total_ms"] += duration_ms
+        stats["max_ms"] = max(stats["max_ms"], duration_ms)
+        stats["last_seen"] = time.time()
+        if ctx is not None:
+            stats["routes"].add(f"{ctx.method} {entry['route']}")
+        explain_now = (SLOW_QUERY_EXPLAIN and stats["explain"] is None and command_name in EXPLAINABLE_COMMANDS
+                       and _ranks_among_slowest(key))
+        if explain_now:
+            stats["explain"] = {"status": "pending"}
+    logger.warning("Slow MongoDB command", extra={"collection": collection, "command": command_name, "shape": shape,
+                                                  "duration_ms": round(duration_ms, 2)})
+    if explain_now:
+        _explain_executor().submit(_capture_explain, key, database, command)
+
+
+def _ranks_among_slowest(key) -> bool:
+    """Caller holds _lock"""
+    max_ms = _shapes[key]["max_ms"]
+    slower = sum(1 for stats in _shapes.values() if stats["max_ms"] > max_ms)
+    return slower < SLOW_QUERY_EXPLAIN_TOP
+
+def _explain_executor() -> ThreadPoolExecutor:
+    global _explainer
+    with _lock:
+        if _explainer is None:
+            _explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+        return _explainer
+
+def _explainable(command: dict) -> dict:
+    return {name: value for name, value in command.items() if name not in _DRIVER_FIELDS}
+
+def _winning_stages(plan) -> list:
+    stages = []
+    while isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        plan = plan.get("inputStage") or plan.get("queryPlan") or (plan.get("inputStages") or [None])[0]
+    return stages
+
+def _capture_explain(key, database: str, command: dict):
+    from app.database import get_client                    # imported here: app.database imports the command monitor
+    try:
+        with explain_job.run():
+            result = get_client()[database].command("explain", _explainable(command), verbosity=SLOW_QUERY_EXPLAIN_VERBOSITY)
+        planner = result.get("queryPlanner") or next(
+            (stage["$cursor"]["queryPlanner"] for stage in result.get("stages", []) if "$cursor" in stage), {})
+        winning_plan = planner.get("winningPlan", {})
+        explain = {"status": "captured", "captured_at": datetime.now(timezone.utc).isoformat(),
+                   "stages": _winning_stages(winning_plan), "winning_plan": winning_plan}
+        stats = result.get("executionStats")
+        if stats:
+            explain["docs_examined"] = stats.get("totalDocsExamined")
+            explain["keys_examined"] = stats.get("totalKeysExamined")
+            explain["n_returned"] = stats.get("nReturned")
+    except Exception as e:
+        logger.warning("Could not explain slow query", extra={"collection": key[0], "shape": key[1], "error": type(e).__name__})
+        explain = {"status": "failed", "error": type(e).__name__}
+    with _lock:
+        if key in _shapes:
+            _shapes[key]["explain"] = explain
+
+
+#----------read side (admin API) -----------------
+def recent_slow_queries(limit: int = 50, collection: Optional[str] = None) -> list:
+    with _lock:
+        entries = list(_recent)
+    entries = [entry for entry in reversed(entries) if collection is None or entry["collection"] == collection]
+    return entries[:limit]
+
+def slow_query_shapes(limit: int = 50, sort_by: str = "max_ms") -> list:
+    with _lock:
+        rows = [{**stats, "routes": sorted(stats["routes"]), "mean_ms": round(stats["total_ms"] / stats["count"], 2),
+                 "total_ms": round(stats["total_ms"], 2), "max_ms": round(stats["max_ms"], 2),
+                 "last_seen": datetime.fromtimestamp(stats["last_seen"], timezone.utc).isoformat()}
+                for stats in _shapes.values()]
+    rows.sort(key=lambda row: row[sort_by], reverse=True)
+    return rows[:limit]
+
+def clear_slow_queries():
+    with _lock:
+        _recent.clear()
+        _shapes.clear()
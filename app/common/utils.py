@@ -1,7 +1,21 @@
 from datetime import datetime,date 
+from typing import Optional
 from bson import ObjectId
 from pymongo.database import Database
+from app.common.cache import cached, leave_tag, employee_tag, employee_email_tag
+from app.common.logger import get_logger
 
+logger = get_logger(__name__)
+
+
+
+#===========DOCUMENT VERSIONING ===========================================
+#----------every employee write bumps `version` and stamps `updated_at` (ETags, see app/common/http_cache.py) -----
+def versioned(update: dict) -> dict:
+    update = dict(update)
+    update["$inc"] = {**update.get("$inc", {}), "version": 1}
+    update["$set"] = {**update.get("$set", {}), "updated_at": datetime.utcnow()}
+    return update
 
 
 #===========LEAVE MODULE ===========================================
@@ -74,8 +88,8 @@ def serialize_attendance(attendance: dict, db: Database = None):
             else:
                 attendance["employee_name"] = "Unknown"
                 attendance["department"] = "N/A"
-        except Exception as e:
-            print(f"Error fetching employee details for {employee_id}: {str(e)}")
+        except Exception:
+            logger.warning("Error fetching employee details", extra={"employee_id": employee_id}, exc_info=True)
             attendance["employee_name"] = "Unknown"
             attendance["department"] = "N/A"
     
@@ -89,7 +103,25 @@ def date_to_datetime(date_obj: date):
     
 
 
+#---------------why a conditional leave write matched nothing (read only on that failure path) -------------------------
+LEAVE_NOT_FOUND = "not_found"
+LEAVE_FORBIDDEN = "forbidden"
+LEAVE_WRONG_STATUS = "wrong_status"
+LEAVE_UNCHANGED = "unchanged"                    # already in the requested status: an idempotent repeat, nothing to do
+
+def leave_failure_reason(db: Database, leave_id: str, owner_field: str, owner: Optional[str] = None) -> tuple:
+    """(reason, current status) for a leave that a filtered update/delete did not touch"""
+    leave = db["leave_db"].find_one({"_id": ObjectId(leave_id)}, {owner_field: 1, "status": 1})
+    if leave is None:
+        return LEAVE_NOT_FOUND, None
+    if owner is not None and leave.get(owner_field) != owner:
+        return LEAVE_FORBIDDEN, leave.get("status")
+    return LEAVE_WRONG_STATUS, leave.get("status")
+
 #---------------get leave for its unique object_id -------------------------------------------------------------------
+@cached(tags=lambda leave_id: [leave_tag(leave_id)],
+        result_tags=lambda leave: [employee_tag(leave.get("employee_id")), employee_email_tag(leave.get("email")),    # names shown on the leave;
+                                   employee_email_tag(leave.get("approved_by"))])      # self-service updates invalidate by email
 def get_leave_request_by_id(db: Database, leave_id: str):
     Leave = db["leave_db"].find_one({"_id": ObjectId(leave_id)})           # Convert leave_id to ObjectId as its comming from the frontend 
     if Leave:
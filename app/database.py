@@ -1,14 +1,157 @@
-from pymongo import MongoClient
+import os
+import threading
+from typing import Optional
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient
 from pymongo.database import Database
+from pymongo.errors import OperationFailure
+from app.common.db_monitor import command_monitor, pool_monitor
+from app.common.logger import get_logger
 
+load_dotenv()
 
+logger = get_logger(__name__)
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "management_system")
+
+_client: Optional[MongoClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    """One MongoClient (and connection pool) per process; creating a client per request leaked pools"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(MONGO_URI, event_listeners=[command_monitor, pool_monitor])
+    return _client
 
 
 def get_db()-> Database:
-    client = MongoClient("mongodb://localhost:27017/") 
 # client.admin.command('ping')
-    db = client["management_system"]                      
-    return db 
+    return get_client()[MONGO_DB_NAME]
+
+def supports_transactions(db: Database) -> bool:
+    """Multi-document transactions need a replica set or a sharded cluster (read from the driver's topology, no round trip)"""
+    description = getattr(db.client, "topology_description", None)
+    return description is not None and description.topology_type_name in ("ReplicaSetWithPrimary", "Sharded")
+
+
+#===========INDEXES ===========================================
+# One entry per query shape the crud modules issue; scripts/check_query_plans.py asserts the plans use them.
+INDEXES = {
+    "employee_db": [
+        IndexModel([("email", ASCENDING)], name="email_1", unique=True),                           # login, get_by_email, approver lookups; create_employee relies on it
+        IndexModel([("role", ASCENDING), ("first_name", ASCENDING)], name="role_1_first_name_1"),  # list_employees: role $in + sort first_name
+        IndexModel([("first_name", ASCENDING)], name="first_name_1"),                              # search_employees sort
+        IndexModel([("org_path", ASCENDING), ("org_depth", ASCENDING), ("first_name", ASCENDING)],
+                   name="org_path_1_org_depth_1_first_name_1"),                                    # subtree / skip-level teams (app/HR/org_chart.py)
+        IndexModel([("org_depth", ASCENDING)], name="org_depth_1"),                                # top levels of the org chart
+        IndexModel([("role", ASCENDING), ("updated_at", DESCENDING)], name="role_1_updated_at_-1"),   # ETag of the employee list
+    ],
+    "attendance_db": [
+        IndexModel([("employee_id", ASCENDING), ("date", DESCENDING)], name="employee_id_1_date_-1"),  # own attendance sorted by date, HR filters
+        IndexModel([("date", ASCENDING)], name="date_1"),                                          # today's summary, HR filter by date
+    ],
+    "leave_db": [
+        IndexModel([("manager_id", ASCENDING), ("status", ASCENDING)], name="manager_id_1_status_1"),  # manager team views
+        IndexModel([("status", ASCENDING)], name="status_1"),                                      # HR pending/approved/rejected
+        IndexModel([("employee_id", ASCENDING), ("status", ASCENDING)], name="employee_id_1_status_1"),  # own leaves, cancel, dashboard pending
+    ],
+    "budget_request_db": [
+        IndexModel([("employee_id", ASCENDING), ("status", ASCENDING)], name="employee_id_1_status_1"),  # own budget requests, dashboard pending
+        IndexModel([("created_at", ASCENDING)], name="created_at_1"),                              # budget analytics month ranges
+    ],
+    "leave_ledger": [                                                                              # app.common.leave_ledger
+        IndexModel([("employee_id", ASCENDING), ("at", ASCENDING)], name="employee_id_1_at_1"),    # tail replay after a snapshot
+    ],
+    "leave_ledger_snapshots": [
+        IndexModel([("employee_id", ASCENDING), ("at", DESCENDING)], name="employee_id_1_at_-1", unique=True),  # latest snapshot <= as_of
+    ],
+    "cache_entries": [                                                                             # CACHE_BACKEND=mongo (app.common.cache)
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        IndexModel([("tags", ASCENDING)], name="tags_1"),                                          # invalidate by tag
+    ],
+}
+
+
+INDEX_CONFLICT_CODES = (85, 86)             # IndexOptionsConflict / IndexKeySpecsConflict: same name, new definition
+
+
+class IndexBuildError(RuntimeError):
+    """One or more collections could not get their indexes; the others were still processed"""
+
+
+def find_duplicate_key(db: Database, collection: str, index: IndexModel) -> Optional[dict]:
+    """One key value that more than one document shares, i.e. why a unique index on it would fail"""
+    keys = [field for field, _ in index.document["key"].items()]
+    pipeline = [
+        {"$group": {"_id": {f"k{position}": f"${field}" for position, field in enumerate(keys)}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": 1},
+    ]
+    duplicate = next(db[collection].aggregate(pipeline, allowDiskUse=True), None)
+    if duplicate is None:
+        return None
+    return {"key": dict(zip(keys, duplicate["_id"].values())), "count": duplicate["count"]}
+
+def rebuild_index(db: Database, collection: str, index: IndexModel):
+    """Replace an index whose definition changed without ever leaving the collection worse off:
+    a unique index is only attempted when no duplicates exist, and a failed build restores the old index"""
+    name = index.document["name"]
+    if index.document.get("unique"):
+        duplicate = find_duplicate_key(db, collection, index)
+        if duplicate:                                             # fail loudly, keep the old (non-unique) index
+            raise IndexBuildError(f"{collection}.{name} cannot be made unique: {duplicate['count']} documents share "
+                                  f"{duplicate['key']}; remove the duplicates and restart")
+    old = db[collection].index_information()[name]
+    old_options = {option: value for option, value in old.items() if option not in ("key", "v", "ns")}
+    db[collection].drop_index(name)
+    try:
+        db[collection].create_indexes([index])
+    except Exception:
+        db[collection].create_indexes([IndexModel(old["key"], name=name, **old_options)])    # put the old one back
+        raise
+
+_ready_indexes: set = set()                 # (database, collection, index name) known to exist in this process
+
+def has_index(db: Database, collection: str, name: str) -> bool:
+    """True once the index is known to exist as INDEXES defines it (an old non-unique email_1 does not count);
+    until then every call asks the server, which only happens while ensure_indexes could not build it"""
+    key = (db.name, collection, name)
+    if key not in _ready_indexes:
+        wanted = next(index.document for index in INDEXES[collection] if index.document["name"] == name)
+        found = db[collection].index_information().get(name)
+        if (found is not None and [tuple(field) for field in found["key"]] == list(wanted["key"].items())
+                and bool(found.get("unique")) == bool(wanted.get("unique"))):
+            _ready_indexes.add(key)
+    return key in _ready_indexes
+
+def _ensure_index(db: Database, collection: str, index: IndexModel):
+    try:
+        db[collection].create_indexes([index])
+    except OperationFailure as conflict:
+        if conflict.code not in INDEX_CONFLICT_CODES:
+            raise
+        rebuild_index(db, collection, index)
+    _ready_indexes.add((db.name, collection, index.document["name"]))
+
+def ensure_indexes(db: Database):
+    """Create missing indexes (no-op for the ones that already exist); an index whose definition changed is rebuilt.
+    Indexes are built one at a time: one that fails (e.g. a unique index over existing duplicates) is logged and
+    skipped so every other index still gets built; IndexBuildError names them all."""
+    failed = []
+    for collection, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                _ensure_index(db, collection, index)
+            except Exception:
+                logger.exception("Could not create MongoDB index", extra={"collection": collection, "index": index.document["name"]})
+                failed.append(f"{collection}.{index.document['name']}")
+    if failed:
+        raise IndexBuildError(f"Indexes missing: {', '.join(failed)}")
 
 
 
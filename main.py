@@ -1,11 +1,45 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.Auth.router import router as auth_router
 from app.HR.router import router as hr_router
 from app.HR.manager_router import router as manager_router
 from app.Employees.router import router as employee_router  
+from app.Admin.router import router as admin_router
+from app.common.middleware import observability_middleware
+from app.common.metrics import REGISTRY
+from app.common.logger import setup_logging, get_logger
+from app.database import ensure_indexes, get_db
+from app.common.jobs import register_job
+from app.HR.org_chart import backfill_org_paths
+from app.common.invalidation_bus import start_invalidation_bus, invalidation_bus
 
-app = FastAPI()
+setup_logging()                                       # JSON logs written by a background thread, see app/common/logger.py
+logger = get_logger("main")
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    try:
+        with register_job("ensure_indexes", "Creates missing MongoDB indexes at startup").run():
+            ensure_indexes(get_db())                  # the query plans checked by scripts/check_query_plans.py rely on these
+    except Exception:
+        logger.exception("Could not create MongoDB indexes")
+    try:
+        with register_job("backfill_org_paths", "Computes org paths of employees stored before they existed").run():
+            backfill_org_paths(get_db())              # get_team and the manager team routes query org_path
+    except Exception:
+        logger.exception("Could not backfill org paths; run POST /hr/org-chart/rebuild")
+    try:
+        start_invalidation_bus(get_db())              # evicts cached reads written by the other workers
+    except Exception:
+        logger.exception("Could not start the cache invalidation bus; other workers' writes expire by TTL only")
+    yield
+    invalidation_bus.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 #CORS middleware to allow frontend to connect
 app.add_middleware(
@@ -16,21 +50,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Debug: Print all routes
-print("Auth routes:", [route.path for route in auth_router.routes])
-print("HR routes:", [route.path for route in hr_router.routes])
-print("Employee routes:", [route.path for route in employee_router.routes])
+# Request id, per-route latency/status histograms and MongoDB usage per request (scraped at /metrics)
+app.middleware("http")(observability_middleware)
+
+# Debug: log all routes
+logger.debug("Auth routes", extra={"routes": [route.path for route in auth_router.routes]})
+logger.debug("HR routes", extra={"routes": [route.path for route in hr_router.routes]})
+logger.debug("Employee routes", extra={"routes": [route.path for route in employee_router.routes]})
 
 app.include_router(auth_router, prefix="/auth", tags=["Auth"])
 app.include_router(hr_router, prefix="/hr", tags=["HR"])
 app.include_router(employee_router, prefix="/employees", tags=["Employees"])
 app.include_router(manager_router, prefix="/hr", tags=["Manager"])
+app.include_router(admin_router, prefix="/admin", tags=["Admin"])
  
 
 @app.get("/")
 def home():
     return {"message": "Welcome to the ERP System"}
-print({"message": "Welcome to the ERP System"})
+logger.info("Welcome to the ERP System")
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
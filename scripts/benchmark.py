@@ -0,0 +1,300 @@
+"""
+End-to-end HTTP benchmark for the ERP routes.
+
+For every --scales entry the harness seeds a dedicated database with scripts/seed_data.py, starts `main:app`
+under uvicorn against it and drives each scenario with concurrent async clients for --duration seconds:
+
+    login      POST /auth/login storm (bcrypt bound)
+    hr         HR dashboard: /hr/employees, /hr/attendance/summary/today, /hr/leaves/pending
+    manager    team pending leaves + approve/reject one of them
+    employee   self-service: /employees/profile, /employees/attendance, /employees/leaves
+
+Throughput and p50/p95/p99 latency per route go to a JSON artifact (--output). Pass --compare with an artifact
+from an earlier commit to fail (exit code 1) when a route's p95 or throughput regresses by more than --threshold.
+
+    python scripts/benchmark.py --scales 1000,10000 --output bench-$(git rev-parse --short HEAD).json
+    python scripts/benchmark.py --scales 1000,10000 --compare bench-main.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from seed_data import EMAIL_DOMAIN, employee_email, has_reports
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ["login", "hr", "manager", "employee"]
+HR_EMAIL = f"hr@{EMAIL_DOMAIN}"
+
+
+#----------latency recording -------------------------------------------------------------------------
+class RouteStats:
+    def __init__(self):
+        self.latencies: list = []                               # seconds, successful and failed requests alike
+        self.statuses: dict = {}
+        self.errors = 0                                         # 5xx and transport errors
+
+    def record(self, latency: float, status: int):
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status >= 500 or status == 0:
+            self.errors += 1
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))   # nearest rank
+    return sorted_values[rank]
+
+def summarize(stats: RouteStats, elapsed: float) -> dict:
+    values = sorted(stats.latencies)
+    return {
+        "requests": len(values),
+        "errors": stats.errors,
+        "statuses": {str(code): count for code, count in sorted(stats.statuses.items())},
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+class Session:
+    """One benchmark run against a live server: shared client, tokens and per-route stats"""
+    def __init__(self, client: httpx.AsyncClient, employees: int, password: str, seed: int):
+        self.client = client
+        self.employees = employees
+        self.password = password
+        self.rng = random.Random(seed)
+        self.managers = [index for index in range(employees) if has_reports(index, employees)]
+        self.tokens: dict = {}
+        self.routes: dict = {}
+        self.recording = False                                  # off during warm-up
+
+    async def call(self, route: str, method: str, url: str, token: str = None, **kwargs) -> httpx.Response:
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 0
+        if self.recording:
+            self.routes.setdefault(route, RouteStats()).record(time.perf_counter() - started, status)
+        return response
+
+    async def login(self, email: str) -> str:
+        response = await self.call("POST /auth/login", "POST", "/auth/login", json={"email": email, "password": self.password})
+        if response is None or response.status_code != 200:
+            return None
+        return response.json()["access_token"]
+
+    async def token(self, email: str) -> str:
+        if email not in self.tokens:
+            self.tokens[email] = await self.login(email)
+        return self.tokens[email]
+
+
+#----------scenarios (one iteration each) ------------------------------------------------------------
+async def scenario_login(session: Session, rng: random.Random):
+    await session.login(employee_email(rng.randrange(session.employees)))
+
+async def scenario_hr(session: Session, rng: random.Random):
+    token = await session.token(HR_EMAIL)
+    await session.call("GET /hr/employees", "GET", "/hr/employees", token)
+    await session.call("GET /hr/attendance/summary/today", "GET", "/hr/attendance/summary/today", token)
+    await session.call("GET /hr/leaves/pending", "GET", "/hr/leaves/pending", token)
+
+async def scenario_manager(session: Session, rng: random.Random):
+    token = await session.token(employee_email(rng.choice(session.managers)))
+    response = await session.call("GET /hr/manager/leaves/pending", "GET", "/hr/manager/leaves/pending", token)
+    if response is None or response.status_code != 200:
+        return                                                  # team has nothing left to approve
+    pending = response.json().get("data") or []
+    if pending:
+        leave = rng.choice(pending)
+        await session.call("PUT /hr/manager/leave/{leave_id}/approve", "PUT", f"/hr/manager/leave/{leave.get('_id') or leave.get('id')}/approve",
+                           token, json={"status": rng.choice(["Approved", "Rejected"]), "remarks": "benchmark"})
+
+async def scenario_employee(session: Session, rng: random.Random):
+    token = await session.token(employee_email(rng.randrange(1, session.employees)))
+    await session.call("GET /employees/profile", "GET", "/employees/profile", token)
+    await session.call("GET /employees/attendance", "GET", "/employees/attendance", token)
+    await session.call("GET /employees/leaves", "GET", "/employees/leaves", token)
+
+SCENARIO_FUNCTIONS = {"login": scenario_login, "hr": scenario_hr, "manager": scenario_manager, "employee": scenario_employee}
+
+
+async def run_scenario(base_url: str, name: str, args, employees: int) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        session = Session(client, employees, args.password, args.seed)
+        scenario = SCENARIO_FUNCTIONS[name]
+
+        async def worker(worker_id: int, until: float):
+            rng = random.Random(f"{args.seed}:{name}:{worker_id}")
+            while time.perf_counter() < until:
+                await scenario(session, rng)
+
+        if args.warmup:
+            until = time.perf_counter() + args.warmup
+            await asyncio.gather(*(worker(-1 - i, until) for i in range(args.concurrency)))
+        session.recording = True
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i, started + args.duration) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    routes = {route: summarize(stats, elapsed) for route, stats in sorted(session.routes.items())}
+    return {
+        "duration_s": round(elapsed, 2),
+        "concurrency": args.concurrency,
+        "throughput_rps": round(sum(route["requests"] for route in routes.values()) / elapsed, 2),
+        "routes": routes,
+    }
+
+
+#----------server / seeding --------------------------------------------------------------------------
+def seed(args, employees: int, db_name: str):
+    command = [sys.executable, os.path.join(ROOT, "scripts", "seed_data.py"), "--employees", str(employees),
+               "--days", str(args.days), "--seed", str(args.seed), "--password", args.password,
+               "--mongo-uri", args.mongo_uri, "--db", db_name, "--drop"]
+    if args.seed_workers:
+        command += ["--workers", str(args.seed_workers)]
+    subprocess.run(command, check=True)
+
+def start_server(args, db_name: str) -> subprocess.Popen:
+    env = {**os.environ, "MONGO_URI": args.mongo_uri, "MONGO_DB_NAME": db_name, "LOG_LEVEL": "WARNING"}
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", args.host, "--port", str(args.port),
+               "--workers", str(args.server_workers), "--no-access-log"]
+    server = subprocess.Popen(command, cwd=ROOT, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+        try:
+            if httpx.get(f"http://{args.host}:{args.port}/", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("uvicorn did not become ready within 30s")
+
+def stop_server(server: subprocess.Popen):
+    server.terminate()
+    try:
+        server.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+#----------comparison --------------------------------------------------------------------------------
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Routes whose p95 grew or throughput dropped by more than `threshold` (a fraction) against the baseline"""
+    regressions = []
+    for scale, scenarios in current["results"].items():
+        for scenario, result in scenarios.items():
+            base_routes = baseline.get("results", {}).get(scale, {}).get(scenario, {}).get("routes", {})
+            for route, stats in result["routes"].items():
+                base = base_routes.get(route)
+                if not base or not base["requests"] or not stats["requests"]:
+                    continue
+                if base["p95_ms"] and stats["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                    regressions.append(f"[{scale} employees / {scenario}] {route}: p95 {base['p95_ms']}ms -> {stats['p95_ms']}ms")
+                if base["throughput_rps"] and stats["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+                    regressions.append(f"[{scale} employees / {scenario}] {route}: throughput {base['throughput_rps']} -> {stats['throughput_rps']} req/s")
+    return regressions
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+#----------CLI ---------------------------------------------------------------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ERP API end to end against seeded MongoDB data")
+    parser.add_argument("--scales", default="1000,10000", help="comma-separated employee counts to seed and benchmark")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {SCENARIOS}")
+    parser.add_argument("--days", type=int, default=30, help="days of attendance to seed per employee")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--seed-workers", type=int, default=None, help="seeder processes (default: CPU count)")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse databases seeded by an earlier run")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before each scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent virtual users")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--password", default="Password@123", help="password of the seeded accounts")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--db-prefix", default="erp_bench", help="databases are named <prefix>_<scale>")
+    parser.add_argument("--output", default="benchmark.json", help="where to write the JSON artifact")
+    parser.add_argument("--compare", default=None, help="baseline artifact to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed regression before failing (0.10 = 10%%)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    scales = [int(scale) for scale in args.scales.split(",") if scale]
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {sorted(unknown)}")
+
+    artifact = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": {},
+    }
+    base_url = f"http://{args.host}:{args.port}"
+    for scale in scales:
+        db_name = f"{args.db_prefix}_{scale}"
+        if not args.skip_seed:
+            seed(args, scale, db_name)
+        server = start_server(args, db_name)
+        try:
+            for name in scenarios:
+                print(f"[{scale} employees] {name} ...", flush=True)
+                result = asyncio.run(run_scenario(base_url, name, args, scale))
+                artifact["results"].setdefault(str(scale), {})[name] = result
+                for route, stats in result["routes"].items():
+                    print(f"    {route:<45} {stats['throughput_rps']:>9.1f} req/s  p50 {stats['p50_ms']:>8.1f}ms  "
+                          f"p95 {stats['p95_ms']:>8.1f}ms  p99 {stats['p99_ms']:>8.1f}ms  errors {stats['errors']}")
+        finally:
+            stop_server(server)
+
+    with open(args.output, "w") as handle:
+        json.dump(artifact, handle, indent=2, default=str)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(artifact, json.load(handle), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Cache invalidation bus check.
+
+Runs two "workers" against a real MongoDB (each with its own MongoClient, in-process LRU cache and bus thread,
+exactly as two uvicorn workers would), writes through worker A and measures how long it takes until worker B has
+evicted its cached copy. Needs a mongod (tailable cursors and capped collections are not emulated by mongomock):
+
+    python scripts/check_invalidation_bus.py --mongo-uri mongodb://localhost:27017 --db erp_bus_check --rounds 200
+
+Exit code is 1 when an invalidation is not applied within --timeout-ms.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.common.cache import LRUBackend, TagCache                         # noqa: E402  (path set up above)
+from app.common.invalidation_bus import InvalidationBus, INVALIDATION_BUS_COLLECTION   # noqa: E402
+
+
+def make_worker(uri: str, db_name: str, name: str):
+    db = MongoClient(uri)[db_name]
+    cache = TagCache(LRUBackend())
+    bus = InvalidationBus(cache, origin=name, name=f"bus_check_{name}")
+
+    @cache.cached(tags=lambda key: [f"check:{key}"])
+    def read(db, key):
+        return {"key": key, "read_at": time.time()}
+
+    return db, cache, bus, read
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--db", default="erp_bus_check")
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--timeout-ms", type=float, default=1000)
+    parser.add_argument("--drop", action="store_true", help=f"drop {INVALIDATION_BUS_COLLECTION} first")
+    args = parser.parse_args()
+
+    if args.drop:
+        MongoClient(args.mongo_uri)[args.db].drop_collection(INVALIDATION_BUS_COLLECTION)
+    db_a, cache_a, bus_a, _ = make_worker(args.mongo_uri, args.db, "worker-a")
+    db_b, cache_b, bus_b, read_b = make_worker(args.mongo_uri, args.db, "worker-b")
+    bus_a.start(db_a)
+    bus_b.start(db_b)
+
+    latencies, missed = [], 0
+    try:
+        for round_number in range(args.rounds):
+            key = f"k{round_number % 10}"
+            read_b(db_b, key)                                  # B caches it
+            if read_b(db_b, key) is None or cache_b.backend.entries("") == 0:
+                raise SystemExit("worker B did not cache the read")
+            started = time.perf_counter()
+            cache_a.invalidate(db_a, f"check:{key}")           # the write happens on A
+            deadline = started + args.timeout_ms / 1000
+            while cache_b.backend.entries("") and time.perf_counter() < deadline:
+                time.sleep(0.0002)
+            if cache_b.backend.entries(""):
+                missed += 1
+                cache_b.clear()
+            else:
+                latencies.append((time.perf_counter() - started) * 1000)
+    finally:
+        bus_a.stop()
+        bus_b.stop()
+
+    if latencies:
+        ordered = sorted(latencies)
+        print(f"delivered {len(latencies)}/{args.rounds}  p50 {statistics.median(ordered):.2f} ms  "
+              f"p95 {ordered[int(len(ordered) * 0.95) - 1]:.2f} ms  max {ordered[-1]:.2f} ms")
+    if missed:
+        print(f"FAIL: {missed} invalidation(s) not applied within {args.timeout_ms:.0f} ms")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
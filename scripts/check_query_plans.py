@@ -0,0 +1,314 @@
+"""
+Query-plan regression check.
+
+Calls the crud functions behind the routes (app/HR, app/Employees, app/Auth, app/common) against a seeded database
+(scripts/seed_data.py) through a MongoClient that records every command they send, then runs `explain` with
+executionStats verbosity for each distinct find/aggregate/count/distinct/update/delete/findAndModify it saw and fails
+when a plan
+
+    * scans the collection (COLLSCAN) instead of an index (IXSCAN),
+    * examines more than `max_ratio` documents per document returned, or
+    * sorts in memory (SORT stage) instead of reading the index in order.
+
+    python scripts/seed_data.py --employees 20000 --days 30 --db erp_plans --drop
+    python scripts/check_query_plans.py --db erp_plans
+
+The write calls decide, cancel and rewrite a few seeded records, so point it at a scratch database.
+Exit code is 1 when any check fails, so it can gate CI. A new query path needs a call in app_calls(); a plan that
+is expected to break a rule gets an entry in ALLOWANCES. tests/test_query_plans.py runs the same checks under pytest
+against a small seeded database.
+"""
+import argparse
+import copy
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+from pymongo import MongoClient, monitoring
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.Auth.utils import get_user_by_email                               # noqa: E402  (path set up above)
+from app.Employees import crud as employee_crud                            # noqa: E402
+from app.HR import crud as hr_crud                                         # noqa: E402
+from app.HR import org_chart                                               # noqa: E402
+from app.HR.schemas import EmployeeSearch                                  # noqa: E402
+from app.common import leave_ledger                                        # noqa: E402
+from app.common.cache import tag_cache                                     # noqa: E402
+from app.common.db_monitor import command_collection, query_shape          # noqa: E402
+from app.common.profile_sections import ADDRESS_COLLECTION                 # noqa: E402
+from app.common.utils import get_leave_request_by_id                       # noqa: E402
+from app.database import ensure_indexes                                    # noqa: E402
+
+DEFAULT_MAX_RATIO = 1.5
+
+EXPLAINABLE = ("find", "aggregate", "count", "distinct", "update", "delete", "findAndModify")
+SESSION_FIELDS = ("lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern")   # explain rejects these
+
+
+class PlanCheck:
+    def __init__(self, name: str, source: str, collection: str, command: dict, max_ratio: float = DEFAULT_MAX_RATIO,
+                 allow_collscan: bool = False, allow_sort: bool = False, note: str = ""):
+        self.name = name
+        self.source = source                                   # app function that sent the command, for the report
+        self.collection = collection
+        self.command = command                                 # explainable command document (find/aggregate/update/delete)
+        self.max_ratio = max_ratio                             # None = unbounded (e.g. unanchored regex search)
+        self.allow_collscan = allow_collscan
+        self.allow_sort = allow_sort
+        self.note = note
+
+
+# (call name, collection) -> what its plan may do; everything else must meet the defaults of PlanCheck
+ALLOWANCES = {
+    ("all leaves", "leave_db"): dict(allow_collscan=True, max_ratio=None, note="HR list of every leave, unfiltered"),
+    ("employee list version", "employee_db"): dict(max_ratio=None, note="limit 1 and a count: nReturned is 1"),
+    ("search employees", "employee_db"): dict(max_ratio=None, note="unanchored case-insensitive regex: index only avoids the in-memory sort"),
+    ("team leaves", "leave_db"): dict(allow_sort=True, max_ratio=4, note="team-sized result sorted in memory; seeded employees have one leave per status"),
+    ("ledger balance", "leave_ledger_snapshots"): dict(max_ratio=None, note="no snapshot yet on a freshly seeded database"),
+    ("ledger balances", "leave_ledger_snapshots"): dict(max_ratio=None, note="no snapshot yet on a freshly seeded database"),
+    ("budget analytics", "budget_request_db"): dict(max_ratio=None, note="$group may be pushed into the plan, so nReturned counts groups"),
+    ("budget analytics", "budget_monthly_summary_db"): dict(max_ratio=None, note="small collection; nReturned is 0 until buckets are built"),
+}
+
+
+#----------recording ---------------------------------------------------------------------------------
+class CommandRecorder(monitoring.CommandListener):
+    """Keeps the explainable commands sent while a call is running, one per (call, collection, query shape)"""
+    def __init__(self):
+        self.call = None                                       # (name, source) of the app function being driven
+        self.commands: dict = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if self.call is None or event.command_name not in EXPLAINABLE:
+            return
+        collection = command_collection(event.command_name, event.command)
+        for command in _single_statements(event.command_name, event.command):
+            key = (*self.call, collection, query_shape(event.command_name, command))
+            self.commands.setdefault(key, command)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def _single_statements(command_name: str, command) -> list:
+    """The command without its session fields; bulk updates/deletes split into one command per statement (explain takes one)"""
+    command = {key: copy.deepcopy(value) for key, value in command.items() if not key.startswith("$") and key not in SESSION_FIELDS}
+    if command_name not in ("update", "delete"):
+        return [command]
+    statements = command.pop(f"{command_name}s")
+    return [{**command, f"{command_name}s": [statement]} for statement in statements]
+
+
+#----------app calls ---------------------------------------------------------------------------------
+def sample(db) -> dict:
+    """Real ids and values from the seeded data for the calls to use"""
+    employee = db["employee_db"].find_one({"role": "employee", "job_info.reporting_manager": {"$ne": None}})
+    if not employee:
+        raise SystemExit("No seeded employees found; run scripts/seed_data.py first")
+    employee_id = str(employee["_id"])
+    pending = list(db["leave_db"].find({"status": "Pending", "employee_id": {"$ne": employee_id}}).limit(2))
+    if len(pending) < 2:
+        raise SystemExit("Not enough pending leaves; reseed with scripts/seed_data.py --drop")
+    return {
+        "employee": employee,
+        "employee_id": employee_id,
+        "manager_email": employee["job_info"]["reporting_manager"],
+        "approved": db["leave_db"].find_one({"employee_id": employee_id, "status": "Approved"}),
+        "pending": pending,
+        "attendance": db["attendance_db"].find_one({"employee_id": employee_id}, sort=[("date", -1)]),
+        "budget": db["budget_request_db"].find_one({"status": "Pending"}),
+        "address": (db[ADDRESS_COLLECTION].find_one({"_id": employee["_id"]}) or {}).get("current_address") or {"city": "Pune"},
+    }
+
+def app_calls(values: dict) -> list:
+    """(name, source, fn(db)) for every query path the routes reach, reads first, then the writes"""
+    employee, employee_id, email = values["employee"], values["employee_id"], values["employee"]["email"]
+    manager_email, attendance = values["manager_email"], values["attendance"]
+    to_approve, to_reject = values["pending"]               # pending leaves of other employees, decided below
+    today = datetime.combine(date.today(), datetime.min.time())
+    next_month = date.today() + timedelta(days=30)
+    calls = [
+        # ---------- auth and self-service ----------
+        ("login by email", "Auth.utils.get_user_by_email", lambda db: get_user_by_email(email, with_password=True, db=db)),
+        ("employee login", "Employees.crud.login_employee", lambda db: employee_crud.login_employee(db, email, "not-the-password")),
+        ("own profile", "Employees.crud.get_employee_profile", lambda db: employee_crud.get_employee_profile(db, email)),
+        ("own profile version", "Employees.crud.get_profile_version", lambda db: employee_crud.get_profile_version(db, email)),
+        ("dashboard profile", "Employees.crud.get_dashboard_profile", lambda db: employee_crud.get_dashboard_profile(db, email)),
+        ("dashboard balance", "Employees.crud.get_dashboard_leave_balance", lambda db: employee_crud.get_dashboard_leave_balance(db, employee_id)),
+        ("dashboard attendance", "Employees.crud.get_recent_attendance", lambda db: employee_crud.get_recent_attendance(db, employee_id)),
+        ("dashboard pending leaves", "Employees.crud.get_pending_leaves", lambda db: employee_crud.get_pending_leaves(db, employee_id)),
+        ("dashboard pending budget requests", "Employees.crud.get_pending_budget_requests",
+         lambda db: employee_crud.get_pending_budget_requests(db, employee_id)),
+        ("own attendance", "Employees.crud.get_attendance_records", lambda db: employee_crud.get_attendance_records(db, employee_id)),
+        ("own attendance range", "Employees.crud.get_attendance_records",
+         lambda db: employee_crud.get_attendance_records(db, employee_id, today - timedelta(days=14), today)),
+        ("own leaves", "Employees.crud.get_employee_leaves", lambda db: employee_crud.get_employee_leaves(db, employee_id)),
+        ("own budget requests", "Employees.crud.get_employee_budget_requests",
+         lambda db: employee_crud.get_employee_budget_requests(db, employee_id)),
+
+        # ---------- HR reads ----------
+        ("list employees", "HR.crud.get_all_employees", hr_crud.get_all_employees),
+        ("employee list version", "HR.crud.get_employees_list_version", hr_crud.get_employees_list_version),
+        ("get by id", "HR.crud.get_employee_by_id", lambda db: hr_crud.get_employee_by_id(db, employee_id)),
+        ("employee version", "HR.crud.get_employee_version", lambda db: hr_crud.get_employee_version(db, employee_id)),
+        ("get by email", "HR.crud.get_by_email", lambda db: hr_crud.get_by_email(db, email)),
+        ("batch get", "HR.crud.get_employees_batch", lambda db: hr_crud.get_employees_batch(db, [employee_id], [manager_email])),
+        ("batch get fields", "HR.crud.get_employees_batch",
+         lambda db: hr_crud.get_employees_batch(db, [employee_id], [], ["first_name", "current_address.city", "leave_balance"])),
+        ("search employees", "HR.crud.search_employees", lambda db: hr_crud.search_employees(db, EmployeeSearch(department="eng"))),
+        ("leave balance", "HR.crud.get_leave_balance", lambda db: hr_crud.get_leave_balance(db, employee_id)),
+        ("leave balance as of", "HR.crud.get_leave_balance", lambda db: hr_crud.get_leave_balance(db, employee_id, today)),
+        ("ledger balance", "common.leave_ledger.get_ledger_balance", lambda db: leave_ledger.get_ledger_balance(db, employee_id)),
+        ("ledger balances", "common.leave_ledger.get_ledger_balances",
+         lambda db: leave_ledger.get_ledger_balances(db, [employee_id, to_approve["employee_id"]])),
+        ("HR attendance by employee", "HR.crud.get_attendance", lambda db: hr_crud.get_attendance(db, {"employee_id": employee_id})),
+        ("HR attendance by day", "HR.crud.get_attendance", lambda db: hr_crud.get_attendance(db, {"date": attendance["date"]})),
+        ("today's summary", "HR.crud.get_today_attendance_summary", hr_crud.get_today_attendance_summary),
+        ("all leaves", "HR.crud.get_all_leave_requests", hr_crud.get_all_leave_requests),
+        ("leaves by status", "HR.crud.get_all_leave_requests", lambda db: hr_crud.get_all_leave_requests(db, {"status": "Pending"})),
+        ("manager team leaves", "HR.crud.get_all_leave_requests",
+         lambda db: hr_crud.get_all_leave_requests(db, {"manager_id": manager_email})),
+        ("manager team leaves by status", "HR.crud.get_all_leave_requests",
+         lambda db: hr_crud.get_all_leave_requests(db, {"manager_id": manager_email, "status": "Pending"})),
+        ("leave by id", "common.utils.get_leave_request_by_id", lambda db: get_leave_request_by_id(db, str(values["approved"]["_id"]))),
+        ("org chart", "HR.org_chart.get_org_chart", org_chart.get_org_chart),
+        ("org chart below", "HR.org_chart.get_org_chart", lambda db: org_chart.get_org_chart(db, manager_email, 2)),
+        ("team", "HR.org_chart.get_team", lambda db: org_chart.get_team(db, manager_email)),
+        ("team up to depth", "HR.org_chart.get_team", lambda db: org_chart.get_team(db, manager_email, 1)),
+        ("team leaves", "HR.org_chart.get_team_leaves", lambda db: org_chart.get_team_leaves(db, manager_email, "Pending")),
+        ("budget analytics", "HR.crud.get_budget_analytics", hr_crud.get_budget_analytics),
+
+        # ---------- writes (same values back where the call allows it) ----------
+        ("update basic", "HR.crud.update_employee_basic",
+         lambda db: hr_crud.update_employee_basic(db, employee_id, {"first_name": employee["first_name"]})),
+        ("update own profile", "Employees.crud.update_employee_self",
+         lambda db: employee_crud.update_employee_self(db, email, {"phone": employee.get("phone")})),
+        ("update own address", "Employees.crud.update_employee_address",
+         lambda db: employee_crud.update_employee_address(db, email, values["address"])),
+        ("patch employee", "HR.crud.patch_employee",
+         lambda db: hr_crud.patch_employee(db, employee_id, {"basic": {"first_name": employee["first_name"]},
+                                                             "current_address": values["address"]})),
+        ("modify attendance", "HR.crud.update_attendance",
+         lambda db: hr_crud.update_attendance(db, employee_id, attendance["date"], {"status": attendance.get("status")})),
+        ("adjust allowance", "HR.crud.adjust_leave_allowance",
+         lambda db: hr_crud.adjust_leave_allowance(db, employee_id, "grant", "Annual", 1, "query plan check")),
+        ("apply leave", "Employees.crud.create_employee_leave",
+         lambda db: employee_crud.create_employee_leave(db, employee_id, {"leave_type": "Annual", "start_date": next_month,
+                                                                          "end_date": next_month, "reason": "query plan check"})),
+        ("decide leave", "HR.crud.update_leave_status",
+         lambda db: hr_crud.update_leave_status(db, str(to_approve["_id"]), {"status": "Approved", "approved_by": to_approve["manager_id"]})),
+        ("decide leaves", "HR.crud.decide_leaves",
+         lambda db: hr_crud.decide_leaves(db, [{"leave_id": str(to_reject["_id"]), "status": "Rejected"},
+                                               {"leave_id": str(to_approve["_id"]), "status": "Rejected"}], to_reject["manager_id"])),
+        ("cancel leave", "Employees.crud.cancel_leave_request",          # an already approved leave: the delete and the failure read
+         lambda db: employee_crud.cancel_leave_request(db, employee_id, str(values["approved"]["_id"]))),
+    ]
+    if values["budget"]:
+        calls.append(("cancel budget request", "Employees.crud.cancel_budget_request",
+                      lambda db: employee_crud.cancel_budget_request(db, values["budget"]["employee_id"], str(values["budget"]["_id"]))))
+    return calls
+
+
+#----------catalog --------------------------------------------------------------------------------
+def build_catalog(mongo_uri: str, db_name: str) -> list:
+    """Run every app call against the seeded data and return one PlanCheck per distinct command they sent"""
+    recorder = CommandRecorder()
+    client = MongoClient(mongo_uri, event_listeners=[recorder])
+    try:
+        db = client[db_name]
+        for name, source, call in app_calls(sample(db)):
+            tag_cache.clear()                                  # start every call cold: a cache hit sends nothing
+            hr_crud.budget_analytics_cache.clear()
+            recorder.call = (name, source)
+            try:
+                call(db)
+            finally:
+                recorder.call = None
+    finally:
+        client.close()
+    return [PlanCheck(name, source, collection, command, **ALLOWANCES.get((name, collection), {}))
+            for (name, source, collection, _shape), command in recorder.commands.items()]
+
+
+#----------plan inspection -------------------------------------------------------------------------
+def _walk(node, key: str):
+    """Every value stored under `key` anywhere in a nested explain document"""
+    if isinstance(node, dict):
+        for name, value in node.items():
+            if name == key:
+                yield value
+            yield from _walk(value, key)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _walk(item, key)
+
+def plan_stages(explain: dict) -> set:
+    stages = set()
+    for plan in _walk(explain, "winningPlan"):
+        stages.update(stage for stage in _walk(plan, "stage") if isinstance(stage, str))
+    return stages
+
+def execution_counts(explain: dict):
+    examined = returned = 0
+    for stats in _walk(explain, "executionStats"):
+        if isinstance(stats, dict) and "totalDocsExamined" in stats:
+            examined += stats.get("totalDocsExamined", 0)
+            returned += stats.get("nReturned", 0)
+    return examined, returned
+
+def check(db, item: PlanCheck) -> tuple:
+    """(problems, winning plan stages, documents examined, documents returned)"""
+    explain = db.command("explain", item.command, verbosity="executionStats")
+    stages = plan_stages(explain)
+    examined, returned = execution_counts(explain)
+    problems = []
+    if "COLLSCAN" in stages and not item.allow_collscan:
+        problems.append("COLLSCAN")
+    if "SORT" in stages and not item.allow_sort:
+        problems.append("in-memory SORT")
+    ratio = examined / max(returned, 1)
+    if item.max_ratio is not None and ratio > item.max_ratio:
+        problems.append(f"examined {examined} docs for {returned} returned (ratio {ratio:.1f} > {item.max_ratio})")
+    return problems, stages, examined, returned
+
+
+#----------CLI ---------------------------------------------------------------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check MongoDB query plans of the ERP queries against seeded data")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--db", default=os.getenv("MONGO_DB_NAME", "management_system"))
+    parser.add_argument("--no-ensure-indexes", action="store_true", help="check the indexes as they are instead of creating missing ones")
+    parser.add_argument("--verbose", action="store_true", help="print the winning plan stages of every query")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    client = MongoClient(args.mongo_uri)
+    db = client[args.db]
+    if not args.no_ensure_indexes:
+        ensure_indexes(db)
+
+    failures = 0
+    for item in build_catalog(args.mongo_uri, args.db):
+        problems, stages, examined, returned = check(db, item)
+        failures += bool(problems)
+        mark = "FAIL" if problems else "ok  "
+        print(f"{mark} {item.collection:<26} {item.name:<32} examined={examined:<8} returned={returned:<8} {item.source}")
+        if args.verbose or problems:
+            print(f"       stages: {', '.join(sorted(stages))}" + (f"  ({item.note})" if item.note else ""))
+        for problem in problems:
+            print(f"       {problem}")
+    client.close()
+
+    if failures:
+        print(f"{failures} query plan check(s) failed")
+        sys.exit(1)
+    print("All query plans use indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Leave ledger maintenance (see app/common/leave_ledger.py).
+
+    python scripts/leave_ledger.py --db management_system backfill     # once, right after deploying the ledger
+    python scripts/leave_ledger.py --db management_system snapshot     # periodically (cron), keeps tail replays short
+    python scripts/leave_ledger.py --db management_system check [--repair]
+
+backfill  writes opening events for every leave_balances document not marked as backfilled yet. Events the new code
+          already appended for that employee (leaves applied or decided since the deploy) are subtracted, so the
+          ledger adds up to the counters, and the document is marked so a second run skips it. Run it after
+          scripts/migrate_profile_sections.py and before much traffic: a leave decided while its employee's batch is
+          being backfilled can be counted twice, which `check` then reports.
+snapshot  folds every employee's events older than LEDGER_SNAPSHOT_LAG into a new snapshot.
+check     compares the leave_balances counters (what the reservation at apply time checks) with the ledger and
+          prints every employee whose counters drifted; --repair sets the counters to the ledger's values.
+
+Exit code of `check` is 1 when drift was found (and not repaired).
+"""
+import argparse
+import os
+import sys
+import time
+
+from pymongo import MongoClient, UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.common.leave_ledger import (BACKFILLED_FLAG, LEDGER_COLLECTION, LEAVE_TYPES, append_events, fold,    # noqa: E402
+                                     get_ledger_balance, opening_events, write_snapshot)
+from app.common.profile_sections import LEAVE_BALANCE_COLLECTION                                           # noqa: E402
+
+BALANCE_FIELDS = [f"{leave_type}{suffix}" for leave_type in LEAVE_TYPES for suffix in ("", "_used", "_pending")]
+
+
+def batches(db, query: dict, batch_size: int):
+    """leave_balances documents matching query, in _id order, batch by batch"""
+    last_id = None
+    while True:
+        batch_query = {**query, "_id": {"$gt": last_id}} if last_id else query
+        documents = list(db[LEAVE_BALANCE_COLLECTION].find(batch_query).sort("_id", 1).limit(batch_size))
+        if not documents:
+            return
+        last_id = documents[-1]["_id"]
+        yield documents
+
+
+def backfill(db, batch_size: int) -> int:
+    done = 0
+    for balances in batches(db, {BACKFILLED_FLAG: {"$ne": True}}, batch_size):
+        already = {}                                               # events appended since the deploy, per employee
+        for event in db[LEDGER_COLLECTION].find({"employee_id": {"$in": [balance["_id"] for balance in balances]}},
+                                                {"_id": 0, "employee_id": 1, "event": 1, "leave_type": 1, "days": 1}):
+            already.setdefault(event["employee_id"], []).append(event)
+        events = []
+        for balance in balances:
+            recorded = fold(already.get(balance["_id"], []))
+            missing = {field: balance.get(field, 0) - recorded.get(field, 0) for field in BALANCE_FIELDS}
+            events += opening_events(balance["_id"], missing)
+        append_events(db, events)
+        db[LEAVE_BALANCE_COLLECTION].update_many({"_id": {"$in": [balance["_id"] for balance in balances]}},
+                                                 {"$set": {BACKFILLED_FLAG: True}})
+        done += len(balances)
+        print(f"{done} employees backfilled", flush=True)
+    return done
+
+def snapshot(db, batch_size: int) -> int:
+    written = 0
+    for employee_ids in _chunks(db[LEDGER_COLLECTION].distinct("employee_id"), batch_size):
+        written += sum(1 for employee_id in employee_ids if write_snapshot(db, employee_id))
+    return written
+
+def check(db, batch_size: int, repair: bool) -> int:
+    drifted = 0
+    for balances in batches(db, {BACKFILLED_FLAG: True}, batch_size):
+        repairs = []
+        for balance in balances:
+            ledger = get_ledger_balance.uncached(db, balance["_id"]) or {}
+            diff = {field: (balance.get(field, 0), ledger.get(field, 0)) for field in BALANCE_FIELDS
+                    if balance.get(field, 0) != ledger.get(field, 0)}
+            if diff:
+                drifted += 1
+                print(f"{balance['_id']}: " + ", ".join(f"{field} counter={counter} ledger={value}"
+                                                        for field, (counter, value) in diff.items()))
+                repairs.append(UpdateOne({"_id": balance["_id"]}, {"$set": {field: value for field, (_, value) in diff.items()}}))
+        if repair and repairs:
+            db[LEAVE_BALANCE_COLLECTION].bulk_write(repairs, ordered=False)
+    return drifted
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--db", default=os.getenv("MONGO_DB_NAME", "management_system"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("command", choices=["backfill", "snapshot", "check"])
+    parser.add_argument("--repair", action="store_true", help="check: set drifted counters to the ledger's values")
+    args = parser.parse_args(argv)
+
+    db = MongoClient(args.mongo_uri)[args.db]
+    started = time.perf_counter()
+    if args.command == "backfill":
+        print(f"backfilled {backfill(db, args.batch_size)} employees in {time.perf_counter() - started:.1f}s")
+    elif args.command == "snapshot":
+        print(f"wrote {snapshot(db, args.batch_size)} snapshots in {time.perf_counter() - started:.1f}s")
+    else:
+        drifted = check(db, args.batch_size, args.repair)
+        print(f"{drifted} employees drifted{' (repaired)' if args.repair and drifted else ''} "
+              f"in {time.perf_counter() - started:.1f}s")
+        if drifted and not args.repair:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Profile section migration.
+
+Moves education, work_experience, current_address, permanent_address and leave_balance out of employee_db into
+their own collections (see app/common/profile_sections.py), in batches, and unsets them from employee_db so the
+hot collection shrinks. Run it once right after deploying the code that reads and writes the new collections:
+
+    python scripts/migrate_profile_sections.py --db management_system --dry-run
+    python scripts/migrate_profile_sections.py --db management_system --batch-size 1000
+
+Safe to re-run and to interrupt: data that the new code already wrote to a section wins (addresses) or is kept
+next to the migrated entries (education/work experience are prepended, leave usage is added), and every section
+document is marked so a second run never merges the same employee twice. Employee versions are not bumped: the
+profile the API returns does not change.
+"""
+import argparse
+import os
+import sys
+import time
+
+from pymongo import MongoClient, UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.common.profile_sections import (ARRAY_SECTIONS, ADDRESS_COLLECTION, ADDRESS_FIELDS,          # noqa: E402
+                                         LEAVE_BALANCE_COLLECTION, MIGRATED_FLAG, SECTION_FIELDS,
+                                         split_sections)
+
+
+def _not_migrated(value: dict, otherwise) -> dict:
+    """Pipeline expression: `value` unless this section document was already migrated"""
+    return {"$cond": [{"$eq": [f"${MIGRATED_FLAG}", True]}, otherwise, value]}
+
+def section_update(collection: str, section: dict) -> list:
+    """Update pipeline that folds one embedded section into the (possibly existing) section document"""
+    fields = {}
+    if collection in ARRAY_SECTIONS.values():
+        field = next(name for name, target in ARRAY_SECTIONS.items() if target == collection)
+        fields[field] = _not_migrated({"$concatArrays": [{"$literal": section[field]}, {"$ifNull": [f"${field}", []]}]}, f"${field}")
+    elif collection == ADDRESS_COLLECTION:
+        for field in ADDRESS_FIELDS:
+            if field in section:
+                fields[field] = {"$ifNull": [f"${field}", {"$literal": section[field]}]}
+    elif collection == LEAVE_BALANCE_COLLECTION:
+        for key, value in section.items():
+            if key.endswith("_used"):                                  # approvals since the deploy were $inc'ed here
+                fields[key] = _not_migrated({"$add": [{"$ifNull": [f"${key}", 0]}, value]}, f"${key}")
+            else:
+                fields[key] = {"$ifNull": [f"${key}", value]}
+    return [{"$set": {**fields, MIGRATED_FLAG: True}}]
+
+def migrate_batch(db, employees: list, dry_run: bool) -> dict:
+    writes = {}
+    for employee in employees:
+        for collection, section in split_sections(employee).items():
+            writes.setdefault(collection, []).append(UpdateOne({"_id": employee["_id"]}, section_update(collection, section), upsert=True))
+    counts = {collection: len(operations) for collection, operations in writes.items()}
+    if dry_run:
+        return counts
+    for collection, operations in writes.items():                       # sections first: an interrupted run loses nothing
+        db[collection].bulk_write(operations, ordered=False)
+    db["employee_db"].bulk_write([UpdateOne({"_id": employee["_id"]}, {"$unset": dict.fromkeys(SECTION_FIELDS, "")})
+                                  for employee in employees], ordered=False)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--db", default=os.getenv("MONGO_DB_NAME", "management_system"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="count what would move, write nothing")
+    args = parser.parse_args(argv)
+
+    db = MongoClient(args.mongo_uri)[args.db]
+    query = {"$or": [{field: {"$exists": True}} for field in SECTION_FIELDS]}
+    projection = dict.fromkeys(SECTION_FIELDS, 1)
+    started, migrated, totals = time.perf_counter(), 0, {}
+    last_id = None
+    while True:
+        batch_query = {**query, "_id": {"$gt": last_id}} if last_id else query       # resume by _id, the unset shrinks the match
+        employees = list(db["employee_db"].find(batch_query, projection).sort("_id", 1).limit(args.batch_size))
+        if not employees:
+            break
+        last_id = employees[-1]["_id"]
+        for collection, count in migrate_batch(db, employees, args.dry_run).items():
+            totals[collection] = totals.get(collection, 0) + count
+        migrated += len(employees)
+        print(f"{migrated} employees {'checked' if args.dry_run else 'migrated'}", flush=True)
+
+    print(f"{'would migrate' if args.dry_run else 'migrated'} {migrated} employees in {time.perf_counter() - started:.1f}s: "
+          + ", ".join(f"{collection}={count}" for collection, count in sorted(totals.items())))
+
+
+if __name__ == "__main__":
+    main()
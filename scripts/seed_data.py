@@ -0,0 +1,293 @@
+"""
+Synthetic data generator for scale testing.
+
+Seeds `management_system` with employees (job_info, reporting-manager hierarchy) and their profile sections
+(education, work experience, addresses, leave balance; see app/common/profile_sections.py),
+daily attendance, leaves in every status and budget requests. Work is split into chunks of employees that
+parallel worker processes generate and bulk insert; every chunk has its own RNG derived from --seed, so the
+same arguments always produce the same data regardless of --workers.
+
+    python scripts/seed_data.py --employees 100000 --days 100 --workers 8 --drop
+
+All seeded users share the password given by --password (default Password@123); the HR account is hr@erp.com.
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+import bcrypt
+from bson import ObjectId
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.common.profile_sections import LEAVE_BALANCE_COLLECTION, SECTION_COLLECTIONS, split_sections      # noqa: E402  (path set up above)
+from app.common.leave_ledger import BACKFILLED_FLAG, LEDGER_COLLECTION, SNAPSHOT_COLLECTION, opening_events   # noqa: E402
+
+SEEDED_COLLECTIONS = ["employee_db", *SECTION_COLLECTIONS, LEDGER_COLLECTION, SNAPSHOT_COLLECTION, "attendance_db", "leave_db", "budget_request_db",
+                      "budget_monthly_summary_db", "cache_entries"]                                           # shared read cache (CACHE_BACKEND=mongo) would be stale
+
+MANAGER_FANOUT = 8                                   # direct reports per manager -> a tree ~6 levels deep for 100k employees
+EMAIL_DOMAIN = "erp.com"
+
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Vihaan", "Arjun", "Sai", "Reyansh", "Ayaan", "Krishna", "Ishaan",
+               "Ananya", "Diya", "Aadhya", "Saanvi", "Pari", "Anika", "Navya", "Myra", "Sara", "Kiara",
+               "Rohan", "Kabir", "Meera", "Riya", "Tara", "Dev", "Nisha", "Karan", "Pooja", "Neha"]
+LAST_NAMES = ["Sharma", "Verma", "Gupta", "Singh", "Kumar", "Patel", "Reddy", "Nair", "Iyer", "Mehta",
+              "Joshi", "Kapoor", "Malhotra", "Chopra", "Bose", "Das", "Rao", "Pillai", "Menon", "Agarwal"]
+DEPARTMENTS = {
+    "Engineering": ["Software Engineer", "Senior Software Engineer", "QA Engineer", "DevOps Engineer"],
+    "Finance": ["Accountant", "Financial Analyst", "Payroll Specialist"],
+    "Human Resources": ["HR Executive", "Recruiter", "HR Business Partner"],
+    "Marketing": ["Marketing Executive", "Content Strategist", "SEO Analyst"],
+    "Operations": ["Operations Executive", "Logistics Coordinator", "Facilities Manager"],
+    "Sales": ["Sales Executive", "Account Manager", "Business Development Manager"],
+}
+DESIGNATIONS = ["Associate", "Senior Associate", "Lead", "Manager", "Senior Manager"]
+CITIES = [("Mumbai", "Maharashtra"), ("Pune", "Maharashtra"), ("Bengaluru", "Karnataka"), ("Chennai", "Tamil Nadu"),
+          ("Hyderabad", "Telangana"), ("Delhi", "Delhi"), ("Kolkata", "West Bengal"), ("Chandigarh", "Punjab")]
+DEGREES = [("B.Tech", "Computer Science"), ("B.Com", "Accounting"), ("MBA", "Finance"), ("BBA", "Marketing"),
+           ("M.Tech", "Data Science"), ("B.Sc", "Mathematics"), ("MA", "Psychology")]
+COMPANIES = ["Infosys", "TCS", "Wipro", "HCL", "Tech Mahindra", "Accenture", "Cognizant", "Capgemini"]
+BLOOD_GROUPS = ["A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-"]
+LEAVE_TYPES = ["Annual", "Sick", "Personal", "Emergency"]
+LEAVE_TOTALS = {"annual": 12, "sick": 6, "personal": 3, "emergency": 2}
+LEAVE_STATUSES = ["Pending", "Approved", "Rejected"]
+ATTENDANCE_STATUSES = (["Present"] * 17) + ["Absent", "Leave", "Half-Day"]
+BUDGET_CATEGORIES = ["Marketing", "IT", "Operations", "Office Supplies", "Training", "Travel", "Equipment", "Other"]
+BUDGET_STATUSES = ["Pending", "approved", "rejected"]
+
+
+#----------deterministic identities (any worker can derive any employee's id/email) -----------------
+def employee_oid(seed: int, index: int) -> ObjectId:
+    return ObjectId(hashlib.md5(f"{seed}:employee:{index}".encode()).digest()[:12])
+
+def employee_email(index: int) -> str:
+    return f"employee{index}@{EMAIL_DOMAIN}"
+
+def manager_index(index: int):
+    return None if index == 0 else (index - 1) // MANAGER_FANOUT
+
+def has_reports(index: int, total: int) -> bool:
+    return index * MANAGER_FANOUT + 1 < total
+
+def org_path(index: int) -> list:
+    """Manager emails from the top of the organisation down to the direct manager (see app/HR/org_chart.py)"""
+    path, boss = [], manager_index(index)
+    while boss is not None:
+        path.append(employee_email(boss))
+        boss = manager_index(boss)
+    return path[::-1]
+
+
+#----------document builders ------------------------------------------------------------------------
+def build_employee(rng: random.Random, seed: int, index: int, total: int, password_hash: str, today: datetime) -> dict:
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    department = rng.choice(list(DEPARTMENTS))
+    city, state = rng.choice(CITIES)
+    joined = today - timedelta(days=rng.randint(30, 365 * 12))
+    boss = manager_index(index)
+    address = {"street": f"{rng.randint(1, 999)} {rng.choice(LAST_NAMES)} Nagar", "city": city, "state": state,
+               "country": "India", "zip_code": str(rng.randint(110001, 855999))}
+    degree, field = rng.choice(DEGREES)
+    graduated = joined.year - rng.randint(0, 4)
+    experience = []
+    for job in range(rng.randint(0, 3)):
+        end = joined - timedelta(days=rng.randint(30, 400) + job * 700)
+        experience.append({"company_name": rng.choice(COMPANIES), "job_title": rng.choice(DEPARTMENTS[department]),
+                           "from_date": end - timedelta(days=rng.randint(300, 1500)), "to_date": end,
+                           "responsibilities": f"Worked on {department.lower()} projects"})
+    return {
+        "_id": employee_oid(seed, index),
+        "first_name": first_name,
+        "last_name": last_name,
+        "email": employee_email(index),
+        "password": password_hash,
+        "role": "manager" if has_reports(index, total) else "employee",
+        "status": "active" if rng.random() > 0.03 else "inactive",
+        "phone": f"+91{rng.randint(6000000000, 9999999999)}",
+        "emergency_contact": f"+91{rng.randint(6000000000, 9999999999)}",
+        "gender": rng.choice(["Male", "Female"]),
+        "dob": datetime(rng.randint(1965, 2002), rng.randint(1, 12), rng.randint(1, 28)),
+        "blood_group": rng.choice(BLOOD_GROUPS),
+        "marital_status": rng.choice(["Single", "Married"]),
+        "official_email": f"{first_name.lower()}.{last_name.lower()}{index}@{EMAIL_DOMAIN}",
+        "job_info": {
+            "employee_code": f"EMP{index:06d}",
+            "job_title": rng.choice(DEPARTMENTS[department]),
+            "designation": rng.choice(DESIGNATIONS[3:] if has_reports(index, total) else DESIGNATIONS[:3]),
+            "department": department,
+            "date_of_joining": joined,
+            "reporting_manager": employee_email(boss) if boss is not None else None,       # leaves are routed by manager email
+        },
+        "current_address": address,
+        "permanent_address": address if rng.random() < 0.6 else {**address, "city": rng.choice(CITIES)[0]},
+        "education": [{"institution_name": f"{city} University", "degree": degree, "field_of_study": field,
+                       "start_year": graduated - 4, "end_year": graduated, "grade": rng.choice(["A", "A+", "B+", "B"])}],
+        "work_experience": experience,
+        "leave_balance": {**LEAVE_TOTALS, **{f"{kind}_used": 0 for kind in LEAVE_TOTALS}, **{f"{kind}_pending": 0 for kind in LEAVE_TOTALS}},
+        "org_path": org_path(index),
+        "org_depth": len(org_path(index)),
+        "version": 1,
+        "updated_at": today,
+    }
+
+def build_attendance(rng: random.Random, employee: dict, days: int, today: datetime) -> list:
+    rows, employee_id = [], str(employee["_id"])
+    for offset in range(days - 1, -1, -1):                              # ends today, so "today" dashboards have data
+        day = today - timedelta(days=offset)
+        status = rng.choice(ATTENDANCE_STATUSES)
+        row = {"employee_id": employee_id, "email": employee["email"], "date": day, "status": status}
+        if status in ("Present", "Half-Day"):
+            check_in = day + timedelta(hours=9, minutes=rng.randint(-30, 45))
+            row["check_in"] = check_in
+            row["check_out"] = check_in + timedelta(hours=4 if status == "Half-Day" else 9, minutes=rng.randint(-20, 60))
+        rows.append(row)
+    return rows
+
+def build_leaves(rng: random.Random, employee: dict, today: datetime) -> list:
+    manager_email = employee["job_info"]["reporting_manager"]
+    if not manager_email:
+        return []
+    leaves, balance = [], employee["leave_balance"]
+    for status in LEAVE_STATUSES:                                        # every employee has one leave in each status
+        leave_type = rng.choice(LEAVE_TYPES)
+        start = today + timedelta(days=rng.randint(-180, 60))
+        days = rng.randint(1, 3)
+        applied = start - timedelta(days=rng.randint(1, 20))
+        decided = status != "Pending"
+        leaves.append({
+            "leave_type": leave_type, "start_date": start, "end_date": start + timedelta(days=days - 1),
+            "reason": f"{leave_type} leave", "employee_name": f"{employee['first_name']} {employee['last_name']}",
+            "email": employee["email"], "employee_id": str(employee["_id"]), "manager_id": manager_email,
+            "status": status, "created_at": applied, "applied_date": applied, "days_requested": days,
+            "approved_by": manager_email if decided else None,
+            "approved_at": applied + timedelta(days=1) if decided else None,
+            "approved_date": None, "remarks": "Auto-generated" if decided else None, "reserved": True,
+        })
+        if status == "Approved":
+            balance[f"{leave_type.lower()}_used"] += days                  # keep balances consistent with approved leaves
+        elif status == "Pending":
+            balance[f"{leave_type.lower()}_pending"] += days               # ... and with the days pending leaves reserve
+    return leaves
+
+def build_budget_requests(rng: random.Random, employee: dict, today: datetime) -> list:
+    manager_email = employee["job_info"]["reporting_manager"]
+    if not manager_email:
+        return []
+    requests = []
+    for _ in range(rng.randint(0, 2)):
+        created = today - timedelta(days=rng.randint(0, 365), minutes=rng.randint(0, 1440))
+        status = rng.choice(BUDGET_STATUSES)
+        category = rng.choice(BUDGET_CATEGORIES)
+        requests.append({
+            "title": f"{category} budget for Q{(created.month - 1) // 3 + 1}", "category": category,
+            "amount": round(rng.uniform(500, 250000), 2), "justification": "Synthetic request for scale testing",
+            "expected_date": (created + timedelta(days=rng.randint(7, 90))).strftime("%Y-%m-%d"), "attachment_url": None,
+            "employee_id": str(employee["_id"]), "employee_name": f"{employee['first_name']} {employee['last_name']}",
+            "department": employee["job_info"]["department"], "manager_id": manager_email, "manger_name": manager_email,
+            "status": status, "created_at": created, "updated_at": created,
+            "approved_by": manager_email if status != "Pending" else None, "approved_date": None, "remarks": None,
+        })
+    return requests
+
+
+#----------worker ------------------------------------------------------------------------------------
+def _flush(collection, docs: list, batch_size: int, force: bool = False) -> int:
+    if not docs or (len(docs) < batch_size and not force):
+        return 0
+    collection.insert_many(docs, ordered=False, bypass_document_validation=True)
+    inserted = len(docs)
+    docs.clear()
+    return inserted
+
+def seed_chunk(task: dict) -> dict:
+    """Generate and insert one chunk of employees with all their related documents"""
+    rng = random.Random(f"{task['seed']}:chunk:{task['chunk']}")
+    client = MongoClient(task["mongo_uri"], w=1)
+    db = client[task["db_name"]]
+    today = task["today"]
+    buffers = {name: [] for name in ("employee_db", *SECTION_COLLECTIONS, LEDGER_COLLECTION, "attendance_db", "leave_db",
+                                     "budget_request_db")}
+    counts = dict.fromkeys(buffers, 0)
+    try:
+        for index in range(task["start"], task["end"]):
+            employee = build_employee(rng, task["seed"], index, task["total"], task["password_hash"], today)
+            buffers["attendance_db"].extend(build_attendance(rng, employee, task["days"], today))
+            buffers["leave_db"].extend(build_leaves(rng, employee, today))
+            buffers["budget_request_db"].extend(build_budget_requests(rng, employee, today))
+            buffers[LEDGER_COLLECTION].extend(opening_events(employee["_id"], employee["leave_balance"], at=today))
+            for collection, section in split_sections(employee).items():     # after build_leaves, which fills in leave_balance usage
+                buffers[collection].append({**section, "_id": employee["_id"]})
+            buffers[LEAVE_BALANCE_COLLECTION][-1][BACKFILLED_FLAG] = True
+            buffers["employee_db"].append(employee)
+            for name, docs in buffers.items():
+                counts[name] += _flush(db[name], docs, task["batch_size"])
+        for name, docs in buffers.items():
+            counts[name] += _flush(db[name], docs, task["batch_size"], force=True)
+    finally:
+        client.close()
+    return counts
+
+
+#----------CLI ---------------------------------------------------------------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed the ERP database with synthetic data for scale testing")
+    parser.add_argument("--employees", type=int, default=1000, help="number of employees (including managers)")
+    parser.add_argument("--days", type=int, default=30, help="days of attendance per employee")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="parallel worker processes")
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed; same seed + arguments = same data")
+    parser.add_argument("--chunk-size", type=int, default=500, help="employees generated per worker task")
+    parser.add_argument("--batch-size", type=int, default=5000, help="documents per insert_many call")
+    parser.add_argument("--end-date", default=None, help="last attendance day (YYYY-MM-DD), defaults to today")
+    parser.add_argument("--password", default="Password@123", help="password for every seeded account")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--db", default=os.getenv("MONGO_DB_NAME", "management_system"))
+    parser.add_argument("--drop", action="store_true", help="drop the seeded collections first")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    today = datetime.strptime(args.end_date, "%Y-%m-%d") if args.end_date else datetime.combine(datetime.now().date(), datetime.min.time())
+    password_hash = bcrypt.hashpw(args.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")   # hashed once, bcrypt is slow on purpose
+
+    client = MongoClient(args.mongo_uri)
+    db = client[args.db]
+    if args.drop:
+        for name in SEEDED_COLLECTIONS:
+            db.drop_collection(name)
+    db["employee_db"].update_one(
+        {"email": f"hr@{EMAIL_DOMAIN}"},
+        {"$setOnInsert": {"email": f"hr@{EMAIL_DOMAIN}", "password": password_hash, "role": "HR", "first_name": "HR", "status": "active",
+                          "version": 1, "updated_at": today}},
+        upsert=True,
+    )
+
+    tasks = [{
+        "chunk": chunk, "start": start, "end": min(start + args.chunk_size, args.employees), "total": args.employees,
+        "days": args.days, "seed": args.seed, "today": today, "password_hash": password_hash,
+        "mongo_uri": args.mongo_uri, "db_name": args.db, "batch_size": args.batch_size,
+    } for chunk, start in enumerate(range(0, args.employees, args.chunk_size))]
+
+    started = time.perf_counter()
+    totals: dict = {}
+    with Pool(processes=args.workers) as pool:
+        for done, counts in enumerate(pool.imap_unordered(seed_chunk, tasks), start=1):
+            for name, count in counts.items():
+                totals[name] = totals.get(name, 0) + count
+            print(f"\r{done}/{len(tasks)} chunks, {sum(totals.values()):,} documents", end="", flush=True)
+    elapsed = time.perf_counter() - started
+
+    print(f"\nSeeded in {elapsed:.1f}s ({sum(totals.values()) / max(elapsed, 1e-9):,.0f} docs/s)")
+    for name, count in sorted(totals.items()):
+        print(f"  {name}: {count:,}")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
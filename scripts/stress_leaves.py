@@ -0,0 +1,214 @@
+"""
+Leave concurrency stress test, two scenarios against a scratch database:
+
+decide  One employee with --leaves pending (reserved) leaves; --approvers threads fire --attempts conflicting
+        decisions (Approved/Rejected, repeated) at every leave at the same time, through HR.crud.update_leave_status
+        exactly as the manager route calls it. Checks that every leave was decided exactly once, that the balance was
+        charged exactly the days of the leaves that ended up Approved, that every reservation was released or
+        converted, that the employee version moved once per decision and that the leave ledger agrees with the counters.
+apply   One employee with --balance-days of annual leave; --approvers threads submit --leaves applications of 1-3
+        days at once through Employees.crud.create_employee_leave. Checks that nothing was overbooked (pending days
+        equal the accepted leaves and fit in the balance), that the ledger agrees, and reports the MongoDB commands
+        per application.
+
+Needs a real mongod (concurrent conditional updates are what is being tested); --transactions needs a replica set:
+
+    python scripts/stress_leaves.py --mongo-uri mongodb://localhost:27017 --scenario all --leaves 500 --approvers 32
+    python scripts/stress_leaves.py --mongo-uri "mongodb://localhost:27017/?replicaSet=rs0" --transactions
+
+Exit code is 1 when any check fails. tests/test_leave_concurrency.py runs both scenarios at CI size under pytest.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient, monitoring
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LEAVE_TYPES = ["Annual", "Sick", "Personal", "Emergency"]
+MANAGER_EMAIL = "stress.manager@erp.com"
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = Counter()
+
+    def started(self, event):
+        self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def setup(db, leaves: int, rng: random.Random, balance_days: int = 10 ** 6) -> tuple:
+    """Manager + employee with the given balance per leave type, and `leaves` Pending leaves with their days reserved"""
+    from app.common.profile_sections import LEAVE_BALANCE_COLLECTION, SECTION_COLLECTIONS      # noqa: E402
+    from app.common.leave_ledger import (BACKFILLED_FLAG, LEDGER_COLLECTION, SNAPSHOT_COLLECTION,  # noqa: E402
+                                         append_events, opening_events)
+    for name in ("employee_db", "leave_db", *SECTION_COLLECTIONS, LEDGER_COLLECTION, SNAPSHOT_COLLECTION):
+        db.drop_collection(name)
+    db["employee_db"].insert_one({"email": MANAGER_EMAIL, "role": "manager", "job_info": {}, "version": 1})
+    employee_id = db["employee_db"].insert_one({"email": "stress.employee@erp.com", "role": "employee", "version": 1,
+                                                "job_info": {"reporting_manager": MANAGER_EMAIL}}).inserted_id
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    documents, pending = [], Counter()
+    for index in range(leaves):
+        start = today + timedelta(days=index)
+        days = rng.randint(1, 3)
+        documents.append({"employee_id": str(employee_id), "manager_id": MANAGER_EMAIL, "leave_type": rng.choice(LEAVE_TYPES),
+                          "start_date": start, "end_date": start + timedelta(days=days - 1), "days_requested": days,
+                          "status": "Pending", "reserved": True})
+        pending[f"{documents[-1]['leave_type'].lower()}_pending"] += days
+    balance = {**{kind.lower(): balance_days for kind in LEAVE_TYPES}, **{f"{kind.lower()}_used": 0 for kind in LEAVE_TYPES},
+               **{f"{kind.lower()}_pending": pending[f"{kind.lower()}_pending"] for kind in LEAVE_TYPES}}
+    db[LEAVE_BALANCE_COLLECTION].insert_one({"_id": employee_id, **balance, BACKFILLED_FLAG: True})
+    append_events(db, opening_events(employee_id, balance))
+    if documents:
+        db["leave_db"].insert_many(documents)
+    return employee_id, [str(document["_id"]) for document in documents]
+
+def ledger_drift(db, employee_id) -> list:
+    """Counters that the append-only leave ledger does not add up to"""
+    from app.common.leave_ledger import get_ledger_balance, empty_balance              # noqa: E402
+    from app.common.profile_sections import LEAVE_BALANCE_COLLECTION                  # noqa: E402
+    counters = db[LEAVE_BALANCE_COLLECTION].find_one({"_id": employee_id})
+    ledger = get_ledger_balance.uncached(db, employee_id) or {}
+    return [f"ledger {field}={ledger.get(field, 0)} but counter {field}={counters.get(field, 0)}"
+            for field in empty_balance() if ledger.get(field, 0) != counters.get(field, 0)]
+
+
+def run_decide(db, args, rng: random.Random) -> list:
+    from app.HR.crud import update_leave_status                                       # noqa: E402
+    from app.common.profile_sections import LEAVE_BALANCE_COLLECTION                  # noqa: E402
+    from app.common.utils import LEAVE_UNCHANGED                                      # noqa: E402
+
+    employee_id, leave_ids = setup(db, args.leaves, rng)
+    attempts = [(leave_id, rng.choice(["Approved", "Rejected"])) for leave_id in leave_ids for _ in range(args.attempts)]
+    rng.shuffle(attempts)
+
+    def decide(attempt):
+        leave_id, decision = attempt
+        leave, failure = update_leave_status(db, leave_id, {"status": decision, "approved_by": MANAGER_EMAIL})
+        if leave is not None:
+            return leave_id, "won"
+        return leave_id, "repeat" if failure[0] == LEAVE_UNCHANGED else "conflict"
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.approvers) as pool:
+        outcomes = list(pool.map(decide, attempts))
+    elapsed = time.perf_counter() - started
+
+    failures = []
+    wins = Counter(leave_id for leave_id, outcome in outcomes if outcome == "won")
+    if set(wins) != set(leave_ids) or any(count != 1 for count in wins.values()):
+        failures.append(f"{sum(1 for count in wins.values() if count > 1)} leave(s) decided more than once, "
+                        f"{len(set(leave_ids) - set(wins))} never decided")
+    if db["leave_db"].count_documents({"status": "Pending"}):
+        failures.append("leaves still Pending")
+
+    expected = Counter()
+    for leave in db["leave_db"].find({"status": "Approved"}):
+        expected[f"{leave['leave_type'].lower()}_used"] += leave["days_requested"]
+    balance = db[LEAVE_BALANCE_COLLECTION].find_one({"_id": employee_id})
+    for kind in (kind.lower() for kind in LEAVE_TYPES):
+        if balance.get(f"{kind}_used", 0) != expected[f"{kind}_used"]:
+            failures.append(f"{kind}_used: charged {balance.get(f'{kind}_used', 0)} day(s), approved leaves add up to {expected[f'{kind}_used']}")
+        if balance.get(f"{kind}_pending", 0) != 0:
+            failures.append(f"{kind}_pending: {balance.get(f'{kind}_pending')} day(s) still reserved after every leave was decided")
+    version = db["employee_db"].find_one({"_id": employee_id}, {"version": 1})["version"]
+    if version != 1 + len(leave_ids):                                  # every decision settles a reservation
+        failures.append(f"employee version {version}, expected {1 + len(leave_ids)}")
+    failures += ledger_drift(db, employee_id)
+
+    summary = Counter(outcome for _, outcome in outcomes)
+    print(f"decide: {len(attempts)} decisions on {len(leave_ids)} leaves by {args.approvers} threads in {elapsed:.2f}s "
+          f"({len(attempts) / elapsed:.0f}/s): won={summary['won']} repeat={summary['repeat']} conflict={summary['conflict']}, "
+          f"approved={sum(1 for _ in db['leave_db'].find({'status': 'Approved'}, {'_id': 1}))}, "
+          f"transactions={'on' if args.transactions else 'off'}")
+    return failures
+
+
+def run_apply(db, args, rng: random.Random, counter: CommandCounter) -> list:
+    from app.Employees.crud import create_employee_leave                              # noqa: E402
+    from app.common.profile_sections import LEAVE_BALANCE_COLLECTION                  # noqa: E402
+
+    employee_id, _ = setup(db, 0, rng, balance_days=args.balance_days)
+    today = datetime.now().date()
+    applications = []
+    for index in range(args.leaves):
+        start = today + timedelta(days=index)
+        applications.append({"leave_type": "Annual", "start_date": start, "end_date": start + timedelta(days=rng.randint(0, 2)),
+                             "reason": "stress test"})
+
+    def apply(leave_data):
+        try:
+            create_employee_leave(db, str(employee_id), leave_data)
+            return "accepted"
+        except ValueError:
+            return "refused"
+
+    counter.commands.clear()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.approvers) as pool:
+        outcomes = Counter(pool.map(apply, applications))
+    elapsed = time.perf_counter() - started
+    commands = sum(counter.commands.values())
+
+    failures = []
+    balance = db[LEAVE_BALANCE_COLLECTION].find_one({"_id": employee_id})
+    booked = sum(leave["days_requested"] for leave in db["leave_db"].find({"employee_id": str(employee_id)}, {"days_requested": 1}))
+    if balance.get("annual_pending", 0) != booked:
+        failures.append(f"annual_pending is {balance.get('annual_pending', 0)} but accepted leaves add up to {booked} day(s)")
+    if booked > args.balance_days:
+        failures.append(f"overbooked: {booked} day(s) accepted against a balance of {args.balance_days}")
+    if outcomes["accepted"] != db["leave_db"].count_documents({"employee_id": str(employee_id)}):
+        failures.append("accepted applications and stored leaves differ")
+    failures += ledger_drift(db, employee_id)
+
+    print(f"apply: {len(applications)} applications by {args.approvers} threads in {elapsed:.2f}s: accepted={outcomes['accepted']} "
+          f"refused={outcomes['refused']}, {booked}/{args.balance_days} day(s) booked, "
+          f"{commands / max(len(applications), 1):.2f} MongoDB commands per application ({dict(counter.commands)})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--db", default="erp_leave_stress")
+    parser.add_argument("--scenario", choices=["decide", "apply", "all"], default="all")
+    parser.add_argument("--leaves", type=int, default=200, help="leaves to decide / applications to submit")
+    parser.add_argument("--approvers", type=int, default=32, help="concurrent threads")
+    parser.add_argument("--attempts", type=int, default=8, help="decisions fired at every leave")
+    parser.add_argument("--balance-days", type=int, default=100, help="annual balance for the apply scenario")
+    parser.add_argument("--transactions", action="store_true", help="decide and charge in one transaction (LEAVE_TRANSACTIONS)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["LEAVE_TRANSACTIONS"] = "true" if args.transactions else "false"     # read when app.common.profile_sections is imported
+    rng = random.Random(args.seed)
+    counter = CommandCounter()
+    db = MongoClient(args.mongo_uri, maxPoolSize=args.approvers + 4, event_listeners=[counter])[args.db]
+
+    failures = []
+    if args.scenario in ("decide", "all"):
+        failures += run_decide(db, args, rng)
+    if args.scenario in ("apply", "all"):
+        failures += run_apply(db, args, rng, counter)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK: no leave decided twice, no balance overbooked or charged twice")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Shared fixtures and the query budget plugin.
+
+Everything that touches MongoDB runs against a real mongod (MONGO_URI, localhost by default) in the
+MONGO_DB_NAME database, management_system_test unless set, which is dropped before and after the session.
+Those tests are skipped when no mongod answers; command counts and concurrent conditional updates are what
+they check, and neither can be faked.
+
+query_budget: every request made while the fixture is active is checked on teardown against the budget of its
+route (MongoDB commands per request, auth lookup included) and against the N+1 detector in app.common.db_monitor.
+"""
+import os
+import threading
+from datetime import date, timedelta
+
+os.environ.setdefault("MONGO_DB_NAME", "management_system_test")
+os.environ.setdefault("N_PLUS_ONE_MODE", "warn")              # read when app.common.db_monitor is imported
+os.environ.setdefault("INVALIDATION_BUS", "false")            # one process: publishing would add a write to every invalidation
+os.environ.setdefault("SECRET_KEY", "test-secret-key-for-the-pytest-suite")
+
+import pytest                                                  # noqa: E402
+from pymongo import MongoClient                                # noqa: E402
+from pymongo.errors import PyMongoError                        # noqa: E402
+
+from app.common.db_monitor import QUERY_REPEAT_THRESHOLD       # noqa: E402
+from app.common.middleware import REQUEST_OBSERVERS, repeated_query_report   # noqa: E402
+from app.common.request_context import RequestContext          # noqa: E402
+from app.database import MONGO_DB_NAME, MONGO_URI              # noqa: E402
+
+DEFAULT_MAX_QUERIES = 5
+
+# (method, route template) -> max MongoDB commands per request, for routes that legitimately need more than the default
+ROUTE_QUERY_BUDGETS = {
+    ("GET", "/hr/budget/analytics"): 6,                  # auth + summaries + one-off bucket build + live month
+    ("GET", "/hr/employees"): 6,                         # auth + list version for the ETag check, again with the list in one flight
+    ("PATCH", "/hr/employee/{employee_id}"): 6,          # auth + employee_db + one section write + profile read back (ledger balance)
+    ("GET", "/employees/dashboard"): 7,                  # auth + employee + ledger balance + attendance, budget and leave counts
+    ("POST", "/employees/leave-request"): 6,             # auth + manager lookup + reservation + ledger + leave + version bump
+    ("DELETE", "/employees/leave/{leave_id}"): 6,        # auth + leave + status change + settlement + ledger + version bump
+    ("POST", "/hr/manager/leaves/decide"): 7,            # auth + candidates + decisions + missing balances + balances + ledger + version bumps
+}
+
+PASSWORD = "Passw0rd@1"
+HR_EMAIL = "hr@erp.com"
+MANAGER_EMAIL = "manager@erp.com"
+EMPLOYEE_EMAIL = "employee@erp.com"
+
+
+def route_budget(method: str, route: str) -> int:
+    return ROUTE_QUERY_BUDGETS.get((method, route), DEFAULT_MAX_QUERIES)
+
+def app_routes(app) -> list:
+    """(method, route template) of every documented route in the app"""
+    return [(method.upper(), path) for path, operations in app.openapi()["paths"].items() for method in operations]
+
+
+#===========QUERY BUDGET ===========================================
+class QueryBudgetRecorder:
+    def __init__(self):
+        self.requests: list = []
+        self._lock = threading.Lock()
+
+    def __call__(self, ctx: RequestContext):
+        with self._lock:
+            self.requests.append((ctx.method, ctx.route, ctx.mongo_commands, repeated_query_report(ctx)))
+
+    def violations(self) -> list:
+        problems = []
+        with self._lock:
+            requests = list(self.requests)
+        for method, route, commands, repeated in requests:
+            budget = route_budget(method, route)
+            if commands > budget:
+                problems.append(f"{method} {route}: {commands} MongoDB commands, budget is {budget}")
+            for item in repeated:
+                problems.append(f"{method} {route}: {item['shape']} on {item['collection']} issued {item['count']} times "
+                                f"(threshold {QUERY_REPEAT_THRESHOLD})")
+        return problems
+
+
+@pytest.fixture
+def query_budget():
+    recorder = QueryBudgetRecorder()
+    REQUEST_OBSERVERS.append(recorder)
+    try:
+        yield recorder
+    finally:
+        REQUEST_OBSERVERS.remove(recorder)
+    violations = recorder.violations()
+    if violations:
+        pytest.fail("Query budget exceeded:\n" + "\n".join(violations))
+
+
+#===========DATABASE ===========================================
+@pytest.fixture(scope="session")
+def mongo_client():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as exc:
+        client.close()
+        pytest.skip(f"no mongod at {MONGO_URI}: {exc.__class__.__name__}")
+    client.drop_database(MONGO_DB_NAME)
+    yield client
+    client.drop_database(MONGO_DB_NAME)
+    client.close()
+
+@pytest.fixture
+def db(mongo_client):
+    """The app's own Database (its client carries the command monitor), emptied before every test"""
+    from app.common.cache import tag_cache
+    from app.database import ensure_indexes, get_db
+
+    database = get_db()
+    for name in database.list_collection_names():
+        database[name].delete_many({})
+    ensure_indexes(database)
+    tag_cache.clear()
+    return database
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+#===========SEED DATA ===========================================
+def auth_headers(email: str, role: str) -> dict:
+    from app.Auth.utils import create_access_token
+    return {"Authorization": "Bearer " + create_access_token({"sub": email, "role": role})}
+
+@pytest.fixture
+def org(db):
+    """HR user, a manager and one employee reporting to them, with a Pending leave"""
+    from app.Auth.utils import hash_password
+    from app.Employees.crud import create_employee_leave
+    from app.HR.org_chart import rebuild_org_paths
+
+    password = hash_password(PASSWORD)
+    db["employee_db"].insert_one({"email": HR_EMAIL, "role": "HR", "first_name": "Hana", "password": password, "version": 1})
+    manager_id = db["employee_db"].insert_one({"email": MANAGER_EMAIL, "role": "manager", "first_name": "Mia", "password": password,
+                                               "job_info": {}, "version": 1}).inserted_id
+    employee_id = db["employee_db"].insert_one({"email": EMPLOYEE_EMAIL, "role": "employee", "first_name": "Ann", "last_name": "Lee",
+                                                "password": password, "job_info": {"reporting_manager": MANAGER_EMAIL},
+                                                "version": 1}).inserted_id
+    rebuild_org_paths(db)
+    start = date.today() + timedelta(days=7)
+    leave_id = create_employee_leave(db, str(employee_id), {"leave_type": "Annual", "start_date": start, "end_date": start,
+                                                            "reason": "family visit"})
+    return {
+        "employee_id": str(employee_id),
+        "manager_id": str(manager_id),
+        "leave_id": leave_id,
+        "hr": auth_headers(HR_EMAIL, "HR"),
+        "manager": auth_headers(MANAGER_EMAIL, "manager"),
+        "employee": auth_headers(EMPLOYEE_EMAIL, "employee"),
+    }
@@ -0,0 +1,111 @@
+"""
+Concurrent leave decisions and applications against a real mongod: the scenarios of scripts/stress_leaves.py at CI
+size, plus batch decisions and applications from an employee whose balance was never migrated to leave_balances.
+The script stays the tool for large runs.
+"""
+import argparse
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo import MongoClient
+
+from app.database import MONGO_DB_NAME, MONGO_URI
+from scripts import stress_leaves
+
+THREADS = 16
+ARGS = argparse.Namespace(leaves=60, approvers=THREADS, attempts=4, balance_days=40, transactions=False)
+
+
+@pytest.fixture
+def stress(mongo_client):
+    """Scratch database on a client with a pool as wide as the thread count and a command counter"""
+    counter = stress_leaves.CommandCounter()
+    client = MongoClient(MONGO_URI, maxPoolSize=THREADS + 4, event_listeners=[counter])
+    database = client[f"{MONGO_DB_NAME}_stress"]
+    yield database, counter
+    client.drop_database(database.name)
+    client.close()
+
+
+def test_parallel_decisions_decide_every_leave_once(stress):
+    db, _ = stress
+    assert stress_leaves.run_decide(db, ARGS, random.Random(1)) == []
+
+def test_parallel_decisions_in_transactions(stress, mongo_client, monkeypatch):
+    if not mongo_client.admin.command("hello").get("setName"):
+        pytest.skip("LEAVE_TRANSACTIONS needs a replica set")
+    from app.HR import crud
+    monkeypatch.setattr(crud, "LEAVE_TRANSACTIONS", True)
+    db, _ = stress
+    assert stress_leaves.run_decide(db, argparse.Namespace(**{**vars(ARGS), "transactions": True}), random.Random(2)) == []
+
+def test_parallel_batch_decisions_decide_every_leave_once(stress):
+    from app.HR.crud import decide_leaves
+    from app.common.profile_sections import LEAVE_BALANCE_COLLECTION
+
+    db, _ = stress
+    rng = random.Random(3)
+    employee_id, leave_ids = stress_leaves.setup(db, ARGS.leaves, rng)
+    batches = [[{"leave_id": leave_id, "status": rng.choice(["Approved", "Rejected"])} for leave_id in rng.sample(leave_ids, 10)]
+               for _ in range(ARGS.leaves * ARGS.attempts // 10)]
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = [result for batch in pool.map(lambda batch: decide_leaves(db, batch, stress_leaves.MANAGER_EMAIL), batches)
+                   for result in batch]
+
+    wins = Counter(result["leave_id"] for result in results if result["result"] == "decided")
+    assert all(count == 1 for count in wins.values())
+    assert db["leave_db"].count_documents({"status": "Pending"}) == len(leave_ids) - len(wins)
+    used = Counter()
+    for leave in db["leave_db"].find({"status": "Approved"}):
+        used[f"{leave['leave_type'].lower()}_used"] += leave["days_requested"]
+    pending = Counter()
+    for leave in db["leave_db"].find({"status": "Pending"}):
+        pending[f"{leave['leave_type'].lower()}_pending"] += leave["days_requested"]
+    balance = db[LEAVE_BALANCE_COLLECTION].find_one({"_id": employee_id})
+    for kind in (kind.lower() for kind in stress_leaves.LEAVE_TYPES):
+        assert balance.get(f"{kind}_used", 0) == used[f"{kind}_used"]
+        assert balance.get(f"{kind}_pending", 0) == pending[f"{kind}_pending"]
+    assert stress_leaves.ledger_drift(db, employee_id) == []
+
+
+def test_parallel_applications_never_overbook(stress):
+    db, counter = stress
+    assert stress_leaves.run_apply(db, ARGS, random.Random(4), counter) == []
+
+def test_parallel_applications_before_migration(stress):
+    """The first applications of an employee whose balance is still embedded in employee_db race to create the
+    leave_balances document; exactly one seeds it, and nobody books past the embedded balance"""
+    from app.Employees.crud import create_employee_leave
+    from app.common.leave_ledger import LEDGER_COLLECTION
+    from app.common.profile_sections import LEAVE_BALANCE_COLLECTION
+
+    db, _ = stress
+    employee_id, _ = stress_leaves.setup(db, 0, random.Random(5))
+    db[LEAVE_BALANCE_COLLECTION].delete_many({})
+    db[LEDGER_COLLECTION].delete_many({})
+    db["employee_db"].update_one({"_id": employee_id}, {"$set": {"leave_balance": {"annual": ARGS.balance_days, "annual_used": 5}}})
+    today = datetime.now().date()
+
+    def apply(index):
+        start = today + timedelta(days=index)
+        try:
+            create_employee_leave(db, str(employee_id), {"leave_type": "Annual", "start_date": start, "end_date": start + timedelta(days=1),
+                                                         "reason": "stress test"})
+            return "accepted"
+        except ValueError:
+            return "refused"
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        outcomes = Counter(pool.map(apply, range(ARGS.leaves)))
+
+    booked = sum(leave["days_requested"] for leave in db["leave_db"].find({"employee_id": str(employee_id)}))
+    balance = db[LEAVE_BALANCE_COLLECTION].find_one({"_id": employee_id})
+    assert outcomes["accepted"] == (ARGS.balance_days - 5) // 2
+    assert balance["annual"] == ARGS.balance_days and balance["annual_used"] == 5
+    assert balance["annual_pending"] == booked == 2 * outcomes["accepted"]
+    assert db[LEDGER_COLLECTION].count_documents({"employee_id": employee_id, "event": "grant", "leave_type": "annual"}) == 1
+    assert stress_leaves.ledger_drift(db, employee_id) == []
@@ -0,0 +1,60 @@
+"""/metrics after a real request: the route's latency histogram and the MongoDB command counters it fed"""
+import re
+from typing import Optional
+
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.common.request_context import route_template
+
+
+def sample(scrape: str, name: str, **labels) -> Optional[float]:
+    """Value of the sample `name{labels}` in a Prometheus text scrape (labels in any order), None when absent"""
+    for match in re.finditer(rf"^{re.escape(name)}\{{(.*)\}} (\S+)$", scrape, re.MULTILINE):
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(1)))
+        if found == labels:
+            return float(match.group(2))
+    return None
+
+
+def test_request_shows_up_in_metrics(client, org):
+    route = "/hr/employee/{employee_id}"
+    before = client.get("/metrics").text
+    assert client.get(f"/hr/employee/{org['employee_id']}", headers=org["hr"]).status_code == 200
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    scrape = response.text
+    assert "# TYPE erp_http_request_duration_seconds histogram" in scrape
+    count = sample(scrape, "erp_http_request_duration_seconds_count", method="GET", route=route)
+    assert count is not None and count >= 1
+    assert sample(scrape, "erp_http_request_duration_seconds_bucket", method="GET", route=route, le="+Inf") == count
+    assert sample(scrape, "erp_http_requests_total", method="GET", route=route, status="200") >= 1
+
+    finds = sample(scrape, "erp_mongo_commands_total", collection="employee_db", command="find")
+    assert finds is not None and finds > (sample(before, "erp_mongo_commands_total", collection="employee_db", command="find") or 0)
+    assert sample(scrape, "erp_mongo_command_duration_seconds_count", collection="employee_db", command="find") == finds
+    assert sample(scrape, "erp_route_mongo_commands_total", route=route, collection="employee_db") >= 1
+    assert sample(scrape, "erp_request_mongo_commands_count", route=route) == count
+
+
+def test_route_template_comes_from_the_route_not_the_url():
+    inner, outer = APIRouter(), APIRouter()
+
+    @inner.get("/files/{name:path}")
+    def file(name: str, request: Request):
+        return route_template(request.scope)
+
+    @inner.get("/list/")
+    def listing(request: Request):
+        return route_template(request.scope)
+
+    outer.include_router(inner, prefix="/docs")
+    app = FastAPI()
+    app.include_router(outer, prefix="/hr")
+    client = TestClient(app)
+
+    assert client.get("/hr/docs/files/2024/q1/report.pdf").json() == "/hr/docs/files/{name:path}"
+    assert client.get("/hr/docs/list/").json() == "/hr/docs/list/"
@@ -0,0 +1,139 @@
+"""
+One budgeted request per route: every endpoint is called once through the TestClient with the seed data from the
+`org` fixture, and the query_budget fixture fails the test when the route issued more MongoDB commands than its
+budget (tests/conftest.py) or repeated one query shape past the N+1 threshold.
+"""
+import tracemalloc
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
+
+import pytest
+
+import main
+from tests.conftest import EMPLOYEE_EMAIL, MANAGER_EMAIL, PASSWORD, app_routes
+
+
+class Case(NamedTuple):
+    role: Optional[str]                          # key of the org fixture's headers; None = anonymous
+    json: Optional[dict] = None
+    data: Optional[dict] = None                  # form fields
+    query: str = ""
+
+
+NEXT_WEEK = (date.today() + timedelta(days=14)).isoformat()
+
+ROUTE_CASES = {
+    ("POST", "/auth/login"): Case(None, json={"email": EMPLOYEE_EMAIL, "password": PASSWORD}),
+    ("POST", "/auth/create_hr_once"): Case(None, json={"email": "second.hr@erp.com", "password": PASSWORD}),
+    ("GET", "/auth/me"): Case("employee"),
+    ("POST", "/hr/register_employee"): Case("hr", json={"first_name": "Ben", "email": "ben@erp.com", "password": PASSWORD}),
+    ("GET", "/hr/employees"): Case("hr"),
+    ("GET", "/hr/employee/{employee_id}"): Case("hr"),
+    ("PATCH", "/hr/employee/{employee_id}"): Case("hr", json={"basic": {"first_name": "Anna"}, "current_address": {"city": "Pune"}}),
+    ("DELETE", "/hr/employee/{employee_id}"): Case("hr"),
+    ("PUT", "/hr/employee/{employee_id}/basic"): Case("hr", json={"first_name": "Anna"}),
+    ("PUT", "/hr/employee/{employee_id}/current_address"): Case("hr", json={"city": "Pune"}),
+    ("PUT", "/hr/employee/{employee_id}/permanent_address"): Case("hr", json={"city": "Delhi"}),
+    ("PUT", "/hr/employee/{employee_id}/job_info"): Case("hr", json={"reporting_manager": MANAGER_EMAIL}),
+    ("POST", "/hr/employee/{employee_id}/education"): Case("hr", json={"institution_name": "IIT", "degree": "BTech"}),
+    ("PUT", "/hr/employee/{employee_id}/education/{index}"): Case("hr", json={"degree": "MTech"}),
+    ("POST", "/hr/employee/{employee_id}/work_experience"): Case("hr", json={"company_name": "Acme"}),
+    ("PUT", "/hr/employee/{employee_id}/work_experience/{index}"): Case("hr", json={"job_title": "Engineer"}),
+    ("POST", "/hr/employees/batch-get"): Case("hr", json={"emails": [EMPLOYEE_EMAIL, MANAGER_EMAIL]}),
+    ("POST", "/hr/employees/search"): Case("hr", json={"first_name": "Ann"}),
+    ("PUT", "/hr/employee/{employee_id}/activate"): Case("hr"),
+    ("POST", "/hr/attendance/mark"): Case("hr", json={"employee_id": "{employee_id}", "date": date.today().isoformat(), "status": "Present"}),
+    ("GET", "/hr/attendance"): Case("hr"),
+    ("GET", "/hr/attendance/summary/today"): Case("hr"),
+    ("PUT", "/hr/attendance/{employee_id}/{date}"): Case("hr", json={"status": "Absent"}),
+    ("GET", "/hr/leaves"): Case("hr"),
+    ("GET", "/hr/leave/{leave_id}"): Case("hr"),
+    ("GET", "/hr/leaves/pending"): Case("hr"),
+    ("GET", "/hr/leaves/approved"): Case("hr"),
+    ("GET", "/hr/leaves/rejected"): Case("hr"),
+    ("GET", "/hr/hr/employee/{employee_id}/leave_balance"): Case("hr"),
+    ("POST", "/hr/employee/{employee_id}/leave_ledger"): Case("hr", json={"event": "grant", "leave_type": "Annual", "days": 2}),
+    ("GET", "/hr/org-chart"): Case("hr"),
+    ("POST", "/hr/org-chart/rebuild"): Case("hr"),
+    ("GET", "/hr/budget/analytics"): Case("hr"),
+    ("POST", "/employees/employee_login"): Case(None, json={"email": EMPLOYEE_EMAIL, "password": PASSWORD}),
+    ("GET", "/employees/profile"): Case("employee"),
+    ("GET", "/employees/dashboard"): Case("employee"),
+    ("PUT", "/employees/profile/personal_info"): Case("employee", json={"marital_status": "Single"}),
+    ("PUT", "/employees/profile/current_address"): Case("employee", json={"city": "Pune"}),
+    ("GET", "/employees/attendance"): Case("employee"),
+    ("POST", "/employees/leave-request"): Case("employee", json={"leave_type": "Sick", "start_date": NEXT_WEEK,
+                                                                 "end_date": NEXT_WEEK, "reason": "doctor appointment"}),
+    ("GET", "/employees/leaves"): Case("employee"),
+    ("DELETE", "/employees/leave/{leave_id}"): Case("employee"),
+    ("POST", "/employees/budget-request"): Case("employee", data={"title": "Laptop", "category": "IT", "amount": "900",
+                                                                  "justification": "old one broke", "expected_date": NEXT_WEEK}),
+    ("GET", "/hr/manager/leaves/pending"): Case("manager"),
+    ("PUT", "/hr/manager/leave/{leave_id}/approve"): Case("manager", json={"status": "Approved"}),
+    ("POST", "/hr/manager/leaves/decide"): Case("manager", json={"decisions": [{"leave_id": "{leave_id}", "status": "Rejected"}]}),
+    ("GET", "/hr/manager/team"): Case("manager"),
+    ("GET", "/hr/manager/team/leaves"): Case("manager"),
+    ("GET", "/hr/manager/leaves"): Case("manager"),
+    ("GET", "/hr/manager/leaves/approved"): Case("manager"),
+    ("GET", "/hr/manager/leaves/rejected"): Case("manager"),
+    ("GET", "/admin/overview"): Case("hr"),
+    ("GET", "/admin/pool"): Case("hr"),
+    ("GET", "/admin/caches"): Case("hr"),
+    ("GET", "/admin/threadpool"): Case("hr"),
+    ("GET", "/admin/jobs"): Case("hr"),
+    ("GET", "/admin/indexes"): Case("hr"),
+    ("GET", "/admin/collections"): Case("hr"),
+    ("GET", "/admin/profiles"): Case("hr"),
+    ("GET", "/admin/profiles/{request_id}"): Case("hr"),
+    ("GET", "/admin/memory"): Case("hr"),
+    ("POST", "/admin/memory/tracemalloc/start"): Case("hr"),
+    ("POST", "/admin/memory/tracemalloc/stop"): Case("hr"),
+    ("POST", "/admin/memory/snapshots"): Case("hr"),
+    ("GET", "/admin/memory/diff"): Case("hr", query="?from_id=1"),
+    ("GET", "/admin/memory/requests"): Case("hr"),
+    ("GET", "/admin/slow-queries"): Case("hr"),
+    ("DELETE", "/admin/slow-queries"): Case("hr"),
+    ("GET", "/admin/slow-queries/shapes"): Case("hr"),
+    ("GET", "/"): Case(None),
+}
+
+
+def _fill(value, params: dict):
+    if isinstance(value, str):
+        return value.format(**params) if "{" in value else value
+    if isinstance(value, dict):
+        return {key: _fill(item, params) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, params) for item in value]
+    return value
+
+
+def test_every_route_has_a_case():
+    assert sorted(set(app_routes(main.app)) - set(ROUTE_CASES)) == []
+    assert sorted(set(ROUTE_CASES) - set(app_routes(main.app))) == []
+
+
+@pytest.fixture
+def tracing_off():
+    yield
+    if tracemalloc.is_tracing():                             # started by POST /admin/memory/tracemalloc/start
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("method,route", list(ROUTE_CASES), ids=[f"{method} {route}" for method, route in ROUTE_CASES])
+def test_route_within_query_budget(method, route, client, org, query_budget, tracing_off):
+    case = ROUTE_CASES[(method, route)]
+    params = {"employee_id": org["employee_id"], "leave_id": org["leave_id"], "index": 0,
+              "date": date.today().isoformat(), "request_id": "no-such-profile"}
+    if "{index}" in route:                                   # something to update at that index
+        section = route.rsplit("/", 2)[-2]
+        client.post(f"/hr/employee/{org['employee_id']}/{section}", headers=org["hr"], json={})
+    if route == "/hr/attendance/{employee_id}/{date}":
+        client.post("/hr/attendance/mark", headers=org["hr"],
+                    json={"employee_id": org["employee_id"], "date": params["date"], "status": "Present"})
+    query_budget.requests.clear()                            # only the request under test counts
+
+    response = client.request(method, route.format(**params) + case.query, headers=org[case.role] if case.role else None,
+                              json=_fill(case.json, params), data=case.data)
+
+    assert response.status_code < 500, response.text
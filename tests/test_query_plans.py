@@ -0,0 +1,24 @@
+"""The query plan checks of scripts/check_query_plans.py (commands recorded from the crud calls) against a freshly seeded scratch database"""
+import pytest
+
+from app.database import MONGO_DB_NAME, MONGO_URI, ensure_indexes
+from scripts import check_query_plans, seed_data
+
+
+@pytest.fixture(scope="module")
+def plans_db(mongo_client):
+    name = f"{MONGO_DB_NAME}_plans"
+    seed_data.main(["--mongo-uri", MONGO_URI, "--db", name, "--drop", "--employees", "2000", "--days", "10", "--workers", "2"])
+    database = mongo_client[name]
+    ensure_indexes(database)
+    yield database
+    mongo_client.drop_database(name)
+
+
+def test_query_plans_use_indexes(plans_db):
+    failures = []
+    for item in check_query_plans.build_catalog(MONGO_URI, plans_db.name):
+        problems, stages, examined, returned = check_query_plans.check(plans_db, item)
+        failures += [f"{item.collection} {item.name} ({item.source}): {problem}; examined={examined} returned={returned}, "
+                     f"stages {', '.join(sorted(stages))}" for problem in problems]
+    assert failures == []